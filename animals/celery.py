@@ -19,6 +19,14 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute='0', hour='8', day_of_week='monday'),
         'args': (),
     },
+    'cleanup-photo-upload-sessions-every-hour': {
+        'task': 'siteapp.tasks.cleanup_photo_upload_sessions',
+        'schedule': crontab(minute='30'),
+    },
+    'refresh-home-page-snapshot-every-minute': {
+        'task': 'siteapp.tasks.refresh_home_page_snapshot',
+        'schedule': crontab(),
+    },
 }
 
 
@@ -267,6 +267,54 @@ SILKY_PYTHON_PROFILER = True
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
 
+# Кэш: Redis, если задан REDIS_CACHE_URL, иначе память процесса (разработка, тесты).
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'animals',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время жизни кэшированных ответов списка объявлений для анонимов, в секундах.
+ADS_LIST_CACHE_TIMEOUT = int(os.environ.get('ADS_LIST_CACHE_TIMEOUT', 300))
+
+# Сериализация списков объявлений, статей и главной страницы через .values()
+# (siteapp.fast_serializers) вместо сериализаторов DRF.
+FAST_LIST_SERIALIZATION = os.environ.get('FAST_LIST_SERIALIZATION', 'true').lower() == 'true'
+
+# Снимок главной страницы в кэше (siteapp.homepage): через сколько секунд он
+# считается устаревшим и через сколько секунд после изменения данных
+# пересобирается.
+HOME_PAGE_SNAPSHOT_TTL = int(os.environ.get('HOME_PAGE_SNAPSHOT_TTL', 300))
+HOME_PAGE_SNAPSHOT_DEBOUNCE = int(os.environ.get('HOME_PAGE_SNAPSHOT_DEBOUNCE', 5))
+
+# Прогрев кэшей (siteapp.warmup, команда warm_caches): источник, от имени
+# которого запрашиваются главная страница и списки (должен совпадать с
+# адресом, который видят клиенты, и входить в ALLOWED_HOSTS), число страниц
+# списка объявлений и прогрев каждого процесса gunicorn при запуске.
+WARMUP_ORIGIN = os.environ.get('WARMUP_ORIGIN', 'http://localhost')
+WARMUP_LIST_PAGES = int(os.environ.get('WARMUP_LIST_PAGES', 3))
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', 'true').lower() == 'true'
+
+# Размер пула потоков для параллельной записи загружаемых фото объявления
+# (siteapp.uploads).
+PHOTO_UPLOAD_WORKERS = int(os.environ.get('PHOTO_UPLOAD_WORKERS', 4))
+
+# Загрузка фото по частям (siteapp.uploads): наибольший размер файла и части
+# в байтах и время жизни брошенной сессии в часах.
+PHOTO_UPLOAD_MAX_SIZE = int(os.environ.get('PHOTO_UPLOAD_MAX_SIZE', 20 * 1024 * 1024))
+PHOTO_UPLOAD_CHUNK_SIZE = int(os.environ.get('PHOTO_UPLOAD_CHUNK_SIZE', 2 * 1024 * 1024))
+PHOTO_UPLOAD_SESSION_TTL = int(os.environ.get('PHOTO_UPLOAD_SESSION_TTL', 24))
+
 CELERY_TASK_SERIALIZER = 'json'
 
 CELERY_RESULT_SERIALIZER = 'json'
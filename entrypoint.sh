@@ -5,5 +5,7 @@ echo "Collecting static files..."
 python manage.py collectstatic --noinput
 echo "Applying database migrations..."
 python manage.py migrate
+echo "Warming caches..."
+python manage.py warm_caches || echo "Cache warm-up failed, continuing."
 echo "Starting Gunicorn..."
-exec gunicorn animals.wsgi:application --bind 0.0.0.0:8000 --workers 3
\ No newline at end of file
+exec gunicorn animals.wsgi:application --config gunicorn.conf.py
\ No newline at end of file
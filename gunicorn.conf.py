@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+"""
+Настройки gunicorn.
+
+После загрузки приложения каждый процесс синхронно прогревается
+(siteapp.warmup.start) до того, как начнёт принимать соединения; до
+окончания прогрева /testing/health/ отвечает 503.
+Отключается через WARMUP_ON_START=false.
+"""
+
+bind = "0.0.0.0:8000"
+workers = 3
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+
+    if settings.WARMUP_ON_START:
+        from django.db import connections
+
+        from siteapp import warmup
+
+        try:
+            warmup.start()
+        finally:
+            connections.close_all()
@@ -1,11 +1,16 @@
 # siteapp/admin.py
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 from django.http import HttpResponse
 import io, os
 from django.utils.translation import gettext_lazy as _
+from django.db import transaction
 from django.db.models import Count
 from django.conf import settings
+from . import lookups, region_activity
+from .caching import invalidate_statuses
+from .fingerprints import near_duplicates
 from .models import (
     Region,
     Role,
@@ -145,10 +150,8 @@ class RoleAdmin(admin.ModelAdmin):
 @admin.action(description="Проверить/Показать ID активных объявлений пользователей")
 def show_active_ad_ids_for_users(modeladmin, request, queryset):
     messages_to_user = []
-    active_status = None
-    try:
-        active_status = AdStatus.objects.get(name="Активно")
-    except AdStatus.DoesNotExist:
+    active_status = lookups.get_by_name(AdStatus, "Активно")
+    if active_status is None:
         modeladmin.message_user(
             request,
             "Ошибка: Статус 'Активно' для объявлений не найден в базе данных.",
@@ -508,8 +511,20 @@ export_advertisements_to_pdf.short_description = (
 @admin.action(description='Пометить выбранные как "Требует модерации"')
 def make_needs_moderation(modeladmin, request, queryset):
     try:
-        needs_moderation_status = AdStatus.objects.get(name="Требует модерации")
-        updated_count = queryset.update(status=needs_moderation_status)
+        needs_moderation_status = lookups.get_by_name(AdStatus, "Требует модерации")
+        if needs_moderation_status is None:
+            raise AdStatus.DoesNotExist
+        previous_status_ids = set(queryset.values_list("status_id", flat=True))
+        with transaction.atomic():
+            region_activity.apply_bulk_status_change(
+                queryset, needs_moderation_status.pk
+            )
+            # update() не вызывает сигналы, поэтому updated_at для условных
+            # запросов обновляется явно.
+            updated_count = queryset.update(
+                status=needs_moderation_status, updated_at=timezone.now()
+            )
+        invalidate_statuses(previous_status_ids | {needs_moderation_status.pk})
         modeladmin.message_user(
             request,
             f"{updated_count} объявлений были помечены как 'Требует модерации'.",
@@ -527,7 +542,9 @@ def delete_archived_ads(modeladmin, request, queryset):
 
     archived_status_name = "В архиве"
     try:
-        archived_status = AdStatus.objects.get(name=archived_status_name)
+        archived_status = lookups.get_by_name(AdStatus, archived_status_name)
+        if archived_status is None:
+            raise AdStatus.DoesNotExist
 
         ads_to_delete = queryset.filter(status=archived_status)
         deleted_count, _ = ads_to_delete.delete()
@@ -567,7 +584,13 @@ class AdvertisementAdmin(admin.ModelAdmin):
     date_hierarchy = "publication_date"
     inlines = [AdPhotoInline, AdResponseInline]
     actions = [export_advertisements_to_pdf, make_needs_moderation, delete_archived_ads]
-    readonly_fields = ("publication_date",)
+    readonly_fields = (
+        "publication_date",
+        "responses_count",
+        "rating_count",
+        "average_rating",
+        "near_duplicate_links",
+    )
 
     @admin.display(description=_("Заголовок (Животное)"), ordering="title")
     def title_with_animal(self, obj):
@@ -587,6 +610,22 @@ class AdvertisementAdmin(admin.ModelAdmin):
 
         return obj.user.region.name if obj.user.region else _("Не указан")
 
+    @admin.display(description=_("Похожие объявления"))
+    def near_duplicate_links(self, obj):
+        from django.urls import reverse
+
+        matches = near_duplicates(obj.simhash, exclude_pk=obj.pk)
+        if not matches:
+            return _("Нет")
+        return format_html_join(
+            ", ",
+            '<a href="{}">#{}</a> ({})',
+            (
+                (reverse("admin:siteapp_advertisement_change", args=[pk]), pk, distance)
+                for pk, distance in matches
+            ),
+        )
+
 
 @admin.register(AdvertisementRating)
 class AdvertisementRatingAdmin(admin.ModelAdmin):
@@ -0,0 +1,221 @@
+# siteapp/autocomplete.py
+"""
+Подсказки при вводе названий пород, регионов и окрасов.
+
+Индекс строится в памяти процесса из справочников (см. siteapp.lookups) и
+пересобирается при изменении их версии, поэтому подсказки не обращаются к
+базе данных.
+
+- Поиск по префиксу: названия нормализуются (fingerprints.normalize_text)
+  и хранятся в отсортированном массиве вместе с окончаниями, начинающимися
+  с каждого слова названия ("вислоухая" для "Шотландская вислоухая").
+  Совпадения с префиксом находятся двоичным поиском (bisect).
+- Опечатки: если совпадений по префиксу меньше limit, добавляются названия
+  с наибольшей долей общих триграмм (коэффициент Жаккара не ниже
+  MIN_TRIGRAM_SIMILARITY). Кандидаты выбираются по инвертированному индексу
+  триграмм.
+"""
+
+import threading
+import typing
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+
+from . import lookups
+from .fingerprints import normalize_text
+from .models import AnimalColor, Breed, Region
+
+KINDS = ("breed", "region", "color")
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MIN_TRIGRAM_SIMILARITY = 0.3
+# Запросы короче не ищутся по триграммам: у них слишком мало признаков.
+MIN_TRIGRAM_QUERY = 3
+
+
+@dataclass(frozen=True)
+class Entry:
+    """
+    Значение справочника в индексе.
+    """
+
+    id: int
+    name: str
+    species_id: typing.Optional[int] = None
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        data: typing.Dict[str, typing.Any] = {"id": self.id, "name": self.name}
+        if self.species_id is not None:
+            data["species_id"] = self.species_id
+        return data
+
+
+def trigrams(text: str) -> typing.Set[str]:
+    """
+    Триграммы нормализованного текста с пробелами по краям слов.
+    """
+    result: typing.Set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+@dataclass
+class Index:
+    """
+    Индекс значений одного справочника.
+
+    keys - отсортированные нормализованные названия и их окончания,
+    positions - номер значения для каждого ключа,
+    entries - значения справочника,
+    names - нормализованные названия значений,
+    grams - триграммы каждого значения,
+    postings - триграмма -> номера значений с ней.
+    """
+
+    entries: typing.List[Entry]
+    keys: typing.List[str] = field(default_factory=list)
+    positions: typing.List[int] = field(default_factory=list)
+    names: typing.List[str] = field(default_factory=list)
+    grams: typing.List[typing.Set[str]] = field(default_factory=list)
+    postings: typing.Dict[str, typing.List[int]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        pairs = []
+        for position, entry in enumerate(self.entries):
+            self.names.append(normalize_text(entry.name))
+            words = self.names[-1].split()
+            pairs.extend(
+                (" ".join(words[start:]), position) for start in range(len(words))
+            )
+            self.grams.append(trigrams(self.names[-1]))
+            for gram in self.grams[-1]:
+                self.postings.setdefault(gram, []).append(position)
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def _allowed(self, position: int, species_id: typing.Optional[int]) -> bool:
+        return species_id is None or self.entries[position].species_id == species_id
+
+    def prefix(
+        self, query: str, limit: int, species_id: typing.Optional[int] = None
+    ) -> typing.List[int]:
+        """
+        Номера значений, название которых или слово в нём начинается с query.
+        Сначала идут значения, совпавшие с начала названия.
+        """
+        found: typing.Dict[int, bool] = {}
+        for index in range(bisect_left(self.keys, query), len(self.keys)):
+            key, position = self.keys[index], self.positions[index]
+            if not key.startswith(query):
+                break
+            if self._allowed(position, species_id):
+                whole = key == self.names[position]
+                found[position] = found.get(position, False) or whole
+        ranked = sorted(
+            found,
+            key=lambda position: (not found[position], self.entries[position].name),
+        )
+        return ranked[:limit]
+
+    def similar(
+        self,
+        query: str,
+        limit: int,
+        species_id: typing.Optional[int] = None,
+        exclude: typing.Collection[int] = (),
+    ) -> typing.List[int]:
+        """
+        Номера значений, похожих на query по триграммам, от самых похожих.
+        """
+        wanted = trigrams(query)
+        shared: typing.Counter[int] = Counter()
+        for gram in wanted:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for position, common in shared.items():
+            if position in exclude or not self._allowed(position, species_id):
+                continue
+            similarity = common / len(wanted | self.grams[position])
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                scored.append((-similarity, self.entries[position].name, position))
+        scored.sort()
+        return [position for _, _, position in scored[:limit]]
+
+    def search(
+        self, text: str, limit: int, species_id: typing.Optional[int] = None
+    ) -> typing.List[Entry]:
+        query = normalize_text(text)
+        if not query:
+            return []
+        positions = self.prefix(query, limit, species_id)
+        if len(positions) < limit and len(query) >= MIN_TRIGRAM_QUERY:
+            positions += self.similar(
+                query, limit - len(positions), species_id, exclude=set(positions)
+            )
+        return [self.entries[position] for position in positions]
+
+
+_cached: typing.Optional[
+    typing.Tuple[typing.Tuple[int, int], typing.Dict[str, Index]]
+] = None
+_lock = threading.Lock()
+
+
+def build() -> typing.Dict[str, Index]:
+    """
+    Строит индексы всех справочников; породы читаются одним запросом.
+    """
+    return {
+        "breed": Index(
+            [
+                Entry(pk, name, species_id)
+                for pk, name, species_id in Breed.objects.order_by("name").values_list(
+                    "pk", "name", "species_id"
+                )
+            ]
+        ),
+        "region": Index([Entry(row.pk, row.name) for row in lookups.all_rows(Region)]),
+        "color": Index(
+            [Entry(row.pk, row.name) for row in lookups.all_rows(AnimalColor)]
+        ),
+    }
+
+
+def indexes() -> typing.Dict[str, Index]:
+    """
+    Возвращает индексы для текущей версии справочников, строя их при её
+    изменении.
+    """
+    global _cached
+    version = lookups.version_key()
+    cached = _cached
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        if _cached is None or _cached[0] != version:
+            _cached = (version, build())
+        return _cached[1]
+
+
+def suggest(
+    kind: str,
+    text: str,
+    limit: int = DEFAULT_LIMIT,
+    species_id: typing.Optional[int] = None,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Возвращает подсказки для введённого текста.
+
+    :param kind: справочник - "breed", "region" или "color"
+    :param text: введённый текст
+    :param limit: наибольшее количество подсказок
+    :param species_id: только породы этого вида
+    :return: словари с id, name и (для пород) species_id
+    """
+    return [
+        entry.as_dict() for entry in indexes()[kind].search(text, limit, species_id)
+    ]
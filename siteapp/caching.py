@@ -0,0 +1,170 @@
+# siteapp/caching.py
+"""
+Кэширование ответов API объявлений с версионной инвалидацией.
+
+Ключ кэшированного ответа включает номера поколений:
+
+- эпоха (`ads:gen:epoch`) меняется при изменениях, затрагивающих все
+  объявления сразу (справочники);
+- поколение статуса (`ads:gen:status:<id>`) меняется при изменении
+  объявления в этом статусе, включая его фото, счётчики, животное и
+  выводимые данные автора;
+- общее поколение (`ads:gen:all`) меняется при изменении любого объявления.
+
+Ответы с фильтром по статусу зависят только от поколения своего статуса,
+остальные - от общего поколения. Увеличение поколения делает старые ключи
+недостижимыми, а сами записи вытесняются по TTL, поэтому полная очистка
+кэша не нужна. Поколения увеличиваются после фиксации транзакции.
+"""
+
+import hashlib
+import time
+import typing
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+EPOCH_KEY = "ads:gen:epoch"
+ALL_SCOPE = "all"
+STATS_KEYS = {"hits": "ads:list:stats:hits", "misses": "ads:list:stats:misses"}
+
+
+def _generation_key(scope: str) -> str:
+    return f"ads:gen:{scope}"
+
+
+def status_scope(status_id: typing.Any) -> str:
+    """
+    Возвращает область инвалидации для значения фильтра по статусу.
+
+    :param status_id: идентификатор статуса или None
+    :return: "status:<id>" для корректного идентификатора, иначе "all"
+    """
+    try:
+        return f"status:{int(status_id)}"
+    except (TypeError, ValueError):
+        return ALL_SCOPE
+
+
+def increment(key: str, initial: typing.Optional[int] = None) -> None:
+    """
+    Атомарно увеличивает бессрочный счётчик в кэше, создавая его при
+    отсутствии.
+
+    :param initial: начальное значение; по умолчанию время в наносекундах,
+        чтобы после вытеснения ключа номер версии или поколения не вернулся
+        к уже использованному
+    """
+    value = time.time_ns() if initial is None else initial
+    if not cache.add(key, value, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ вытеснен между add() и incr().
+            cache.set(key, value, timeout=None)
+
+
+def _bump(keys: typing.Iterable[str]) -> None:
+    for key in keys:
+        increment(key)
+
+
+def bump_status_generations(status_ids: typing.Iterable[typing.Any]) -> None:
+    """
+    Сразу увеличивает поколения указанных статусов и общее поколение.
+    """
+    scopes = {status_scope(status_id) for status_id in status_ids}
+    scopes.discard(ALL_SCOPE)
+    _bump(
+        [_generation_key(scope) for scope in sorted(scopes)]
+        + [_generation_key(ALL_SCOPE)]
+    )
+
+
+def invalidate_statuses(status_ids: typing.Iterable[typing.Any]) -> None:
+    """
+    Инвалидирует ответы для объявлений в указанных статусах после фиксации
+    текущей транзакции.
+    """
+    status_ids = set(status_ids)
+    transaction.on_commit(lambda: bump_status_generations(status_ids))
+
+
+def invalidate_advertisements(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Инвалидирует ответы, в которые могут входить указанные объявления.
+    """
+    from .models import Advertisement
+
+    status_ids = set(
+        Advertisement.objects.filter(pk__in=list(advertisement_ids))
+        .order_by()
+        .values_list("status_id", flat=True)
+        .distinct()
+    )
+    if status_ids:
+        invalidate_statuses(status_ids)
+
+
+def invalidate_all() -> None:
+    """
+    Инвалидирует все кэшированные ответы объявлений после фиксации транзакции.
+    """
+    transaction.on_commit(lambda: _bump([EPOCH_KEY]))
+
+
+def current_epoch() -> int:
+    """
+    Возвращает текущую эпоху - номер поколения изменений справочников.
+    """
+    return cache.get(EPOCH_KEY, 0)
+
+
+def versioned_key(namespace: str, scope: str, fingerprint: str) -> str:
+    """
+    Возвращает ключ кэша с текущими поколениями эпохи и области.
+
+    :param namespace: вид кэшируемого ответа, например "list" или "facets"
+    :param scope: область инвалидации (см. status_scope)
+    :param fingerprint: нормализованное описание запроса
+    :return: ключ кэша
+    """
+    generation_key = _generation_key(scope)
+    generations = cache.get_many([EPOCH_KEY, generation_key])
+    digest = hashlib.sha1(fingerprint.encode()).hexdigest()
+    return (
+        f"ads:{namespace}:{generations.get(EPOCH_KEY, 0)}:{scope}:"
+        f"{generations.get(generation_key, 0)}:{digest}"
+    )
+
+
+def list_cache_timeout() -> int:
+    return getattr(settings, "ADS_LIST_CACHE_TIMEOUT", 300)
+
+
+def record_lookup(hit: bool) -> None:
+    """
+    Учитывает попадание или промах кэша ответов списка.
+    """
+    increment(STATS_KEYS["hits" if hit else "misses"], initial=1)
+
+
+def cache_stats() -> typing.Dict[str, typing.Any]:
+    """
+    Возвращает счётчики попаданий и промахов кэша ответов списка.
+    """
+    values = cache.get_many(list(STATS_KEYS.values()))
+    hits = values.get(STATS_KEYS["hits"], 0)
+    misses = values.get(STATS_KEYS["misses"], 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "timeout": list_cache_timeout(),
+    }
+
+
+def reset_cache_stats() -> None:
+    cache.delete_many(list(STATS_KEYS.values()))
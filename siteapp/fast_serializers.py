@@ -0,0 +1,462 @@
+# siteapp/fast_serializers.py
+"""
+Быстрая сериализация списков только для чтения.
+
+Вместо экземпляров моделей и вложенных сериализаторов DRF строки берутся
+из `.values()`, а абсолютные URL файлов собираются из заранее вычисленного
+префикса без вызова `request.build_absolute_uri` на каждый файл. Результат
+совпадает байт в байт с эталонными сериализаторами (см. serializer_class),
+что проверяется тестами на паритет.
+
+Быстрый путь отключается настройкой `FAST_LIST_SERIALIZATION = False`.
+"""
+
+import typing
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import QuerySet
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.encoding import filepath_to_uri, force_str
+from rest_framework import serializers
+
+from . import images
+from .models import AdPhoto, Animal, Article
+from .serializers import (
+    AdvertisementListSerializer,
+    ArticleListSerializer,
+    HomePageAdSerializer,
+    HomePageArticleSerializer,
+)
+
+Row = typing.Dict[str, typing.Any]
+
+# Поля DRF, которыми форматируются значения, чтобы формат совпадал с
+# эталонными сериализаторами.
+_DATETIME = serializers.DateTimeField(format="%Y-%m-%dT%H:%M:%S.%fZ")
+_DEFAULT_DATETIME = serializers.DateTimeField()
+_DATE = serializers.DateField()
+
+
+def fast_serialization_enabled() -> bool:
+    return getattr(settings, "FAST_LIST_SERIALIZATION", True)
+
+
+class AbsoluteMediaUrl:
+    """
+    Строит абсолютные URL файлов хранилища для текущего запроса.
+
+    Для файловой системы с относительным MEDIA_URL префикс
+    "схема://хост/media/" вычисляется один раз; для прочих хранилищ
+    используется storage.url и request.build_absolute_uri.
+    """
+
+    def __init__(self, request, storage) -> None:
+        self.request = request
+        self.storage = storage
+        self.prefix: typing.Optional[str] = None
+        base_url = getattr(storage, "base_url", None)
+        if (
+            request is not None
+            and isinstance(storage, FileSystemStorage)
+            and base_url
+            and base_url.startswith("/")
+            and not base_url.startswith("//")
+        ):
+            self.prefix = request.build_absolute_uri(base_url)
+
+    def __call__(self, name: typing.Optional[str]) -> typing.Optional[str]:
+        if not name:
+            return None
+        if self.prefix is not None:
+            return self.prefix + filepath_to_uri(name).lstrip("/")
+        url = self.storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+
+def _str_or_none(value: typing.Any) -> typing.Optional[str]:
+    return None if value is None else str(value)
+
+
+def _float_or_none(value: typing.Any) -> typing.Optional[float]:
+    return None if value is None else float(value)
+
+
+def _truncate(text: typing.Optional[str], length: int) -> str:
+    if text:
+        return (text[:length] + "...") if len(text) > length else text
+    return ""
+
+
+class FastListSerializer:
+    """
+    Базовый класс быстрой сериализации.
+
+    Для каждого поля ответа описываются столбцы `.values()`, которые ему
+    нужны (field_columns), и метод `field_<имя>(row)`, возвращающий
+    значение. Набор полей берётся у эталонного сериализатора, в том числе с
+    учётом параметров `fields`/`omit`.
+
+    Атрибуты:
+        serializer_class: эталонный сериализатор DRF.
+        field_columns: столбцы `.values()` для каждого поля.
+        key_columns: столбцы, нужные всегда (например, для курсора).
+        annotation_columns: столбцы-аннотации, которые выбираются, только
+            если они есть в QuerySet.
+    """
+
+    serializer_class: typing.Type[serializers.Serializer]
+    field_columns: typing.Dict[str, typing.List[str]] = {}
+    key_columns: typing.Tuple[str, ...] = ("id",)
+    annotation_columns: typing.FrozenSet[str] = frozenset()
+
+    def __init__(self, request=None) -> None:
+        self.request = request
+        selected = getattr(self.serializer_class, "selected_field_names", None)
+        self.field_names: typing.List[str] = (
+            selected(request) if selected else list(self.serializer_class.Meta.fields)
+        )
+
+    def _available(self, queryset: QuerySet, columns: typing.Iterable[str]) -> list:
+        annotations = queryset.query.annotations
+        return [
+            column
+            for column in columns
+            if column not in self.annotation_columns or column in annotations
+        ]
+
+    def columns(self, queryset: QuerySet) -> typing.List[str]:
+        """
+        Возвращает столбцы `.values()` для выбранных полей.
+        """
+        columns = dict.fromkeys(self.key_columns)
+        for name in self.field_names:
+            columns.update(dict.fromkeys(self.field_columns.get(name, [])))
+        return self._available(queryset, columns)
+
+    def values_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        Превращает QuerySet модели в QuerySet словарей с нужными столбцами.
+
+        select_related и defer при этом игнорируются, prefetch_related
+        сбрасывается: связанные данные загружает prepare().
+        """
+        return queryset.prefetch_related(None).values(*self.columns(queryset))
+
+    def key_queryset(self, queryset: QuerySet) -> QuerySet:
+        """
+        QuerySet для подсчёта и пагинации без соединений со связанными
+        таблицами.
+
+        Если выбранным полям соединения не нужны, сразу выбираются все их
+        столбцы, иначе - только ключевые.
+        """
+        columns = self.columns(queryset)
+        if not any(LOOKUP_SEP in column for column in columns):
+            return self.values_queryset(queryset)
+        return queryset.prefetch_related(None).values(
+            *self._available(queryset, self.key_columns)
+        )
+
+    def rows_for_keys(
+        self, queryset: QuerySet, keys: typing.Iterable[Row]
+    ) -> typing.List[Row]:
+        """
+        Возвращает полные строки для ключей страницы в порядке ключей.
+        """
+        keys = list(keys)
+        if not keys or set(self.columns(queryset)) <= set(keys[0]):
+            return keys
+        ids = [key["id"] for key in keys]
+        rows = self.values_queryset(queryset.filter(pk__in=ids).order_by())
+        by_id = {row["id"]: row for row in rows}
+        return [by_id[pk] for pk in ids if pk in by_id]
+
+    def prepare(self, rows: typing.List[Row]) -> None:
+        """
+        Загружает данные, которые нельзя получить одним запросом с .values().
+        """
+
+    def serialize(self, rows: typing.Iterable[Row]) -> typing.List[Row]:
+        """
+        Сериализует строки `.values()` в список словарей ответа.
+        """
+        rows = list(rows)
+        self.prepare(rows)
+        getters = [(name, getattr(self, f"field_{name}")) for name in self.field_names]
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+    def field_id(self, row: Row) -> int:
+        return row["id"]
+
+    def field_title(self, row: Row) -> str:
+        return str(row["title"])
+
+
+class CoverPhotoMixin:
+    """
+    Обложка объявления (cover_photo) одним JOIN в основном запросе.
+    """
+
+    def prepare(self, rows: typing.List[Row]) -> None:
+        super().prepare(rows)
+        self.photo_url = AbsoluteMediaUrl(
+            self.request, AdPhoto._meta.get_field("image").storage
+        )
+
+    def field_first_photo_url(self, row: Row) -> typing.Optional[str]:
+        return self.photo_url(row["cover_photo__image"])
+
+    def field_cover_photo(self, row: Row) -> typing.Optional[Row]:
+        if not row["cover_photo__image"]:
+            return None
+        return {
+            "url": self.photo_url(row["cover_photo__image"]),
+            "width": row["cover_photo__width"],
+            "height": row["cover_photo__height"],
+            "renditions": images.rendition_data(
+                row["cover_photo__renditions"], self.photo_url
+            ),
+        }
+
+    def field_location(self, row: Row) -> str:
+        if row["user__region_id"] is not None:
+            return row["user__region__name"]
+        return "Не указано"
+
+
+class AdvertisementListFastSerializer(CoverPhotoMixin, FastListSerializer):
+    """
+    Быстрый путь для AdvertisementListSerializer.
+    """
+
+    serializer_class = AdvertisementListSerializer
+    field_columns = {
+        "title": ["title"],
+        "animal": [
+            "animal__name",
+            "animal__species__name",
+            "animal__breed__name",
+            "animal__breed__species__name",
+            "animal__color__name",
+            "animal__gender",
+            "animal__birth_date",
+        ],
+        "user": ["user_id", "user__display_name", "user__region__name"],
+        "status": ["status__name"],
+        "short_description": ["description"],
+        "publication_date": ["publication_date"],
+        "latitude": ["latitude"],
+        "longitude": ["longitude"],
+        "first_photo_url": ["cover_photo__image"],
+        "cover_photo": [
+            "cover_photo__image",
+            "cover_photo__width",
+            "cover_photo__height",
+            "cover_photo__renditions",
+        ],
+        "location": ["user__region_id", "user__region__name"],
+        "comments_count": ["responses_count"],
+        "average_rating": ["average_rating"],
+        "rating_count": ["rating_count"],
+        "distance_km": ["distance_km"],
+    }
+    # Ключи курсорной пагинации (см. AdsCursorPagination).
+    key_columns = ("id", "publication_date", "distance_km")
+    annotation_columns = frozenset({"distance_km"})
+
+    def prepare(self, rows: typing.List[Row]) -> None:
+        super().prepare(rows)
+        self.gender_labels = dict(Animal._meta.get_field("gender").flatchoices)
+
+    def field_animal(self, row: Row) -> Row:
+        breed = row["animal__breed__name"]
+        gender = row["animal__gender"]
+        gender_label = force_str(
+            self.gender_labels.get(gender, gender), strings_only=True
+        )
+        birth_date = row["animal__birth_date"]
+        return {
+            "name": _str_or_none(row["animal__name"]),
+            "species": str(row["animal__species__name"]),
+            "breed": (
+                None
+                if breed is None
+                else f"{breed} ({row['animal__breed__species__name']})"
+            ),
+            "color": _str_or_none(row["animal__color__name"]),
+            "gender": _str_or_none(gender_label),
+            "birth_date": (
+                None if birth_date is None else _DATE.to_representation(birth_date)
+            ),
+        }
+
+    def field_user(self, row: Row) -> Row:
+        return {
+            "id": row["user_id"],
+            "display_name": str(row["user__display_name"]),
+            "region": _str_or_none(row["user__region__name"]),
+        }
+
+    def field_status(self, row: Row) -> str:
+        return str(row["status__name"])
+
+    def field_short_description(self, row: Row) -> str:
+        return _truncate(row["description"], 100)
+
+    def field_publication_date(self, row: Row) -> typing.Optional[str]:
+        return _DATETIME.to_representation(row["publication_date"])
+
+    def field_latitude(self, row: Row) -> typing.Optional[float]:
+        return _float_or_none(row["latitude"])
+
+    def field_longitude(self, row: Row) -> typing.Optional[float]:
+        return _float_or_none(row["longitude"])
+
+    def field_comments_count(self, row: Row) -> int:
+        return int(row["responses_count"])
+
+    def field_average_rating(self, row: Row) -> typing.Optional[float]:
+        return _float_or_none(row["average_rating"])
+
+    def field_rating_count(self, row: Row) -> int:
+        return int(row["rating_count"])
+
+    def field_distance_km(self, row: Row) -> typing.Optional[float]:
+        distance = row.get("distance_km")
+        return round(distance, 3) if distance is not None else None
+
+
+class HomePageAdFastSerializer(CoverPhotoMixin, FastListSerializer):
+    """
+    Быстрый путь для HomePageAdSerializer.
+    """
+
+    serializer_class = HomePageAdSerializer
+    field_columns = {
+        "title": ["title"],
+        "short_description": ["description"],
+        "publication_date": ["publication_date"],
+        "first_photo_url": ["cover_photo__image"],
+        "cover_photo": [
+            "cover_photo__image",
+            "cover_photo__width",
+            "cover_photo__height",
+            "cover_photo__renditions",
+        ],
+        "location": ["user__region_id", "user__region__name"],
+        "species_name": ["animal__species__name"],
+        "status_name": ["status__name"],
+    }
+
+    def field_short_description(self, row: Row) -> str:
+        return _truncate(row["description"], 120)
+
+    def field_publication_date(self, row: Row) -> typing.Optional[str]:
+        return _DATETIME.to_representation(row["publication_date"])
+
+    def field_species_name(self, row: Row) -> str:
+        return str(row["animal__species__name"])
+
+    def field_status_name(self, row: Row) -> str:
+        return str(row["status__name"])
+
+
+class ArticleFastSerializerMixin:
+    """
+    Общие поля статей: автор и абсолютный URL главного изображения.
+    """
+
+    def prepare(self, rows: typing.List[Row]) -> None:
+        super().prepare(rows)
+        self.image_url = AbsoluteMediaUrl(
+            self.request, Article._meta.get_field("main_image").storage
+        )
+
+    def field_author_name(self, row: Row) -> typing.Optional[str]:
+        if row["author_id"] is None:
+            return None
+        return str(row["author__display_name"])
+
+    def field_main_image_url(self, row: Row) -> typing.Optional[str]:
+        return self.image_url(row["main_image"])
+
+    def field_main_image_renditions(self, row: Row) -> typing.Optional[Row]:
+        return images.rendition_data(row["main_image_renditions"], self.image_url)
+
+
+class ArticleListFastSerializer(ArticleFastSerializerMixin, FastListSerializer):
+    """
+    Быстрый путь для ArticleListSerializer.
+    """
+
+    serializer_class = ArticleListSerializer
+    field_columns = {
+        "title": ["title"],
+        "excerpt": ["content"],
+        "publication_date": ["publication_date"],
+        "author_name": ["author_id", "author__display_name"],
+        "main_image_url": ["main_image"],
+        "main_image_renditions": ["main_image_renditions"],
+        "comments_count": ["comments_count"],
+    }
+    annotation_columns = frozenset({"comments_count"})
+
+    def prepare(self, rows: typing.List[Row]) -> None:
+        super().prepare(rows)
+        self.categories: typing.Dict[int, typing.List[Row]] = {}
+        if "categories" not in self.field_names or not rows:
+            return
+        # Порядок категорий - как у prefetch_related (ArticleCategory.Meta).
+        links = (
+            Article.categories.through.objects.filter(
+                article_id__in=[row["id"] for row in rows]
+            )
+            .order_by("articlecategory__name")
+            .values_list(
+                "article_id",
+                "articlecategory_id",
+                "articlecategory__name",
+                "articlecategory__slug",
+            )
+        )
+        for article_id, category_id, name, slug in links:
+            self.categories.setdefault(article_id, []).append(
+                {"id": category_id, "name": str(name), "slug": str(slug)}
+            )
+
+    def field_excerpt(self, row: Row) -> str:
+        return _truncate(row["content"], 150)
+
+    def field_publication_date(self, row: Row) -> typing.Optional[str]:
+        return _DATETIME.to_representation(row["publication_date"])
+
+    def field_categories(self, row: Row) -> typing.List[Row]:
+        return self.categories.get(row["id"], [])
+
+    def field_comments_count(self, row: Row) -> int:
+        return int(row["comments_count"])
+
+
+class HomePageArticleFastSerializer(ArticleFastSerializerMixin, FastListSerializer):
+    """
+    Быстрый путь для HomePageArticleSerializer.
+    """
+
+    serializer_class = HomePageArticleSerializer
+    field_columns = {
+        "title": ["title"],
+        "excerpt": ["content"],
+        "publication_date": ["publication_date"],
+        "author_name": ["author_id", "author__display_name"],
+        "main_image_url": ["main_image"],
+        "main_image_renditions": ["main_image_renditions"],
+    }
+
+    def field_excerpt(self, row: Row) -> str:
+        return _truncate(row["content"], 150)
+
+    def field_publication_date(self, row: Row) -> typing.Optional[str]:
+        return _DEFAULT_DATETIME.to_representation(row["publication_date"])
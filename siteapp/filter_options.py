@@ -0,0 +1,105 @@
+# siteapp/filter_options.py
+"""
+Набор значений фильтров объявлений с номером версии.
+
+Набор (регионы, виды, статусы, окрасы, пол, возрастные категории и породы,
+сгруппированные по виду) собирается один раз на версию справочников (см.
+siteapp.lookups) и хранится в памяти процесса вместе с готовым JSON. Версия
+набора - хэш его содержимого, поэтому она меняется только при изменении
+самих значений.
+
+Клиент узнаёт текущую версию по короткому ответу `filter-options/version/`
+и загружает набор по URL с версией `filter-options/<version>/`. Такой ответ
+никогда не меняется и кэшируется браузером и прокси бессрочно
+(Cache-Control: immutable).
+"""
+
+import hashlib
+import threading
+import typing
+from dataclasses import dataclass
+
+from rest_framework.renderers import JSONRenderer
+
+from . import lookups
+from .filters import AGE_CHOICES
+from .models import AdStatus, Animal, AnimalColor, Breed, Region, Species
+from .serializers import (
+    AdStatusSerializer,
+    AnimalColorSerializer,
+    RegionSerializer,
+    SpeciesSerializer,
+)
+
+VERSION_LENGTH = 16
+# Время хранения ответа с версией в кэше клиента, в секундах (год).
+MAX_AGE = 365 * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class Bundle:
+    """
+    Собранный набор значений фильтров.
+
+    version - хэш содержимого,
+    content - JSON набора с версией,
+    legacy_data - данные в формате прежнего ответа `filter-options/` с
+        плоским списком пород.
+    """
+
+    version: str
+    content: bytes
+    legacy_data: typing.Dict[str, typing.Any]
+
+
+_cached: typing.Optional[typing.Tuple[typing.Tuple[int, int], Bundle]] = None
+_lock = threading.Lock()
+
+
+def build() -> Bundle:
+    """
+    Собирает набор из справочников; породы читаются одним запросом.
+    """
+    common = {
+        "regions": RegionSerializer(lookups.all_rows(Region), many=True).data,
+        "species": SpeciesSerializer(lookups.all_rows(Species), many=True).data,
+        "ad_statuses": AdStatusSerializer(lookups.all_rows(AdStatus), many=True).data,
+        "colors": AnimalColorSerializer(lookups.all_rows(AnimalColor), many=True).data,
+        "genders": [
+            {"value": choice[0], "label": str(choice[1])}
+            for choice in Animal.GENDER_CHOICES
+        ],
+        "age_categories": [
+            {"value": choice[0], "label": choice[1]} for choice in AGE_CHOICES
+        ],
+    }
+    breeds = list(Breed.objects.order_by("name").values("id", "name", "species_id"))
+    breeds_by_species: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = {}
+    for breed in breeds:
+        breeds_by_species.setdefault(str(breed["species_id"]), []).append(
+            {"id": breed["id"], "name": breed["name"]}
+        )
+
+    data = {**common, "breeds_by_species": breeds_by_species}
+    version = hashlib.sha1(JSONRenderer().render(data)).hexdigest()[:VERSION_LENGTH]
+    return Bundle(
+        version=version,
+        content=JSONRenderer().render({"version": version, **data}),
+        legacy_data={**common, "breeds": breeds},
+    )
+
+
+def current() -> Bundle:
+    """
+    Возвращает набор для текущей версии справочников, собирая его при её
+    изменении.
+    """
+    global _cached
+    lookups_version = lookups.version_key()
+    cached = _cached
+    if cached is not None and cached[0] == lookups_version:
+        return cached[1]
+    with _lock:
+        if _cached is None or _cached[0] != lookups_version:
+            _cached = (lookups_version, build())
+        return _cached[1]
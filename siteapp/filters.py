@@ -1,8 +1,14 @@
 import django_filters
+from django import forms
+from datetime import date, datetime, time, timedelta
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from .models import Advertisement, Animal, Region, AdStatus, Species, AnimalColor, Breed
-from django.db.models import Q, QuerySet
+from django.db.models import Count, Q, QuerySet
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+from .search import search_advertisements
+from . import geo
 
 
 AGE_CHOICES = [
@@ -15,10 +21,82 @@ AGE_CHOICES = [
 ]
 
 
+def age_category_q(value: str, today: Optional[date] = None) -> Optional[Q]:
+    """
+    Возвращает условие на дату рождения животного для возрастной категории.
+
+    :param value: значение из AGE_CHOICES
+    :param today: дата, от которой считается возраст (по умолчанию сегодня)
+    :return: Q-объект или None для неизвестной категории
+    """
+    if value == "unknown":
+        return Q(animal__birth_date__isnull=True)
+
+    now = today or timezone.now().date()
+    if value == "0_0.5":
+        start_date = now - relativedelta(months=6)
+        end_date = now
+    elif value == "0.5_1":
+        start_date = now - relativedelta(years=1)
+        end_date = now - relativedelta(months=6)
+    elif value == "1_3":
+        start_date = now - relativedelta(years=3)
+        end_date = now - relativedelta(years=1)
+    elif value == "3_7":
+        start_date = now - relativedelta(years=7)
+        end_date = now - relativedelta(years=3)
+    elif value == "7_inf":
+        start_date = now - relativedelta(years=100)
+        end_date = now - relativedelta(years=7)
+    else:
+        return None
+
+    return Q(
+        animal__birth_date__isnull=False,
+        animal__birth_date__gte=start_date,
+        animal__birth_date__lte=end_date,
+    )
+
+
+# Радиус поиска "рядом со мной" по умолчанию и максимальный, км.
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+# Максимальное количество ближайших объявлений.
+MAX_NEAREST = 100
+
+
+class PointField(forms.CharField):
+    """
+    Поле формы для точки "lat,lon"; возвращает кортеж (широта, долгота).
+    """
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if not value:
+            return None
+        try:
+            return geo.parse_point(value)
+        except ValueError:
+            raise forms.ValidationError("Укажите точку в формате 'широта,долгота'.", code="invalid")
+
+
+class PointFilter(django_filters.CharFilter):
+    field_class = PointField
+
+
+class IntegerFilter(django_filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
 class AdvertisementFilter(django_filters.FilterSet):
     """
     Фильтр для объявлений, позволяющий фильтровать по региону, статусу объявления, виду, породе,
-    полу, окрасу, возрастной категории, поисковому запросу и дате публикации.
+    полу, окрасу, возрастной категории, поисковому запросу, дате публикации и
+    расстоянию до точки.
+
+    Поиск рядом с точкой: `near=lat,lon` и радиус `radius_km` (по умолчанию
+    DEFAULT_RADIUS_KM) или количество ближайших `nearest`. Результаты
+    сортируются по расстоянию (аннотация `distance_km`).
     """
 
     region = django_filters.ModelChoiceFilter(
@@ -52,16 +130,22 @@ class AdvertisementFilter(django_filters.FilterSet):
     )
 
     publication_date_after = django_filters.DateFilter(
-        field_name="publication_date",
-        lookup_expr="date__gte",
+        method="filter_publication_date_after",
         label="Опубликовано после (YYYY-MM-DD)",
     )
     publication_date_before = django_filters.DateFilter(
-        field_name="publication_date",
-        lookup_expr="date__lte",
+        method="filter_publication_date_before",
         label="Опубликовано до (YYYY-MM-DD)",
     )
 
+    near = PointFilter(method="filter_near", label="Рядом с точкой (широта,долгота)")
+    radius_km = django_filters.NumberFilter(
+        method="filter_near_option", min_value=0.01, max_value=MAX_RADIUS_KM, label="Радиус, км"
+    )
+    nearest = IntegerFilter(
+        method="filter_near_option", min_value=1, max_value=MAX_NEAREST, label="Количество ближайших"
+    )
+
     class Meta:
         model = Advertisement
         fields = [
@@ -75,8 +159,83 @@ class AdvertisementFilter(django_filters.FilterSet):
             "search",
             "publication_date_after",
             "publication_date_before",
+            # Поиск по расстоянию применяется последним, поверх остальных фильтров.
+            "near",
+            "radius_km",
+            "nearest",
         ]
 
+    # Поле группировки для фильтров, по которым считаются фасеты.
+    FACET_FIELDS = {
+        "region": "user__region",
+        "ad_status": "status",
+        "species": "animal__species",
+        "breed": "animal__breed",
+        "color": "animal__color",
+        "gender": "animal__gender",
+    }
+
+    def normalized_params(self) -> str:
+        """
+        Возвращает нормализованную строку переданных фильтров.
+
+        Учитываются только известные фильтры с непустыми значениями, в
+        алфавитном порядке, поисковый запрос приводится к нижнему регистру.
+        Эквивалентные запросы дают одну и ту же строку, а построение не
+        требует проверки формы и обращений к БД.
+        """
+        params = []
+        for name in sorted(self.filters):
+            value = " ".join(str(self.data.get(name) or "").split())
+            if not value:
+                continue
+            params.append((name, value.lower() if name == "search" else value))
+        return urlencode(params)
+
+    def _qs_without(self, excluded: str) -> QuerySet:
+        """
+        Применяет проверенные значения всех фильтров, кроме excluded.
+        """
+        queryset = self.queryset.all()
+        for name, value in self.form.cleaned_data.items():
+            if name != excluded:
+                queryset = self.filters[name].filter(queryset, value)
+        return queryset.order_by()
+
+    def facet_counts(self) -> Dict[str, Any]:
+        """
+        Считает количество объявлений для каждого значения фильтров.
+
+        Для каждого измерения применяются все фильтры, кроме его собственного,
+        чтобы было видно, сколько объявлений даст выбор другого значения.
+        Каждое измерение считается одним сгруппированным запросом, возрастные
+        категории и общее количество - одним запросом с условной агрегацией.
+
+        :return: общее количество и счётчики по значениям каждого фильтра
+        """
+        facets: Dict[str, Dict[str, int]] = {}
+        for name, field in self.FACET_FIELDS.items():
+            rows = (
+                self._qs_without(name).values_list(field).annotate(count=Count("pk"))
+            )
+            facets[name] = {
+                str(value): count for value, count in rows if value is not None
+            }
+
+        today = timezone.now().date()
+        aggregates = {
+            f"age_{index}": Count("pk", filter=age_category_q(value, today))
+            for index, (value, _) in enumerate(AGE_CHOICES)
+        }
+        selected_age = age_category_q(self.form.cleaned_data.get("age_category"), today)
+        aggregates["total"] = Count("pk", filter=selected_age)
+        result = self._qs_without("age_category").aggregate(**aggregates)
+        facets["age_category"] = {
+            value: result[f"age_{index}"]
+            for index, (value, _) in enumerate(AGE_CHOICES)
+        }
+        return {"total": result["total"], "facets": facets}
+
     def filter_by_age_category(
         self, queryset: QuerySet, name: str, value: str
     ) -> QuerySet:
@@ -88,48 +247,48 @@ class AdvertisementFilter(django_filters.FilterSet):
         :param value: Выбранная возрастная категория
         :return: Отфильтрованный QuerySet
         """
-        now = timezone.now().date()
-        if value == "unknown":
-            return queryset.filter(animal__birth_date__isnull=True)
-
-        min_age_delta, max_age_delta = None, None
-
-        if value == "0_0.5":
-            min_age_delta = relativedelta(months=0)
-            max_age_delta = relativedelta(months=6)
-            start_date = now - max_age_delta
-            end_date = now - min_age_delta
-        elif value == "0.5_1":
-            min_age_delta = relativedelta(months=6)
-            max_age_delta = relativedelta(years=1)
-            start_date = now - max_age_delta
-            end_date = now - min_age_delta
-        elif value == "1_3":
-            min_age_delta = relativedelta(years=1)
-            max_age_delta = relativedelta(years=3)
-            start_date = now - max_age_delta
-            end_date = now - min_age_delta
-        elif value == "3_7":
-            min_age_delta = relativedelta(years=3)
-            max_age_delta = relativedelta(years=7)
-            start_date = now - max_age_delta
-            end_date = now - min_age_delta
-        elif value == "7_inf":
-            max_age_delta = relativedelta(years=7)
-            start_date = now - relativedelta(years=100)
-            end_date = now - max_age_delta
-        else:
+        condition = age_category_q(value)
+        if condition is None:
             return queryset
+        return queryset.filter(condition)
+
+    @staticmethod
+    def _start_of_day(value: date) -> datetime:
+        """
+        Возвращает начало дня в текущем часовом поясе.
+        """
+        return timezone.make_aware(datetime.combine(value, time.min))
+
+    def filter_publication_date_after(
+        self, queryset: QuerySet, name: str, value: date
+    ) -> QuerySet:
+        """
+        Оставляет объявления, опубликованные в указанный день или позже.
 
-        return queryset.filter(
-            animal__birth_date__isnull=False,
-            animal__birth_date__gte=start_date,
-            animal__birth_date__lte=end_date,
-        )
+        Сравнение идёт с границей дня, а не с DATE(publication_date), чтобы
+        запрос мог использовать индексы по дате публикации.
+        """
+        if value:
+            return queryset.filter(publication_date__gte=self._start_of_day(value))
+        return queryset
+
+    def filter_publication_date_before(
+        self, queryset: QuerySet, name: str, value: date
+    ) -> QuerySet:
+        """
+        Оставляет объявления, опубликованные в указанный день или раньше.
+        """
+        if value:
+            return queryset.filter(
+                publication_date__lt=self._start_of_day(value + timedelta(days=1))
+            )
+        return queryset
 
     def global_search(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
         """
-        Выполняет глобальный поиск по заголовку, описанию и имени животного.
+        Выполняет полнотекстовый поиск по заголовку, описанию и имени животного.
+
+        Результаты сортируются по релевантности (см. siteapp.search).
 
         :param queryset: Исходный QuerySet
         :param name: Имя фильтра
@@ -137,9 +296,43 @@ class AdvertisementFilter(django_filters.FilterSet):
         :return: Отфильтрованный QuerySet
         """
         if value:
-            return queryset.filter(
-                Q(title__icontains=value)
-                | Q(description__icontains=value)
-                | Q(animal__name__icontains=value)
-            ).distinct()
+            return search_advertisements(queryset, value)
+        return queryset
+
+    def filter_near(self, queryset: QuerySet, name: str, value: tuple) -> QuerySet:
+        """
+        Оставляет объявления рядом с точкой и сортирует их по расстоянию.
+
+        С параметром `nearest` возвращает не более указанного количества
+        ближайших объявлений (в пределах `radius_km`, если он задан), иначе -
+        все объявления в радиусе `radius_km`.
+
+        :param queryset: Исходный QuerySet
+        :param name: Имя фильтра
+        :param value: Точка (широта, долгота)
+        :return: Отфильтрованный QuerySet с аннотацией distance_km
+        """
+        if not value:
+            return queryset
+        latitude, longitude = value
+        radius = self.form.cleaned_data.get("radius_km")
+        nearest = self.form.cleaned_data.get("nearest")
+        if nearest:
+            ids = geo.nearest_ids(
+                queryset, latitude, longitude, nearest,
+                max_radius_km=float(radius) if radius else geo.MAX_DISTANCE_KM,
+            )
+            queryset = queryset.filter(id__in=ids).annotate(
+                distance_km=geo.distance_expression(latitude, longitude)
+            )
+        else:
+            queryset = geo.within_radius(
+                queryset, latitude, longitude, float(radius or DEFAULT_RADIUS_KM)
+            )
+        return queryset.order_by("distance_km", "id")
+
+    def filter_near_option(self, queryset: QuerySet, name: str, value: Any) -> QuerySet:
+        """
+        Параметры radius_km и nearest учитываются фильтром near.
+        """
         return queryset
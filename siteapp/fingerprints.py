@@ -0,0 +1,164 @@
+# siteapp/fingerprints.py
+"""
+Отпечатки текста объявлений для поиска дубликатов.
+
+- content_hash - SHA-1 нормализованного описания (нижний регистр, "ё"
+  заменена на "е", без пунктуации и лишних пробелов). Точный повтор
+  объявления находится одним поиском по индексу.
+- SimHash - 64-битный отпечаток по символьным триграммам нормализованного
+  описания: у похожих текстов отличается в немногих битах (расстояние
+  Хэмминга). Замена слова меняет только триграммы вокруг него, поэтому
+  отпечаток меняется плавно: в объявлениях из 12-15 слов замена одного
+  слова отличается обычно на 6-10 бит.
+
+Для поиска почти-дубликатов отпечаток делится на SIMHASH_BANDS полос,
+которые хранятся в индексированной таблице AdvertisementSimhashBand. Если
+расстояние между отпечатками не больше NEAR_DUPLICATE_DISTANCE, то по
+принципу Дирихле у них совпадают хотя бы MIN_MATCHING_BANDS полос, поэтому
+кандидаты выбираются одним сгруппированным запросом по равным полосам, а
+расстояние проверяется уже для них.
+"""
+
+import hashlib
+import re
+import typing
+from collections import Counter
+
+from django.db.models import Count, Q
+
+SIMHASH_BITS = 64
+# Ширины полос в битах.
+SIMHASH_BAND_WIDTHS: typing.Tuple[int, ...] = (6, 6, 6, 6, 5, 5, 5, 5, 5, 5, 5, 5)
+SIMHASH_BANDS = len(SIMHASH_BAND_WIDTHS)
+NEAR_DUPLICATE_DISTANCE = 10
+# Столько полос гарантированно совпадает у отпечатков на расстоянии не больше
+# NEAR_DUPLICATE_DISTANCE.
+MIN_MATCHING_BANDS = SIMHASH_BANDS - NEAR_DUPLICATE_DISTANCE
+# Длина символьных n-грамм - признаков SimHash.
+SIMHASH_SHINGLE = 3
+# Статусы объявлений, среди которых ищутся повторы.
+DUPLICATE_CHECK_STATUSES = ("Найдено", "Потеряно", "Требует модерации")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: typing.Optional[str]) -> str:
+    """
+    Приводит текст к виду, в котором сравниваются описания.
+    """
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    return " ".join(words)
+
+
+def content_hash(text: typing.Optional[str]) -> str:
+    """
+    Возвращает хэш нормализованного текста или "", если текст пуст.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return ""
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest())
+
+
+def simhash(text: typing.Optional[str]) -> typing.Optional[int]:
+    """
+    Возвращает 64-битный SimHash текста (со знаком, как хранится в
+    BigIntegerField) или None, если в тексте нет слов.
+
+    Признаки - символьные триграммы нормализованного текста (с пробелами
+    между словами) с весом, равным числу их повторов.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    features = Counter(
+        normalized[start : start + SIMHASH_SHINGLE]
+        for start in range(max(1, len(normalized) - SIMHASH_SHINGLE + 1))
+    )
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in features.items():
+        value = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += weight if value >> bit & 1 else -weight
+    unsigned = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return to_signed(unsigned)
+
+
+def to_signed(value: int) -> int:
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << SIMHASH_BITS) - 1)
+
+
+def bands(fingerprint: int) -> typing.List[int]:
+    """
+    Делит отпечаток на полосы (значения от младших битов к старшим).
+    """
+    value = to_unsigned(fingerprint)
+    result = []
+    for width in SIMHASH_BAND_WIDTHS:
+        result.append(value & ((1 << width) - 1))
+        value >>= width
+    return result
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (to_unsigned(first) ^ to_unsigned(second)).bit_count()
+
+
+def bands_q(fingerprint: int) -> Q:
+    """
+    Условие для AdvertisementSimhashBand: совпадает хотя бы одна полоса.
+    """
+    condition = Q()
+    for band, value in enumerate(bands(fingerprint)):
+        condition |= Q(band=band, value=value)
+    return condition
+
+
+def near_duplicates(
+    fingerprint: typing.Optional[int],
+    exclude_pk: typing.Optional[int] = None,
+    max_distance: int = NEAR_DUPLICATE_DISTANCE,
+    limit: int = 20,
+) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Находит объявления всех пользователей с похожим описанием.
+
+    :param fingerprint: SimHash описания
+    :param exclude_pk: объявление, которое не включается в результат
+    :param max_distance: наибольшее расстояние Хэмминга
+    :param limit: наибольшее количество результатов
+    :return: пары (id объявления, расстояние) от самых похожих
+    """
+    from .models import Advertisement, AdvertisementSimhashBand
+
+    if fingerprint is None:
+        return []
+    min_matching_bands = max(1, SIMHASH_BANDS - max_distance)
+    candidate_ids = (
+        AdvertisementSimhashBand.objects.filter(bands_q(fingerprint))
+        .values("advertisement_id")
+        .annotate(matching=Count("id"))
+        .filter(matching__gte=min_matching_bands)
+        .values("advertisement_id")
+    )
+    candidates = (
+        Advertisement.objects.filter(
+            pk__in=candidate_ids, status__name__in=DUPLICATE_CHECK_STATUSES
+        )
+        .exclude(pk=exclude_pk)
+        .values_list("pk", "simhash")
+    )
+    matches = sorted(
+        (distance, pk)
+        for pk, value in candidates
+        if (distance := hamming_distance(fingerprint, value)) <= max_distance
+    )
+    return [(pk, distance) for distance, pk in matches[:limit]]
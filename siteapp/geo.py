@@ -0,0 +1,429 @@
+# siteapp/geo.py
+"""
+Географические вспомогательные функции для объявлений.
+
+Маркеры карты: ограничивающий прямоугольник (bbox) или тайл z/x/y,
+сетка кластеризации, привязанная к тайлам (строки сетки считаются в
+проекции Web Mercator, как и строки тайлов), и выборка маркеров одним
+сгруппированным запросом.
+
+Поиск "рядом со мной": у объявления хранится geohash координат
+(индексируемая колонка `geohash`). Кандидаты в радиусе отбираются по
+диапазонам префиксов geohash ячейки точки и восьми соседних, и только для
+них в БД считается точное расстояние по формуле гаверсинусов.
+"""
+
+import math
+import typing
+
+from django.db.models import (
+    Avg,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Min,
+    Q,
+    QuerySet,
+    Value,
+)
+from django.db.models.functions import (
+    ASin,
+    Cos,
+    Floor,
+    Greatest,
+    Least,
+    Ln,
+    Power,
+    Radians,
+    Sin,
+    Sqrt,
+    Tan,
+)
+
+# Максимальный уровень масштаба карты.
+MAX_ZOOM = 20
+# Начиная с этого масштаба точки возвращаются без кластеризации.
+UNCLUSTERED_ZOOM = 16
+# Число ячеек кластеризации по каждой оси тайла (256 px / 4 = 64 px).
+CLUSTER_CELLS_PER_TILE = 4
+# Наибольший размер bbox по каждой оси в тайлах на масштабе без кластеризации
+# (экран 4K - около 15 x 9 тайлов).
+MAX_UNCLUSTERED_BBOX_TILES = 16
+# Наибольшее число маркеров без кластеризации; при превышении точки
+# кластеризуются и на крупном масштабе.
+MAX_UNCLUSTERED_MARKERS = 2000
+# Широта, на которой обрезается проекция Web Mercator.
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+# Длина geohash, хранимого у объявления (ячейка около 5 x 5 м).
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Средний радиус Земли и длина градуса меридиана, км.
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Половина длины экватора: радиус, покрывающий весь земной шар.
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+BBox = typing.Tuple[float, float, float, float]
+
+
+def parse_bbox(value: str) -> BBox:
+    """
+    Разбирает bbox вида "min_lon,min_lat,max_lon,max_lat".
+
+    min_lon может быть больше max_lon, если прямоугольник пересекает 180-й
+    меридиан.
+
+    :raises ValueError: если значение некорректно
+    """
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise ValueError("bbox должен содержать четыре числа")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError("некорректный диапазон широты")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError("некорректный диапазон долготы")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def parse_tile(value: str) -> typing.Tuple[int, int, int]:
+    """
+    Разбирает тайл вида "z/x/y" (схема XYZ, как у OpenStreetMap).
+
+    :raises ValueError: если значение некорректно
+    """
+    zoom, x, y = (int(part) for part in value.split("/"))
+    if not 0 <= zoom <= MAX_ZOOM or not (0 <= x < 2**zoom and 0 <= y < 2**zoom):
+        raise ValueError("тайл вне допустимого диапазона")
+    return zoom, x, y
+
+
+def tile_bbox(zoom: int, x: int, y: int) -> BBox:
+    """
+    Возвращает bbox тайла z/x/y.
+    """
+    n = 2**zoom
+
+    def latitude(tile_y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def bbox_q(bbox: BBox) -> Q:
+    """
+    Условие попадания координат объявления в bbox.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    condition = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon <= max_lon:
+        return condition & Q(longitude__gte=min_lon, longitude__lte=max_lon)
+    return condition & (Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+
+
+def tile_y(latitude: float, zoom: int) -> float:
+    """
+    Возвращает дробный номер строки тайла для широты (проекция Web Mercator).
+    """
+    latitude = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, latitude))
+    mercator = math.log(math.tan(math.pi / 4 + math.radians(latitude) / 2))
+    return (1 - mercator / math.pi) / 2 * 2**zoom
+
+
+def bbox_tiles(bbox: BBox, zoom: int) -> typing.Tuple[float, float]:
+    """
+    Возвращает размер bbox в тайлах масштаба zoom (по долготе и по широте).
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = max_lon - min_lon if min_lon <= max_lon else max_lon - min_lon + 360
+    return width / 360 * 2**zoom, tile_y(min_lat, zoom) - tile_y(max_lat, zoom)
+
+
+def check_bbox_size(bbox: BBox, zoom: int) -> None:
+    """
+    Проверяет, что bbox на масштабе без кластеризации не больше
+    MAX_UNCLUSTERED_BBOX_TILES тайлов по каждой оси.
+
+    :raises ValueError: если bbox слишком велик
+    """
+    if zoom >= UNCLUSTERED_ZOOM and max(bbox_tiles(bbox, zoom)) > (
+        MAX_UNCLUSTERED_BBOX_TILES
+    ):
+        raise ValueError("bbox слишком велик для этого масштаба")
+
+
+def cluster_cells(zoom: int) -> int:
+    """
+    Число ячеек кластеризации по каждой оси карты на масштабе zoom.
+
+    Сетка привязана к тайлам, поэтому кластеры соседних тайлов не
+    пересекаются и не зависят от того, каким bbox запрошена карта.
+    """
+    return 2**zoom * CLUSTER_CELLS_PER_TILE
+
+
+def _cluster_rows(queryset: QuerySet, zoom: int) -> QuerySet:
+    """
+    Группирует объявления по ячейкам сетки: столбец - по долготе, строка -
+    по широте в проекции Web Mercator (как tile_y).
+    """
+    cells = cluster_cells(zoom)
+    latitude = Radians(
+        Least(
+            Greatest(F("latitude"), Value(-MAX_MERCATOR_LATITUDE)),
+            Value(MAX_MERCATOR_LATITUDE),
+        )
+    )
+    mercator = Ln(Tan(Value(math.pi / 4) + latitude / Value(2.0)))
+    return (
+        queryset.annotate(
+            cell_y=Floor(
+                (Value(1.0) - mercator / Value(math.pi)) / Value(2.0) * Value(cells)
+            ),
+            cell_x=Floor((F("longitude") + Value(180.0)) / Value(360.0) * Value(cells)),
+        )
+        .values("cell_y", "cell_x")
+        .annotate(
+            count=Count("id"),
+            lat=Avg("latitude"),
+            lon=Avg("longitude"),
+            ad_id=Min("id"),
+            species_id=Min("animal__species_id"),
+            status_id=Min("status_id"),
+        )
+        .order_by("cell_y", "cell_x")
+    )
+
+
+def markers(queryset: QuerySet, zoom: int) -> typing.Dict[str, typing.Any]:
+    """
+    Возвращает компактные маркеры объявлений для карты.
+
+    На масштабе ниже UNCLUSTERED_ZOOM, а также если точек больше
+    MAX_UNCLUSTERED_MARKERS, точки группируются по ячейкам сетки одним
+    запросом GROUP BY; ячейка с одной точкой возвращается как обычный
+    маркер.
+
+    :param queryset: отфильтрованные объявления с координатами
+    :param zoom: масштаб карты
+    :return: {"zoom", "clustered", "markers": [[id, lat, lon, species_id,
+        status_id], ...], "clusters": [[lat, lon, count], ...]}
+    """
+    queryset = queryset.order_by()
+    if zoom >= UNCLUSTERED_ZOOM:
+        rows = list(
+            queryset.values_list(
+                "id", "latitude", "longitude", "animal__species_id", "status_id"
+            )[: MAX_UNCLUSTERED_MARKERS + 1]
+        )
+        if len(rows) <= MAX_UNCLUSTERED_MARKERS:
+            return {
+                "zoom": zoom,
+                "clustered": False,
+                "markers": [
+                    [ad_id, round(lat, 6), round(lon, 6), species_id, status_id]
+                    for ad_id, lat, lon, species_id, status_id in rows
+                ],
+                "clusters": [],
+            }
+
+    result = {"zoom": zoom, "clustered": True, "markers": [], "clusters": []}
+    for row in _cluster_rows(queryset, zoom):
+        if row["count"] == 1:
+            result["markers"].append(
+                [
+                    row["ad_id"],
+                    round(row["lat"], 6),
+                    round(row["lon"], 6),
+                    row["species_id"],
+                    row["status_id"],
+                ]
+            )
+        else:
+            result["clusters"].append(
+                [round(row["lat"], 5), round(row["lon"], 5), row["count"]]
+            )
+    return result
+
+
+def encode_geohash(
+    latitude: float, longitude: float, precision: int = GEOHASH_PRECISION
+) -> str:
+    """
+    Кодирует координаты в geohash заданной длины.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            bounds[0] = middle
+        else:
+            bits *= 2
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> typing.Tuple[float, float]:
+    """
+    Возвращает размер ячейки geohash длины precision в градусах (широта, долгота).
+    """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def parse_point(value: str) -> typing.Tuple[float, float]:
+    """
+    Разбирает точку вида "lat,lon".
+
+    :raises ValueError: если значение некорректно
+    """
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 2 or not all(math.isfinite(part) for part in parts):
+        raise ValueError("точка должна содержать два числа")
+    latitude, longitude = parts
+    if not -90 <= latitude <= 90:
+        raise ValueError("некорректная широта")
+    if not -180 <= longitude <= 180:
+        raise ValueError("некорректная долгота")
+    return latitude, longitude
+
+
+def geohash_cells(
+    latitude: float, longitude: float, radius_km: float
+) -> typing.List[str]:
+    """
+    Возвращает префиксы geohash, ячейки которых покрывают круг радиуса radius_km.
+
+    Выбирается самая длинная длина префикса, ячейка которой не меньше радиуса
+    по обеим осям; тогда круг целиком лежит в ячейке точки и восьми соседних.
+    Пустой список означает, что круг слишком велик для отсечения по geohash.
+    """
+    lat_span = radius_km / KM_PER_DEGREE
+    # Долготный размер берётся на ближайшей к полюсу широте круга.
+    cos_lat = math.cos(math.radians(min(90.0, abs(latitude) + lat_span)))
+    lon_span = lat_span / cos_lat if cos_lat > 1e-9 else math.inf
+
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        cell_lat, cell_lon = geohash_cell_size(candidate)
+        if cell_lat < lat_span or cell_lon < lon_span:
+            break
+        precision = candidate
+    if not precision:
+        return []
+
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    cells = set()
+    for dy in (-1, 0, 1):
+        lat = min(90.0, max(-90.0, latitude + dy * cell_lat))
+        for dx in (-1, 0, 1):
+            lon = (longitude + dx * cell_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(lat, lon, precision))
+    return sorted(cells)
+
+
+def _next_prefix(prefix: str) -> typing.Optional[str]:
+    """
+    Возвращает наименьшую строку, большую всех строк с префиксом prefix.
+
+    Алфавит geohash упорядочен, поэтому достаточно увеличить последний
+    символ, отличный от "z"; None - если такой строки нет.
+    """
+    stripped = prefix.rstrip(GEOHASH_ALPHABET[-1])
+    if not stripped:
+        return None
+    last = GEOHASH_ALPHABET.index(stripped[-1])
+    return stripped[:-1] + GEOHASH_ALPHABET[last + 1]
+
+
+def geohash_q(cells: typing.Iterable[str]) -> Q:
+    """
+    Условие попадания geohash объявления в одну из ячеек.
+
+    Префикс задаётся диапазоном, а не LIKE, чтобы запрос шёл по индексу при
+    любом правиле сравнения строк.
+    """
+    condition = Q()
+    for cell in cells:
+        upper = _next_prefix(cell)
+        if upper is None:
+            condition |= Q(geohash__gte=cell)
+        else:
+            condition |= Q(geohash__gte=cell, geohash__lt=upper)
+    return condition
+
+
+def distance_expression(latitude: float, longitude: float) -> ExpressionWrapper:
+    """
+    Расстояние от объявления до точки в километрах (формула гаверсинусов).
+    """
+    lat0 = math.radians(latitude)
+    half_dlat = (Radians("latitude") - Value(lat0)) / Value(2.0)
+    half_dlon = (Radians("longitude") - Value(math.radians(longitude))) / Value(2.0)
+    haversine = Power(Sin(half_dlat), 2) + Value(math.cos(lat0)) * Cos(
+        Radians("latitude")
+    ) * Power(Sin(half_dlon), 2)
+    return ExpressionWrapper(
+        Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(Least(haversine, Value(1.0)))),
+        output_field=FloatField(),
+    )
+
+
+def within_radius(
+    queryset: QuerySet, latitude: float, longitude: float, radius_km: float
+) -> QuerySet:
+    """
+    Оставляет объявления в радиусе radius_km от точки.
+
+    Добавляет аннотацию `distance_km`.
+    """
+    cells = geohash_cells(latitude, longitude, radius_km)
+    if cells:
+        queryset = queryset.filter(geohash_q(cells))
+    else:
+        queryset = queryset.filter(latitude__isnull=False, longitude__isnull=False)
+    return queryset.annotate(
+        distance_km=distance_expression(latitude, longitude)
+    ).filter(distance_km__lte=radius_km)
+
+
+def nearest_ids(
+    queryset: QuerySet,
+    latitude: float,
+    longitude: float,
+    limit: int,
+    max_radius_km: float = MAX_DISTANCE_KM,
+    start_radius_km: float = 1.0,
+) -> typing.List[int]:
+    """
+    Возвращает id не более limit ближайших к точке объявлений.
+
+    Радиус поиска растёт в четыре раза, пока в нём не наберётся limit
+    объявлений: найденные в круге объявления заведомо ближе остальных, а
+    отсечение по geohash работает на каждом шаге.
+    """
+    radius = min(start_radius_km, max_radius_km)
+    while True:
+        ids = list(
+            within_radius(queryset.order_by(), latitude, longitude, radius)
+            .order_by("distance_km", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if len(ids) >= limit or radius >= max_radius_km:
+            return ids
+        radius = min(radius * 4, max_radius_km)
@@ -0,0 +1,268 @@
+# siteapp/homepage.py
+"""
+Снимок главной страницы в кэше.
+
+Данные главной страницы (build_data) собираются несколькими запросами, а
+меняются редко, поэтому готовый JSON хранится в кэше (Redis) и отдаётся
+представлением без обращения к базе и без сериализации.
+
+- Сохранение или удаление объявлений, их фотографий и животных, статей,
+  пользователей и справочников ставит пересборку в очередь Celery с
+  задержкой HOME_PAGE_SNAPSHOT_DEBOUNCE секунд; изменения за это время
+  попадают в одну пересборку (см. siteapp.tasks.enqueue_home_page_snapshot).
+- Периодическая задача пересобирает снимок на случай пропущенных изменений.
+- Снимок старше HOME_PAGE_SNAPSHOT_TTL секунд считается устаревшим: его
+  пересобирает один запрос, взявший блокировку, а остальные запросы в это
+  время получают прежний снимок.
+
+URL изображений в ответе абсолютные, поэтому снимок хранится отдельно для
+каждого источника (схема и хост), с которого открывали главную страницу.
+"""
+
+import hashlib
+import time
+import typing
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import caching, lookups, region_activity
+from .fast_serializers import (
+    HomePageAdFastSerializer,
+    HomePageArticleFastSerializer,
+    fast_serialization_enabled,
+)
+from .models import AdStatus, Advertisement, Article
+from .serializers import (
+    HomePageAdSerializer,
+    HomePageArticleSerializer,
+    RegionActivitySerializer,
+)
+
+ORIGINS_KEY = "homepage:origins"
+GENERATION_KEY = "homepage:gen"
+SCHEDULED_KEY = "homepage:scheduled"
+# Сколько источников хранится; при превышении забываются самые давние.
+MAX_ORIGINS = 10
+# Устаревший снимок хранится дольше TTL, чтобы его можно было отдавать во
+# время пересборки.
+STALE_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 30
+
+
+def snapshot_ttl() -> int:
+    return getattr(settings, "HOME_PAGE_SNAPSHOT_TTL", 300)
+
+
+def debounce_delay() -> int:
+    return getattr(settings, "HOME_PAGE_SNAPSHOT_DEBOUNCE", 5)
+
+
+def _digest(origin: str) -> str:
+    return hashlib.sha1(origin.encode()).hexdigest()
+
+
+def _snapshot_key(origin: str) -> str:
+    return f"homepage:snapshot:{_digest(origin)}"
+
+
+def _lock_key(origin: str) -> str:
+    return f"homepage:lock:{_digest(origin)}"
+
+
+def build_data(request) -> typing.Dict[str, typing.Any]:
+    """
+    Собирает данные главной страницы:
+
+    - последние активные объявления (4);
+    - последнюю "большую" статью;
+    - несколько последних "маленьких" статей (2);
+    - 5 регионов с наибольшим количеством активных объявлений (по
+      счётчикам siteapp.region_activity).
+
+    :param request: запрос DRF; от него зависят абсолютные URL изображений
+    """
+    recent_ads = Advertisement.objects.none()
+    top_regions: typing.List[typing.Dict[str, typing.Any]] = []
+
+    active_status = lookups.get_by_name(AdStatus, "Активно")
+    try:
+        if active_status is not None:
+            recent_ads_qs = Advertisement.objects.filter(status=active_status)
+            recent_ads = recent_ads_qs.select_related(
+                "animal__species", "user__region", "cover_photo"
+            ).order_by("-publication_date")[:4]
+    except Exception as e:
+        print(f"Error fetching recent ads: {e}")
+
+    latest_articles = (
+        Article.objects.select_related("author")
+        .prefetch_related("categories")
+        .order_by("-publication_date")
+    )
+
+    main_article_qs = latest_articles[:1]
+    side_articles_qs = latest_articles[1:3]
+
+    try:
+        if active_status is None:
+            raise AdStatus.DoesNotExist
+        top_regions = region_activity.top_regions(active_status.pk)
+    except AdStatus.DoesNotExist:
+        print("WARNING: AdStatus 'Активно' not found for top regions widget.")
+    except Exception as e:
+        print(f"Error fetching top regions: {e}")
+
+    serializer_context = {"request": request}
+
+    if fast_serialization_enabled():
+        ads_serializer = HomePageAdFastSerializer(request)
+        recent_ads_data = ads_serializer.serialize(
+            ads_serializer.values_queryset(recent_ads)
+        )
+        articles_serializer = HomePageArticleFastSerializer(request)
+        main_article_data = articles_serializer.serialize(
+            articles_serializer.values_queryset(main_article_qs)
+        )
+        side_articles_data = articles_serializer.serialize(
+            articles_serializer.values_queryset(side_articles_qs)
+        )
+    else:
+        recent_ads_data = HomePageAdSerializer(
+            recent_ads, many=True, context=serializer_context
+        ).data
+        main_article_data = HomePageArticleSerializer(
+            main_article_qs, many=True, context=serializer_context
+        ).data
+        side_articles_data = HomePageArticleSerializer(
+            side_articles_qs, many=True, context=serializer_context
+        ).data
+    top_regions_serializer = RegionActivitySerializer(
+        top_regions, many=True, context=serializer_context
+    )
+
+    return {
+        "recent_ads": recent_ads_data,
+        "main_article": main_article_data[0] if main_article_data else None,
+        "side_articles": side_articles_data,
+        "top_regions": top_regions_serializer.data,
+    }
+
+
+class _OriginRequest(HttpRequest):
+    """
+    Запрос без клиента для сборки снимка вне HTTP-запроса (в задаче
+    Celery): от него нужны только схема и хост для абсолютных URL.
+    """
+
+    def __init__(self, origin: str) -> None:
+        super().__init__()
+        parts = urlsplit(origin)
+        self._origin_scheme = parts.scheme
+        self.META["HTTP_HOST"] = parts.netloc
+        self.META["SERVER_NAME"] = parts.hostname or ""
+        self.META["SERVER_PORT"] = str(
+            parts.port or (443 if parts.scheme == "https" else 80)
+        )
+
+    def _get_scheme(self) -> str:
+        return self._origin_scheme
+
+
+def origin_of(request) -> str:
+    return request.build_absolute_uri("/")
+
+
+def _generation() -> int:
+    return cache.get(GENERATION_KEY, 0)
+
+
+def _remember_origin(origin: str) -> None:
+    origins = cache.get(ORIGINS_KEY) or {}
+    if origin not in origins:
+        origins[origin] = time.time()
+        newest = sorted(origins, key=origins.get, reverse=True)[:MAX_ORIGINS]
+        cache.set(ORIGINS_KEY, {name: origins[name] for name in newest}, None)
+
+
+def known_origins() -> typing.List[str]:
+    return list(cache.get(ORIGINS_KEY) or {})
+
+
+def _store(origin: str, request) -> bytes:
+    generation = _generation()
+    content = JSONRenderer().render(build_data(request))
+    cache.set(
+        _snapshot_key(origin),
+        {"content": content, "built_at": time.time(), "generation": generation},
+        STALE_TIMEOUT,
+    )
+    return content
+
+
+def _fresh(entry: typing.Optional[dict], generation: int) -> bool:
+    return (
+        entry is not None
+        and entry["generation"] == generation
+        and time.time() - entry["built_at"] < snapshot_ttl()
+    )
+
+
+def snapshot(request) -> bytes:
+    """
+    Возвращает JSON главной страницы для источника запроса.
+
+    Свежий снимок отдаётся как есть. Устаревший или отсутствующий снимок
+    пересобирает тот запрос, который взял блокировку; остальные получают
+    прежний снимок, а если его нет - собирают ответ без сохранения.
+
+    :param request: запрос DRF
+    """
+    origin = origin_of(request)
+    values = cache.get_many([_snapshot_key(origin), GENERATION_KEY])
+    entry = values.get(_snapshot_key(origin))
+    if _fresh(entry, values.get(GENERATION_KEY, 0)):
+        return entry["content"]
+    if cache.add(_lock_key(origin), 1, LOCK_TIMEOUT):
+        try:
+            _remember_origin(origin)
+            return _store(origin, request)
+        finally:
+            cache.delete(_lock_key(origin))
+    if entry is not None:
+        return entry["content"]
+    return JSONRenderer().render(build_data(request))
+
+
+def rebuild() -> int:
+    """
+    Пересобирает снимки для всех известных источников.
+
+    Источник, снимок которого сейчас собирает запрос, пропускается.
+
+    :return: количество пересобранных снимков
+    """
+    # Изменения после этой точки запланируют новую пересборку.
+    cache.delete(SCHEDULED_KEY)
+    rebuilt = 0
+    for origin in known_origins():
+        if not cache.add(_lock_key(origin), 1, LOCK_TIMEOUT):
+            continue
+        try:
+            _store(origin, Request(_OriginRequest(origin)))
+            rebuilt += 1
+        finally:
+            cache.delete(_lock_key(origin))
+    return rebuilt
+
+
+def expire() -> None:
+    """
+    Помечает все снимки устаревшими: следующий запрос пересоберёт снимок
+    своего источника.
+    """
+    caching.increment(GENERATION_KEY)
@@ -0,0 +1,275 @@
+# siteapp/images.py
+"""
+Производные версии (renditions) загруженных изображений.
+
+Фотографии объявлений, аватары и главные изображения статей хранятся в том
+виде, в котором их загрузили. Для показа в карточках и списках из них
+строятся уменьшенные копии фиксированной ширины в WebP и JPEG без
+метаданных (EXIF, GPS, ICC), а также крошечный размытый заполнитель
+(data URI), который фронтенд показывает до загрузки изображения.
+
+Описание версий хранится в JSON-поле модели (см. IMAGE_FIELDS):
+
+    {
+        "source": "<имя исходного файла>",
+        "width": 1920, "height": 1080,
+        "placeholder": "data:image/webp;base64,...",
+        "items": [{"name": "...", "width": 320, "height": 180, "format": "webp"}, ...]
+    }
+
+Версии строятся задачей Celery после сохранения модели (см. siteapp.signals,
+siteapp.tasks) и командой `generate_image_renditions` для уже загруженных
+файлов. Поле "source" позволяет определить, что исходный файл сменился и
+версии нужно построить заново.
+
+Для фотографий объявлений та же задача вычисляет перцептивный хэш и
+обновляет индекс похожих фотографий (см. siteapp.similarity).
+"""
+
+import base64
+import hashlib
+import os
+import typing
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db.models import Model
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageFilter, ImageOps
+
+from . import similarity
+
+# Ширины версий в пикселях; изображения не увеличиваются.
+RENDITION_WIDTHS: typing.Tuple[int, ...] = (320, 640, 1280)
+# Форматы версий: расширение файла -> формат Pillow.
+RENDITION_FORMATS: typing.Dict[str, str] = {"webp": "WEBP", "jpeg": "JPEG"}
+RENDITION_QUALITY = 80
+RENDITIONS_DIR = "renditions"
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+
+# Модели с изображениями: метка модели -> (поле изображения, поле версий).
+IMAGE_FIELDS: typing.Dict[str, typing.Tuple[str, str]] = {
+    "siteapp.AdPhoto": ("image", "renditions"),
+    "siteapp.User": ("avatar", "avatar_renditions"),
+    "siteapp.Article": ("main_image", "main_image_renditions"),
+}
+
+# Результаты process().
+UPDATED = "updated"
+SKIPPED = "skipped"
+CLEARED = "cleared"
+UNREADABLE = "unreadable"
+MISSING = "missing"
+
+
+def image_fields(instance: Model) -> typing.Optional[typing.Tuple[str, str]]:
+    """
+    Возвращает имена поля изображения и поля версий для экземпляра модели.
+    """
+    return IMAGE_FIELDS.get(instance._meta.label)
+
+
+def needs_renditions(instance: Model) -> bool:
+    """
+    Проверяет, устарели ли версии изображения экземпляра: файл загружен,
+    заменён или удалён после построения версий.
+    """
+    image_field, renditions_field = image_fields(instance)
+    image = getattr(instance, image_field)
+    renditions = getattr(instance, renditions_field) or {}
+    return (image.name or "") != renditions.get("source", "")
+
+
+def _flatten(image: Image.Image, background: str = "white") -> Image.Image:
+    """
+    Приводит изображение к RGB, накладывая прозрачные области на фон.
+    """
+    if image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    ):
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, background)
+        flat.paste(image, mask=image.getchannel("A"))
+        return flat
+    return image.convert("RGB")
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    # Метаданные не передаются в save(), поэтому в версии они не попадают.
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _placeholder(image: Image.Image) -> str:
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    small = image.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    data = base64.b64encode(_encode(small, "WEBP", PLACEHOLDER_QUALITY)).decode()
+    return f"data:image/webp;base64,{data}"
+
+
+def render(image_file: FieldFile) -> typing.Dict[str, typing.Any]:
+    """
+    Строит версии изображения и сохраняет их в хранилище файла.
+
+    :param image_file: файл поля изображения
+    :return: описание версий для JSON-поля модели
+    :raises OSError, ValueError: если файл недоступен или не является
+        изображением
+    """
+    storage = image_file.storage
+    with image_file.open("rb") as source:
+        with Image.open(source) as original:
+            # Поворот по EXIF применяется до удаления метаданных.
+            image = _flatten(ImageOps.exif_transpose(original))
+
+    stem = os.path.splitext(os.path.basename(image_file.name))[0]
+    digest = hashlib.sha1(image_file.name.encode()).hexdigest()[:8]
+    prefix = f"{RENDITIONS_DIR}/{digest[:2]}/{stem}-{digest}"
+
+    widths = [width for width in RENDITION_WIDTHS if width < image.width]
+    if not widths or image.width <= max(RENDITION_WIDTHS):
+        # Самая крупная версия - в исходной ширине, без увеличения.
+        widths.append(image.width)
+
+    items = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = (
+            image
+            if width == image.width
+            else image.resize((width, height), Image.Resampling.LANCZOS)
+        )
+        for extension, image_format in RENDITION_FORMATS.items():
+            name = storage.save(
+                f"{prefix}-{width}.{extension}",
+                ContentFile(_encode(resized, image_format, RENDITION_QUALITY)),
+            )
+            items.append(
+                {"name": name, "width": width, "height": height, "format": extension}
+            )
+
+    return {
+        "source": image_file.name,
+        "width": image.width,
+        "height": image.height,
+        "placeholder": _placeholder(image),
+        "items": items,
+    }
+
+
+def delete_rendition_files(renditions: typing.Dict[str, typing.Any], storage) -> None:
+    """
+    Удаляет файлы версий из хранилища.
+    """
+    for item in (renditions or {}).get("items", []):
+        storage.delete(item["name"])
+
+
+def rendition_data(
+    renditions: typing.Optional[typing.Dict[str, typing.Any]], url: typing.Callable
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """
+    Возвращает версии изображения для ответа API.
+
+    :param renditions: значение JSON-поля версий
+    :param url: функция, строящая абсолютный URL по имени файла
+    :return: {"placeholder": ..., "sources": [{"url", "width", "height",
+        "format"}, ...]} или None, если версии ещё не построены
+    """
+    if not renditions or not renditions.get("items"):
+        return None
+    return {
+        "placeholder": renditions["placeholder"],
+        "sources": [
+            {
+                "url": url(item["name"]),
+                "width": item["width"],
+                "height": item["height"],
+                "format": item["format"],
+            }
+            for item in renditions["items"]
+        ],
+    }
+
+
+def _after_update(instance: Model) -> None:
+    """
+    Отмечает изменение и инвалидирует кэш ответов, в которые входит
+    изображение.
+    """
+    from . import caching, signals
+
+    label = instance._meta.label
+    if label == "siteapp.AdPhoto":
+        signals.touch_advertisements([instance.advertisement_id])
+        caching.invalidate_advertisements([instance.advertisement_id])
+    elif label == "siteapp.Article":
+        signals.touch_articles([instance.pk])
+    else:
+        # Аватары выводятся в деталях объявлений и статей.
+        signals.touch_user_content(instance.pk)
+
+
+def process(model_label: str, pk: typing.Any, force: bool = False) -> str:
+    """
+    Строит или удаляет версии изображения одного объекта.
+
+    Версии записываются UPDATE без сигналов и только если исходный файл
+    не сменился за время обработки; старые файлы версий удаляются. Для
+    AdPhoto вместе с версиями записывается перцептивный хэш.
+
+    :param model_label: метка модели из IMAGE_FIELDS
+    :param pk: первичный ключ объекта
+    :param force: построить версии, даже если они актуальны
+    :return: UPDATED, SKIPPED, CLEARED, UNREADABLE или MISSING
+    """
+    model = apps.get_model(model_label)
+    image_field, renditions_field = IMAGE_FIELDS[model_label]
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return MISSING
+
+    image = getattr(instance, image_field)
+    current = getattr(instance, renditions_field) or {}
+    storage = model._meta.get_field(image_field).storage
+    unchanged = {"pk": pk, image_field: image.name or ""}
+
+    is_photo = model_label == "siteapp.AdPhoto"
+    if not image:
+        if not current:
+            return SKIPPED
+        values = {renditions_field: {}}
+        if is_photo:
+            values["phash"] = None
+            similarity.index_photo(pk, None)
+        model._default_manager.filter(**unchanged).update(**values)
+        delete_rendition_files(current, storage)
+        _after_update(instance)
+        return CLEARED
+    if not force and not needs_renditions(instance):
+        return SKIPPED
+
+    try:
+        renditions = render(image)
+        phash = similarity.file_hash(image) if is_photo else None
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return UNREADABLE
+
+    values = {renditions_field: renditions}
+    if is_photo:
+        values.update(
+            width=renditions["width"], height=renditions["height"], phash=phash
+        )
+    if not model._default_manager.filter(**unchanged).update(**values):
+        # Файл заменили во время обработки: версии построит следующая задача.
+        delete_rendition_files(renditions, storage)
+        return SKIPPED
+    if is_photo:
+        similarity.index_photo(pk, phash)
+    delete_rendition_files(current, storage)
+    _after_update(instance)
+    return UPDATED
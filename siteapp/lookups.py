@@ -0,0 +1,173 @@
+# siteapp/lookups.py
+"""
+Кэш справочников в памяти процесса.
+
+Небольшие справочные таблицы (LOOKUP_MODELS: статусы объявлений, виды,
+регионы, роли, окрасы) читаются целиком одним запросом и хранятся в памяти
+процесса: поиск по id и по названию после этого не обращается к базе.
+
+Актуальность проверяется по общему номеру версии в кэше Django
+(`lookups:version`), который видят все процессы gunicorn и Celery. Внутри
+HTTP-запроса версия читается из кэша один раз и запоминается в потоке до
+конца запроса; вне запросов (задачи Celery, команды) - при каждом
+обращении. При сохранении или удалении строки справочника (в том числе
+породы, см. siteapp.filter_options) обработчик сигнала сразу сбрасывает
+таблицы своего процесса, а после фиксации транзакции увеличивает версию;
+остальные процессы перечитывают таблицу в следующем запросе.
+
+Возвращаемые объекты общие для всех потоков процесса и не должны
+изменяться.
+"""
+
+import threading
+import time
+import typing
+
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import models, transaction
+
+from . import caching
+
+VERSION_KEY = "lookups:version"
+LOOKUP_MODELS = ("AdStatus", "AnimalColor", "Region", "Role", "Species")
+
+
+class _Table(typing.NamedTuple):
+    version: int
+    rows: typing.List[models.Model]
+    by_pk: typing.Dict[int, models.Model]
+    by_name: typing.Dict[str, models.Model]
+
+
+_tables: typing.Dict[str, _Table] = {}
+_lock = threading.Lock()
+# Версия, прочитанная в текущем запросе потока (см. _start_request).
+_request = threading.local()
+# Количество сбросов справочников в этом процессе.
+_local_resets = 0
+
+
+def current_version() -> int:
+    """
+    Возвращает общий номер версии справочников.
+    """
+    version = getattr(_request, "version", None)
+    if version is not None:
+        return version
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Начальное значение берётся от времени, чтобы после вытеснения ключа
+        # версия не совпала с уже прочитанной каким-либо процессом.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY, 0)
+    if getattr(_request, "active", False):
+        _request.version = version
+    return version
+
+
+def _start_request(**kwargs) -> None:
+    _request.active = True
+    _request.version = None
+
+
+def _finish_request(**kwargs) -> None:
+    _request.active = False
+    _request.version = None
+
+
+request_started.connect(_start_request, dispatch_uid="siteapp.lookups.start")
+request_finished.connect(_finish_request, dispatch_uid="siteapp.lookups.finish")
+
+
+def version_key() -> typing.Tuple[int, int]:
+    """
+    Возвращает ключ для данных, производных от справочников: он меняется
+    и при увеличении общей версии, и при сбросе справочников процесса.
+    """
+    return current_version(), _local_resets
+
+
+def _table(model: typing.Type[models.Model]) -> _Table:
+    label = model._meta.label
+    if model.__name__ not in LOOKUP_MODELS:
+        raise ValueError(f"{label} is not a cached lookup model")
+    version = current_version()
+    table = _tables.get(label)
+    if table is not None and table.version == version:
+        return table
+    with _lock:
+        table = _tables.get(label)
+        if table is None or table.version != version:
+            rows = list(model.objects.all())
+            table = _Table(
+                version=version,
+                rows=rows,
+                by_pk={row.pk: row for row in rows},
+                by_name={row.name: row for row in rows},
+            )
+            _tables[label] = table
+    return table
+
+
+def all_rows(model: typing.Type[models.Model]) -> typing.List[models.Model]:
+    """
+    Возвращает все строки справочника в порядке Meta.ordering.
+    """
+    return list(_table(model).rows)
+
+
+def get(
+    model: typing.Type[models.Model], pk: typing.Any
+) -> typing.Optional[models.Model]:
+    """
+    Возвращает строку справочника по id или None.
+    """
+    try:
+        return _table(model).by_pk.get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_by_name(
+    model: typing.Type[models.Model], name: str
+) -> typing.Optional[models.Model]:
+    """
+    Возвращает строку справочника по названию или None.
+    """
+    return _table(model).by_name.get(name)
+
+
+def id_for(model: typing.Type[models.Model], name: str) -> typing.Optional[int]:
+    """
+    Возвращает id строки справочника по названию или None.
+    """
+    row = get_by_name(model, name)
+    return row.pk if row is not None else None
+
+
+def ids_for(
+    model: typing.Type[models.Model], names: typing.Iterable[str]
+) -> typing.List[int]:
+    """
+    Возвращает id найденных строк справочника по названиям.
+    """
+    by_name = _table(model).by_name
+    return [by_name[name].pk for name in names if name in by_name]
+
+
+def _bump_version() -> None:
+    caching.increment(VERSION_KEY)
+    # Следующее обращение в этом запросе увидит новую версию.
+    _request.version = None
+
+
+def invalidate() -> None:
+    """
+    Сбрасывает справочники текущего процесса сразу, а остальных процессов -
+    после фиксации транзакции.
+    """
+    global _local_resets
+    _tables.clear()
+    _local_resets += 1
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,50 @@
+# siteapp/management/commands/backfill_photo_dimensions.py
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from siteapp.caching import invalidate_advertisements
+from siteapp.models import AdPhoto
+
+
+class Command(BaseCommand):
+    help = "Reads width/height of advertisement photos that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of photos updated per batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        photos = (
+            AdPhoto.objects.filter(Q(width__isnull=True) | Q(height__isnull=True))
+            .only("id", "advertisement_id", "image", "width", "height")
+            .order_by("pk")
+        )
+
+        checked = 0
+        updated = []
+        unreadable = 0
+        for photo in photos.iterator(chunk_size=batch_size):
+            checked += 1
+            width, height = photo.read_dimensions()
+            if width is None or height is None:
+                unreadable += 1
+                continue
+            photo.width, photo.height = width, height
+            updated.append(photo)
+
+        AdPhoto.objects.bulk_update(updated, ["width", "height"], batch_size=batch_size)
+        if updated:
+            invalidate_advertisements({photo.advertisement_id for photo in updated})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {checked} photos, updated {len(updated)}, "
+                f"{unreadable} unreadable."
+            )
+        )
@@ -0,0 +1,98 @@
+# siteapp/management/commands/benchmark_photo_uploads.py
+
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from PIL import Image
+
+from siteapp.models import Advertisement
+from siteapp.uploads import PhotoUpload, upload_workers
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures photo ingestion for one advertisement: sequential writes "
+        "versus the thread pool used by AdvertisementManageSerializer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--photos", type=int, default=10, help="Photos uploaded per ad."
+        )
+        parser.add_argument(
+            "--size",
+            default="4000x3000",
+            help="Photo size in pixels, WIDTHxHEIGHT.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Number of ads per variant."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=upload_workers(),
+            help="Thread pool size for the concurrent variant.",
+        )
+
+    def handle(self, *args, **options):
+        advertisement = Advertisement.objects.order_by("pk").first()
+        if advertisement is None:
+            raise CommandError("At least one advertisement is required.")
+        try:
+            width, height = map(int, options["size"].lower().split("x"))
+        except ValueError:
+            raise CommandError("--size must look like 4000x3000.")
+
+        buffer = BytesIO()
+        Image.effect_noise((width, height), 64).convert("RGB").save(
+            buffer, "JPEG", quality=90
+        )
+        content = buffer.getvalue()
+        self.stdout.write(
+            f"{options['photos']} photos of {width}x{height} "
+            f"({len(content) / 1024 / 1024:.1f} MB each) per ad, "
+            f"{options['repeat']} ads per variant."
+        )
+
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                timings = {
+                    workers: self._measure(advertisement, content, workers, options)
+                    for workers in (1, options["workers"])
+                }
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        sequential = timings[1]
+        for workers, elapsed in timings.items():
+            self.stdout.write(
+                f"{workers} thread(s): {elapsed:.3f} s/ad "
+                f"({sequential / elapsed if elapsed else 0:.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
+
+    def _measure(self, advertisement, content: bytes, workers: int, options) -> float:
+        """
+        Возвращает среднее время загрузки фотографий одного объявления.
+        Строки фотографий откатываются после каждого прогона.
+        """
+        total = 0.0
+        for _ in range(options["repeat"]):
+            files = [
+                SimpleUploadedFile(f"photo-{i}.jpg", content, "image/jpeg")
+                for i in range(options["photos"])
+            ]
+            started = time.perf_counter()
+            with PhotoUpload(files, workers=workers) as upload:
+                with transaction.atomic():
+                    upload.create_photos(advertisement)
+                    total += time.perf_counter() - started
+                    transaction.set_rollback(True)
+        return total / options["repeat"]
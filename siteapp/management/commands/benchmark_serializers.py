@@ -0,0 +1,96 @@
+# siteapp/management/commands/benchmark_serializers.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from siteapp.fast_serializers import (
+    AdvertisementListFastSerializer,
+    ArticleListFastSerializer,
+    HomePageAdFastSerializer,
+    HomePageArticleFastSerializer,
+)
+from siteapp.models import Advertisement, Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares DRF serializers with the values-based fast path for list "
+        "endpoints and reports objects/sec for both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=48,
+            help="Number of objects serialized per run (one list page).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of runs per serializer.",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="Host used to build absolute media URLs.",
+        )
+
+    def handle(self, *args, **options):
+        limit = options["limit"]
+        repeat = options["repeat"]
+        request = Request(RequestFactory().get("/", HTTP_HOST=options["host"]))
+
+        ads = Advertisement.objects.order_by("-publication_date")
+        articles = Article.objects.order_by("-publication_date")
+        cases = [
+            ("advertisement list", AdvertisementListFastSerializer, ads),
+            ("article list", ArticleListFastSerializer, articles),
+            ("home page ads", HomePageAdFastSerializer, ads),
+            ("home page articles", HomePageArticleFastSerializer, articles),
+        ]
+        for label, fast_class, queryset in cases:
+            serializer_class = fast_class.serializer_class
+            optimize = getattr(serializer_class, "optimize_queryset", None)
+
+            def drf_run():
+                page = optimize(queryset, request) if optimize else queryset
+                return serializer_class(
+                    page[:limit], many=True, context={"request": request}
+                ).data
+
+            def fast_run():
+                fast = fast_class(request)
+                page = (optimize(queryset, request) if optimize else queryset)[:limit]
+                return fast.serialize(fast.values_queryset(page))
+
+            drf_rate, count = self._measure(drf_run, repeat)
+            fast_rate, _ = self._measure(fast_run, repeat)
+            if not count:
+                self.stdout.write(
+                    self.style.WARNING(f"{label}: no objects to serialize.")
+                )
+                continue
+            self.stdout.write(
+                f"{label}: {count} objects x {repeat} runs, "
+                f"serializer {drf_rate:,.0f} objects/sec, "
+                f"fast path {fast_rate:,.0f} objects/sec "
+                f"({fast_rate / drf_rate:.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished."))
+
+    @staticmethod
+    def _measure(run, repeat: int):
+        """
+        Возвращает скорость (объектов в секунду) и размер одного прогона.
+        """
+        count = len(run())  # прогрев
+        started = time.perf_counter()
+        for _ in range(repeat):
+            run()
+        elapsed = time.perf_counter() - started
+        return (count * repeat / elapsed if elapsed else 0.0), count
@@ -0,0 +1,105 @@
+# siteapp/management/commands/build_photo_hash_index.py
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from PIL import Image
+
+from siteapp import similarity
+from siteapp.models import AdPhoto
+
+
+def _init_worker() -> None:
+    # Для процессов, запущенных не через fork, Django настраивается заново.
+    django.setup()
+
+
+def _hash(pk: int):
+    photo = AdPhoto.objects.filter(pk=pk).first()
+    if photo is None or not photo.image:
+        return pk, None
+    try:
+        return pk, similarity.file_hash(photo.image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return pk, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes perceptual hashes of ad photos and builds the similar-photo "
+        "index. New photos are indexed by the image renditions task."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes; 1 hashes photos in this process.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Rehash all photos instead of only photos without a hash.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Photos written to the index per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        photos = AdPhoto.objects.exclude(image="")
+        if not options["rebuild"]:
+            photos = photos.filter(phash__isnull=True)
+        pks = list(photos.order_by("pk").values_list("pk", flat=True))
+        workers = max(1, options["workers"])
+        batch_size = max(1, options["batch_size"])
+
+        if workers == 1 or len(pks) < 2:
+            results = map(_hash, pks)
+            self._write(results, batch_size)
+        else:
+            # Соединения с БД не должны наследоваться процессами пула.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            ) as executor:
+                self._write(
+                    executor.map(
+                        _hash, pks, chunksize=max(1, len(pks) // workers // 4)
+                    ),
+                    batch_size,
+                )
+        self.stdout.write(self.style.SUCCESS("Photo hash index built."))
+
+    def _write(self, results, batch_size: int) -> None:
+        """
+        Записывает хэши и полосы индекса пачками.
+        """
+        hashed = unreadable = 0
+        batch = {}
+        for pk, value in results:
+            batch[pk] = value
+            if value is None:
+                unreadable += 1
+            else:
+                hashed += 1
+            if len(batch) >= batch_size:
+                self._flush(batch)
+                batch = {}
+        if batch:
+            self._flush(batch)
+        self.stdout.write(f"{hashed} photos hashed, {unreadable} unreadable.")
+
+    def _flush(self, batch) -> None:
+        with transaction.atomic():
+            AdPhoto.objects.bulk_update(
+                [AdPhoto(pk=pk, phash=value) for pk, value in batch.items()],
+                ["phash"],
+            )
+            similarity.index_photos(batch)
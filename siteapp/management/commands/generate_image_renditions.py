@@ -0,0 +1,83 @@
+# siteapp/management/commands/generate_image_renditions.py
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from siteapp import images
+
+
+def _init_worker() -> None:
+    # Для процессов, запущенных не через fork, Django настраивается заново.
+    django.setup()
+
+
+def _process(job) -> str:
+    model_label, pk, force = job
+    return images.process(model_label, pk, force=force)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates resized WebP/JPEG renditions and blur placeholders for "
+        "existing ad photos, avatars and article images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            choices=sorted(images.IMAGE_FIELDS),
+            help="Process only this model (can be repeated).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes; 1 processes images in this process.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild renditions that are already up to date.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        for model_label in options["model"] or sorted(images.IMAGE_FIELDS):
+            model = apps.get_model(model_label)
+            image_field, _ = images.IMAGE_FIELDS[model_label]
+            pks = list(
+                model._default_manager.exclude(**{image_field: ""})
+                .exclude(**{f"{image_field}__isnull": True})
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            jobs = [(model_label, pk, options["force"]) for pk in pks]
+
+            if workers == 1 or len(jobs) < 2:
+                results = Counter(_process(job) for job in jobs)
+            else:
+                # Соединения с БД не должны наследоваться процессами пула.
+                connections.close_all()
+                with ProcessPoolExecutor(
+                    max_workers=workers, initializer=_init_worker
+                ) as executor:
+                    results = Counter(
+                        executor.map(
+                            _process, jobs, chunksize=max(1, len(jobs) // workers // 4)
+                        )
+                    )
+
+            self.stdout.write(
+                f"{model_label}: {len(jobs)} images, "
+                f"{results[images.UPDATED]} updated, "
+                f"{results[images.SKIPPED]} up to date, "
+                f"{results[images.UNREADABLE]} unreadable."
+            )
+        self.stdout.write(self.style.SUCCESS("Renditions generated."))
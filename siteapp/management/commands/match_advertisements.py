@@ -0,0 +1,30 @@
+# siteapp/management/commands/match_advertisements.py
+
+from django.core.management.base import BaseCommand
+
+from siteapp import matching
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes stored "lost"/"found" advertisement matches and reports '
+        "candidates examined, pairs scored and timing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ad",
+            type=int,
+            action="append",
+            help="Recompute only this advertisement (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        stats = matching.rebuild(options["ad"])
+        self.stdout.write(str(stats))
+        if stats.advertisements:
+            self.stdout.write(
+                f"{stats.candidates / stats.advertisements:.1f} candidates and "
+                f"{stats.seconds / stats.advertisements * 1000:.1f} ms per ad."
+            )
+        self.stdout.write(self.style.SUCCESS("Matching finished."))
@@ -0,0 +1,35 @@
+# siteapp/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from siteapp import search
+from siteapp.caching import invalidate_all
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index for advertisements."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of advertisements indexed per batch (SQLite only).",
+        )
+
+    def handle(self, *args, **options):
+        if not search.index_available():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Search index is not available for the '{connection.vendor}' "
+                    "backend, falling back to icontains search."
+                )
+            )
+            return
+
+        with transaction.atomic():
+            indexed = search.rebuild_index(batch_size=options["batch_size"])
+            # Результаты поиска могли измениться во всех закэшированных ответах.
+            invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} advertisements."))
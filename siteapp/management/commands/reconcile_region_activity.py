@@ -0,0 +1,33 @@
+# siteapp/management/commands/reconcile_region_activity.py
+
+from django.core.management.base import BaseCommand
+
+from siteapp.region_activity import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes per-region/per-status advertisement counters used by the "
+        "top regions widget and reports any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted counters, do not fix them.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        drifted = reconcile(dry_run=dry_run)
+        for region_id, status_id, stored, actual in drifted:
+            self.stdout.write(
+                f"  Region ID {region_id}, status ID {status_id}: {stored} -> {actual}"
+            )
+
+        summary = f"{len(drifted)} region activity counters drifted."
+        if drifted and not dry_run:
+            summary += " Counters fixed."
+        style = self.style.WARNING if drifted and dry_run else self.style.SUCCESS
+        self.stdout.write(style(summary))
@@ -0,0 +1,111 @@
+# siteapp/management/commands/sync_ad_counters.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from siteapp.caching import invalidate_statuses
+from siteapp.models import AdResponse, Advertisement, AdvertisementRating
+
+
+def _aggregate_subquery(model, aggregate, field: str) -> Coalesce:
+    """
+    Коррелированный подзапрос агрегата по объявлению из внешнего запроса.
+    """
+    subquery = (
+        model.objects.filter(advertisement=OuterRef("pk"))
+        .order_by()
+        .values("advertisement")
+        .annotate(value=aggregate(field))
+        .values("value")
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes denormalized response/rating counters on advertisements "
+        "and reports any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted advertisements, do not fix them.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of advertisements processed per batch.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        batch_size = options["batch_size"]
+
+        queryset = (
+            Advertisement.objects.annotate(
+                actual_responses_count=_aggregate_subquery(AdResponse, Count, "id"),
+                actual_rating_count=_aggregate_subquery(
+                    AdvertisementRating, Count, "id"
+                ),
+                actual_rating_sum=_aggregate_subquery(
+                    AdvertisementRating, Sum, "rating"
+                ),
+            )
+            .only(
+                "id",
+                "status_id",
+                "responses_count",
+                "rating_count",
+                "rating_sum",
+                "average_rating",
+            )
+            .order_by("pk")
+        )
+
+        checked = 0
+        drifted = []
+        for ad in queryset.iterator(chunk_size=batch_size):
+            checked += 1
+            average = (
+                ad.actual_rating_sum / ad.actual_rating_count
+                if ad.actual_rating_count
+                else None
+            )
+            if (
+                ad.responses_count == ad.actual_responses_count
+                and ad.rating_count == ad.actual_rating_count
+                and ad.rating_sum == ad.actual_rating_sum
+                and ad.average_rating == average
+            ):
+                continue
+
+            self.stdout.write(
+                f"  Ad ID {ad.id}: responses {ad.responses_count} -> "
+                f"{ad.actual_responses_count}, ratings {ad.rating_count}/"
+                f"{ad.rating_sum} -> {ad.actual_rating_count}/{ad.actual_rating_sum}"
+            )
+            ad.responses_count = ad.actual_responses_count
+            ad.rating_count = ad.actual_rating_count
+            ad.rating_sum = ad.actual_rating_sum
+            ad.average_rating = average
+            drifted.append(ad)
+
+        if drifted and not dry_run:
+            with transaction.atomic():
+                Advertisement.objects.bulk_update(
+                    drifted,
+                    ["responses_count", "rating_count", "rating_sum", "average_rating"],
+                    batch_size=batch_size,
+                )
+                invalidate_statuses({ad.status_id for ad in drifted})
+
+        summary = f"Checked {checked} advertisements, {len(drifted)} drifted."
+        if drifted and not dry_run:
+            summary += " Counters fixed."
+        style = self.style.WARNING if drifted and dry_run else self.style.SUCCESS
+        self.stdout.write(style(summary))
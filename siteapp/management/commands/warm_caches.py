@@ -0,0 +1,33 @@
+# siteapp/management/commands/warm_caches.py
+
+from django.core.management.base import BaseCommand
+
+from siteapp import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Warms the shared cache (home page snapshot, facet counts, first ad "
+        "list pages) and in-process tables before traffic is served, and "
+        "reports per-item timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=None,
+            help="Number of ad list pages to warm (default: WARMUP_LIST_PAGES).",
+        )
+
+    def handle(self, *args, **options):
+        items = warmup.run(pages=options["pages"])
+        for item in items:
+            line = f"  {item}"
+            self.stdout.write(self.style.ERROR(line) if item.error else line)
+
+        failed = [item for item in items if item.error]
+        total = sum(item.seconds for item in items) * 1000
+        summary = f"Warmed {len(items) - len(failed)} of {len(items)} items in {total:.1f} ms."
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(summary))
@@ -0,0 +1,341 @@
+# siteapp/matching.py
+"""
+Сопоставление объявлений "Потеряно" и "Найдено".
+
+Для каждого объявления хранится не более MATCHES_PER_AD лучших пар с
+объявлениями противоположного статуса (AdvertisementMatch). Пары
+симметричны: если найденное животное подходит потерянному, то и потерянное
+показывается в найденном.
+
+Кандидаты отбираются блокировкой - одним запросом по индексируемым
+условиям, без перебора всех пар:
+
+- тот же вид животного;
+- пол, окрас и порода совпадают или не указаны хотя бы в одном объявлении;
+- публикация не дальше MATCH_WINDOW_DAYS дней;
+- ячейки geohash в радиусе MATCH_RADIUS_KM от точки объявления, а для
+  объявлений без координат - регион автора.
+
+Отобранные кандидаты оцениваются (score) по совпадению признаков,
+расстоянию, разнице дат и похожести фотографий (см. siteapp.similarity).
+
+Пары обновляются инкрементально: после сохранения объявления, его
+животного или фотографий задача Celery пересчитывает пары только этого
+объявления и вставляет его в списки кандидатов (см. update_matches).
+Команда `match_advertisements` пересчитывает все объявления.
+"""
+
+import logging
+import math
+import time
+import typing
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from . import geo, signals, similarity
+from .fingerprints import hamming_distance
+from .models import AdPhoto, Advertisement, AdvertisementMatch, Animal
+
+logger = logging.getLogger(__name__)
+
+MATCHES_PER_AD = 10
+MATCH_WINDOW_DAYS = 60
+MATCH_RADIUS_KM = 30.0
+MIN_SCORE = 0.3
+# Значения признаков животного, которые считаются неуказанными.
+UNKNOWN_VALUES = (None, "", Animal.GENDER_UNKNOWN)
+
+# Веса признаков в оценке; сумма равна 1.
+WEIGHTS: typing.Dict[str, float] = {
+    "breed": 0.15,
+    "color": 0.15,
+    "gender": 0.1,
+    "distance": 0.25,
+    "date": 0.1,
+    "photo": 0.25,
+}
+
+
+@dataclass
+class MatchStats:
+    """
+    Статистика прогона сопоставления.
+
+    advertisements - обработанные объявления,
+    candidates - кандидаты, отобранные блокировкой,
+    scored - оценённые пары (кандидаты в радиусе),
+    stored - записанные пары,
+    seconds - время работы.
+    """
+
+    advertisements: int = 0
+    candidates: int = 0
+    scored: int = 0
+    stored: int = 0
+    seconds: float = 0.0
+
+    def __iadd__(self, other: "MatchStats") -> "MatchStats":
+        self.advertisements += other.advertisements
+        self.candidates += other.candidates
+        self.scored += other.scored
+        self.stored += other.stored
+        self.seconds += other.seconds
+        return self
+
+    def __str__(self) -> str:
+        return (
+            f"{self.advertisements} ads, {self.candidates} candidates examined, "
+            f"{self.scored} pairs scored, {self.stored} matches stored "
+            f"in {self.seconds:.3f} s"
+        )
+
+
+def _matchable(advertisement: Advertisement) -> bool:
+    return advertisement.status.name in similarity.COUNTERPART_STATUSES
+
+
+def _known(value: typing.Any) -> bool:
+    return value not in UNKNOWN_VALUES
+
+
+def _compatible(field: str, value: typing.Any) -> Q:
+    """
+    Признак животного совпадает или не указан у кандидата.
+    """
+    if not _known(value):
+        return Q()
+    condition = Q(**{f"animal__{field}": value}) | Q(
+        **{f"animal__{field}__isnull": True}
+    )
+    if field == "gender":
+        condition |= Q(animal__gender__in=["", Animal.GENDER_UNKNOWN])
+    return condition
+
+
+def candidates(advertisement: Advertisement):
+    """
+    Возвращает QuerySet кандидатов для объявления (блокировка).
+    """
+    animal = advertisement.animal
+    window = timedelta(days=MATCH_WINDOW_DAYS)
+    queryset = (
+        Advertisement.objects.filter(
+            status__name__in=similarity.COUNTERPART_STATUSES[advertisement.status.name],
+            animal__species_id=animal.species_id,
+            publication_date__gte=advertisement.publication_date - window,
+            publication_date__lte=advertisement.publication_date + window,
+        )
+        .filter(_compatible("gender", animal.gender))
+        .filter(_compatible("color_id", animal.color_id))
+        .filter(_compatible("breed_id", animal.breed_id))
+        .exclude(pk=advertisement.pk)
+    )
+    if advertisement.latitude is not None and advertisement.longitude is not None:
+        cells = geo.geohash_cells(
+            advertisement.latitude, advertisement.longitude, MATCH_RADIUS_KM
+        )
+        nearby = geo.geohash_q(cells)
+        if advertisement.user.region_id is not None:
+            # Кандидаты без координат сопоставляются по региону автора.
+            nearby |= Q(
+                latitude__isnull=True, user__region_id=advertisement.user.region_id
+            )
+        queryset = queryset.filter(nearby)
+    elif advertisement.user.region_id is not None:
+        queryset = queryset.filter(user__region_id=advertisement.user.region_id)
+    return queryset.select_related("animal", "user")
+
+
+def _distance_km(first: Advertisement, second: Advertisement) -> float:
+    lat1, lon1 = map(math.radians, (first.latitude, first.longitude))
+    lat2, lon2 = map(math.radians, (second.latitude, second.longitude))
+    haversine = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * geo.EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+def _feature_score(first: typing.Any, second: typing.Any) -> float:
+    # Блокировка оставляет только совпадающие или неизвестные значения.
+    if not _known(first) or not _known(second):
+        return 0.5
+    return 1.0 if first == second else 0.0
+
+
+def score(
+    advertisement: Advertisement,
+    candidate: Advertisement,
+    hashes: typing.Sequence[int] = (),
+    candidate_hashes: typing.Sequence[int] = (),
+) -> typing.Optional[float]:
+    """
+    Оценивает пару от 0 до 1; None - если кандидат дальше MATCH_RADIUS_KM.
+
+    :param hashes: pHash фотографий объявления
+    :param candidate_hashes: pHash фотографий кандидата
+    """
+    animal, other = advertisement.animal, candidate.animal
+    parts = {
+        "breed": _feature_score(animal.breed_id, other.breed_id),
+        "color": _feature_score(animal.color_id, other.color_id),
+        "gender": _feature_score(animal.gender, other.gender),
+    }
+
+    if None not in (
+        advertisement.latitude,
+        advertisement.longitude,
+        candidate.latitude,
+        candidate.longitude,
+    ):
+        distance = _distance_km(advertisement, candidate)
+        if distance > MATCH_RADIUS_KM:
+            return None
+        parts["distance"] = 1 - distance / MATCH_RADIUS_KM
+    else:
+        # Известен только общий регион.
+        parts["distance"] = 0.25
+
+    days = abs((advertisement.publication_date - candidate.publication_date).days)
+    parts["date"] = max(0.0, 1 - days / MATCH_WINDOW_DAYS)
+
+    if hashes and candidate_hashes:
+        best = min(hamming_distance(a, b) for a in hashes for b in candidate_hashes)
+        parts["photo"] = max(0.0, 1 - best / (similarity.SIMILAR_PHOTO_DISTANCE + 1))
+    else:
+        parts["photo"] = 0.25
+
+    return round(sum(WEIGHTS[name] * value for name, value in parts.items()), 4)
+
+
+def _photo_hashes(
+    advertisement_ids: typing.Iterable[int],
+) -> typing.Dict[int, typing.List[int]]:
+    hashes: typing.Dict[int, typing.List[int]] = {}
+    for advertisement_id, value in AdPhoto.objects.filter(
+        advertisement_id__in=list(advertisement_ids), phash__isnull=False
+    ).values_list("advertisement_id", "phash"):
+        hashes.setdefault(advertisement_id, []).append(value)
+    return hashes
+
+
+def _trim(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Оставляет у объявлений не более MATCHES_PER_AD лучших пар.
+    """
+    overfull = (
+        AdvertisementMatch.objects.filter(advertisement_id__in=list(advertisement_ids))
+        .values("advertisement_id")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=MATCHES_PER_AD)
+        .values_list("advertisement_id", flat=True)
+    )
+    for advertisement_id in overfull:
+        keep = AdvertisementMatch.objects.filter(
+            advertisement_id=advertisement_id
+        ).order_by("-score", "matched_id")[:MATCHES_PER_AD]
+        AdvertisementMatch.objects.filter(advertisement_id=advertisement_id).exclude(
+            pk__in=list(keep.values_list("pk", flat=True))
+        ).delete()
+
+
+def update_matches(advertisement_id: int) -> MatchStats:
+    """
+    Пересчитывает пары одного объявления.
+
+    Собственные пары объявления заменяются лучшими из оценённых, а
+    объявление добавляется в списки пар кандидатов (и удаляется из списков,
+    где перестало подходить), после чего эти списки обрезаются до
+    MATCHES_PER_AD. Объявления с изменившимися парами отмечаются как
+    изменённые (updated_at) для условных запросов.
+
+    :return: статистика прогона
+    """
+    started = time.perf_counter()
+    stats = MatchStats(advertisements=1)
+    advertisement = (
+        Advertisement.objects.select_related("animal", "status", "user")
+        .filter(pk=advertisement_id)
+        .first()
+    )
+    if advertisement is None:
+        return stats
+
+    scored: typing.List[typing.Tuple[float, int]] = []
+    if _matchable(advertisement):
+        pool = list(candidates(advertisement))
+        stats.candidates = len(pool)
+        hashes = _photo_hashes([advertisement.pk, *(c.pk for c in pool)])
+        for candidate in pool:
+            value = score(
+                advertisement,
+                candidate,
+                hashes.get(advertisement.pk, ()),
+                hashes.get(candidate.pk, ()),
+            )
+            if value is None:
+                continue
+            stats.scored += 1
+            if value >= MIN_SCORE:
+                scored.append((value, candidate.pk))
+    scored.sort(key=lambda pair: (-pair[0], pair[1]))
+
+    with transaction.atomic():
+        previous = set(
+            AdvertisementMatch.objects.filter(
+                Q(advertisement_id=advertisement_id) | Q(matched_id=advertisement_id)
+            ).values_list("advertisement_id", "matched_id")
+        )
+        AdvertisementMatch.objects.filter(
+            Q(advertisement_id=advertisement_id) | Q(matched_id=advertisement_id)
+        ).delete()
+        rows = [
+            AdvertisementMatch(
+                advertisement_id=advertisement_id, matched_id=pk, score=value
+            )
+            for value, pk in scored[:MATCHES_PER_AD]
+        ] + [
+            AdvertisementMatch(
+                advertisement_id=pk, matched_id=advertisement_id, score=value
+            )
+            for value, pk in scored
+        ]
+        AdvertisementMatch.objects.bulk_create(rows)
+        _trim(pk for _, pk in scored)
+        current = set(
+            AdvertisementMatch.objects.filter(
+                Q(advertisement_id=advertisement_id) | Q(matched_id=advertisement_id)
+            ).values_list("advertisement_id", "matched_id")
+        )
+        stats.stored = len(current)
+        changed = {owner for owner, _ in previous ^ current}
+        if changed:
+            signals.touch_advertisements(changed)
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def rebuild(
+    advertisement_ids: typing.Optional[typing.Iterable[int]] = None,
+) -> MatchStats:
+    """
+    Пересчитывает пары всех объявлений "Потеряно" и "Найдено" (или
+    перечисленных).
+    """
+    if advertisement_ids is None:
+        advertisement_ids = (
+            Advertisement.objects.filter(
+                status__name__in=similarity.COUNTERPART_STATUSES
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+    stats = MatchStats()
+    for advertisement_id in list(advertisement_ids):
+        stats += update_matches(advertisement_id)
+    logger.info("Advertisement matching: %s", stats)
+    return stats
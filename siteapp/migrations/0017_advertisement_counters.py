@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:15
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    AdResponse = apps.get_model("siteapp", "AdResponse")
+    AdvertisementRating = apps.get_model("siteapp", "AdvertisementRating")
+
+    def aggregate(model, function, field):
+        subquery = (
+            model.objects.filter(advertisement=OuterRef("pk"))
+            .order_by()
+            .values("advertisement")
+            .annotate(value=function(field))
+            .values("value")
+        )
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+    Advertisement.objects.update(
+        responses_count=aggregate(AdResponse, Count, "id"),
+        rating_count=aggregate(AdvertisementRating, Count, "id"),
+        rating_sum=aggregate(AdvertisementRating, Sum, "rating"),
+    )
+    Advertisement.objects.filter(rating_count__gt=0).update(
+        average_rating=Cast(F("rating_sum"), FloatField()) / F("rating_count")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0016_alter_adresponse_message_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advertisement",
+            name="average_rating",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="средняя оценка"
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="rating_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="количество оценок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="rating_sum",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="сумма оценок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="responses_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="количество откликов"
+            ),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,210 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:40
+
+import re
+import typing
+
+from django.db import OperationalError, migrations
+
+SQLITE_TABLE = "siteapp_advertisement_fts"
+POSTGRES_TABLE = "siteapp_advertisement_search"
+
+# Копия стемминга из siteapp.search на момент миграции: её результат не
+# должен зависеть от последующих изменений модуля.
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_VOWELS = "аеиоуыэюя"
+
+_PERFECTIVE_GERUND = (
+    ("в вши вшись".split(), "ая"),
+    ("ив ивши ившись ыв ывши ывшись".split(), None),
+)
+_REFLEXIVE = (("ся сь".split(), None),)
+_ADJECTIVE = (
+    (
+        "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю "
+        "ая яя ою ею".split(),
+        None,
+    ),
+)
+_PARTICIPLE = (
+    ("ем нн вш ющ щ".split(), "ая"),
+    ("ивш ывш ующ".split(), None),
+)
+_VERB = (
+    ("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно".split(), "ая"),
+    (
+        "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят "
+        "ует уют ит ыт ены ить ыть ишь ую ю".split(),
+        None,
+    ),
+)
+_NOUN = (
+    (
+        "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом "
+        "о у ах иях ях ы ь ию ью ю ия ья я".split(),
+        None,
+    ),
+)
+_SUPERLATIVE = (("ейше ейш".split(), None),)
+_DERIVATIONAL = (("ость ост".split(), None),)
+
+
+def _regions(word: str) -> typing.Tuple[int, int]:
+    """
+    Возвращает начала областей RV и R2 слова по правилам Snowball.
+    """
+    length = len(word)
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), length)
+
+    def after_vowel_consonant(start: int) -> int:
+        for i in range(max(start, 1), length):
+            if word[i] not in _VOWELS and word[i - 1] in _VOWELS and i - 1 >= start:
+                return i + 1
+        return length
+
+    r1 = after_vowel_consonant(0)
+    r2 = after_vowel_consonant(r1)
+    return rv, r2
+
+
+def _strip(word: str, start: int, groups: tuple) -> typing.Optional[str]:
+    """
+    Удаляет самое длинное окончание из groups, лежащее в области word[start:].
+
+    Окончания первой группы Snowball требуют перед собой "а" или "я".
+    """
+    region = word[start:]
+    best = 0
+    for endings, preceded_by in groups:
+        for ending in endings:
+            if len(ending) <= best or not region.endswith(ending):
+                continue
+            if preceded_by:
+                rest = region[: -len(ending)]
+                if not rest or rest[-1] not in preceded_by:
+                    continue
+            best = len(ending)
+    return word[:-best] if best else None
+
+
+def stem_russian(word: str) -> str:
+    """
+    Возвращает основу русского слова (алгоритм Snowball для русского языка).
+
+    Слова без кириллицы возвращаются в нижнем регистре без изменений.
+    """
+    word = word.lower().replace("ё", "е")
+    if not any(ch in _VOWELS for ch in word):
+        return word
+
+    rv, r2 = _regions(word)
+
+    stem = _strip(word, rv, _PERFECTIVE_GERUND)
+    if stem is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stem = _strip(word, rv, _ADJECTIVE)
+        if stem is not None:
+            stem = _strip(stem, rv, _PARTICIPLE) or stem
+        else:
+            stem = _strip(word, rv, _VERB)
+            if stem is None:
+                stem = _strip(word, rv, _NOUN)
+    if stem is not None:
+        word = stem
+
+    if word[rv:].endswith("и"):
+        word = word[:-1]
+
+    stem = _strip(word, r2, _DERIVATIONAL)
+    if stem is not None:
+        word = stem
+
+    if word[rv:].endswith("нн"):
+        word = word[:-1]
+    else:
+        stem = _strip(word, rv, _SUPERLATIVE)
+        if stem is not None:
+            word = stem[:-1] if stem.endswith("нн") else stem
+        elif word[rv:].endswith("ь"):
+            word = word[:-1]
+    return word
+
+
+def stemmed_tokens(text: typing.Optional[str]) -> typing.List[str]:
+    """
+    Разбивает текст на слова и возвращает их основы.
+    """
+    if not text:
+        return []
+    return [stem for stem in map(stem_russian, _WORD_RE.findall(text)) if stem]
+
+
+def stemmed_text(text: typing.Optional[str]) -> str:
+    return " ".join(stemmed_tokens(text))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+
+    if vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+                "title, description, animal_name, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite собран без FTS5: поиск останется на icontains.
+            return
+        rows = [
+            (ad_id, stemmed_text(title), stemmed_text(description), stemmed_text(name))
+            for ad_id, title, description, name in Advertisement.objects.values_list(
+                "id", "title", "description", "animal__name"
+            ).iterator()
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, title, description, animal_name) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE TABLE {POSTGRES_TABLE} ("
+            "advertisement_id bigint PRIMARY KEY "
+            "REFERENCES siteapp_advertisement (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {POSTGRES_TABLE}_document_gin "
+            f"ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (advertisement_id, document) "
+            "SELECT ad.id, "
+            "setweight(to_tsvector('russian', coalesce(ad.title, '')), 'A') "
+            "|| setweight(to_tsvector('russian', coalesce(animal.name, '')), 'A') "
+            "|| setweight(to_tsvector('russian', coalesce(ad.description, '')), 'B') "
+            "FROM siteapp_advertisement ad "
+            "JOIN siteapp_animal animal ON animal.id = ad.animal_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0017_advertisement_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0018_advertisement_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(
+                fields=["-publication_date", "-id"], name="ad_publication_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(
+                fields=["status", "-publication_date"], name="ad_status_pub_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(
+                fields=["user", "-publication_date"], name="ad_user_pub_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["species", "breed"], name="animal_species_breed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["species", "gender"], name="animal_species_gender_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["species", "birth_date"], name="animal_species_birth_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(fields=["birth_date"], name="animal_birth_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(fields=["gender"], name="animal_gender_idx"),
+        ),
+    ]
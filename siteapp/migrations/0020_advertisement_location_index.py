@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0019_advertisement_animal_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(
+                condition=models.Q(
+                    ("latitude__isnull", False), ("longitude__isnull", False)
+                ),
+                fields=["latitude", "longitude"],
+                name="ad_location_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:37
+
+from django.db import migrations, models
+
+
+def fill_geohash(apps, schema_editor):
+    from siteapp.geo import encode_geohash
+
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    batch = []
+    ads = Advertisement.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only("id", "latitude", "longitude")
+    for ad in ads.iterator(chunk_size=1000):
+        ad.geohash = encode_geohash(ad.latitude, ad.longitude)
+        batch.append(ad)
+        if len(batch) >= 1000:
+            Advertisement.objects.bulk_update(batch, ["geohash"])
+            batch = []
+    if batch:
+        Advertisement.objects.bulk_update(batch, ["geohash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0020_advertisement_location_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advertisement",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=12,
+                verbose_name="geohash",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(fields=["geohash"], name="ad_geohash_idx"),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
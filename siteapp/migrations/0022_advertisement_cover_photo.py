@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_cover_photo(apps, schema_editor):
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    AdPhoto = apps.get_model("siteapp", "AdPhoto")
+    earliest_photo = (
+        AdPhoto.objects.filter(advertisement=OuterRef("pk"))
+        .order_by("pk")
+        .values("pk")[:1]
+    )
+    Advertisement.objects.update(cover_photo=Subquery(earliest_photo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0021_advertisement_geohash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adphoto",
+            name="height",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="высота"
+            ),
+        ),
+        migrations.AddField(
+            model_name="adphoto",
+            name="width",
+            field=models.PositiveIntegerField(
+                blank=True, editable=False, null=True, verbose_name="ширина"
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="cover_photo",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="siteapp.adphoto",
+                verbose_name="обложка",
+            ),
+        ),
+        migrations.RunPython(fill_cover_photo, migrations.RunPython.noop),
+    ]
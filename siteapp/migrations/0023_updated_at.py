@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    for model_name in ("Advertisement", "Article"):
+        model = apps.get_model("siteapp", model_name)
+        model.objects.update(updated_at=F("publication_date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0022_advertisement_cover_photo"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="advertisement",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="дата изменения",
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="дата изменения",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0023_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="adresponse",
+            index=models.Index(
+                fields=["advertisement", "-date_created", "-id"],
+                name="adresponse_ad_date_idx",
+            ),
+        ),
+    ]
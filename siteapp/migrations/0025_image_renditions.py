@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0024_adresponse_ad_date_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adphoto",
+            name="renditions",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="версии фото"
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="main_image_renditions",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="версии главного изображения",
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="avatar_renditions",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="версии аватара"
+            ),
+        ),
+    ]
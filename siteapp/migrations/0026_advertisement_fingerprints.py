@@ -0,0 +1,146 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:08
+
+import hashlib
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Копия расчёта отпечатков из siteapp.fingerprints на момент миграции: её
+# результат не должен зависеть от последующих изменений модуля.
+SIMHASH_BITS = 64
+SIMHASH_BAND_WIDTHS = (11, 11, 11, 11, 10, 10)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    return " ".join(words)
+
+
+def content_hash(text):
+    normalized = normalize_text(text)
+    if not normalized:
+        return ""
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def simhash(text):
+    features = Counter(normalize_text(text).split())
+    if not features:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in features.items():
+        value = int.from_bytes(
+            hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        )
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += weight if value >> bit & 1 else -weight
+    unsigned = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    if unsigned >= 1 << (SIMHASH_BITS - 1):
+        return unsigned - (1 << SIMHASH_BITS)
+    return unsigned
+
+
+def simhash_bands(fingerprint):
+    value = fingerprint & ((1 << SIMHASH_BITS) - 1)
+    result = []
+    for width in SIMHASH_BAND_WIDTHS:
+        result.append(value & ((1 << width) - 1))
+        value >>= width
+    return result
+
+
+def fill_fingerprints(apps, schema_editor):
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    AdvertisementSimhashBand = apps.get_model("siteapp", "AdvertisementSimhashBand")
+    bands = []
+    for advertisement in Advertisement.objects.only("pk", "description").iterator():
+        advertisement.content_hash = content_hash(advertisement.description)
+        advertisement.simhash = simhash(advertisement.description)
+        advertisement.save(update_fields=["content_hash", "simhash"])
+        if advertisement.simhash is not None:
+            bands.extend(
+                AdvertisementSimhashBand(
+                    advertisement_id=advertisement.pk, band=band, value=value
+                )
+                for band, value in enumerate(simhash_bands(advertisement.simhash))
+            )
+    AdvertisementSimhashBand.objects.bulk_create(bands, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0025_image_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdvertisementSimhashBand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("band", models.PositiveSmallIntegerField(verbose_name="номер полосы")),
+                ("value", models.PositiveIntegerField(verbose_name="значение полосы")),
+            ],
+            options={
+                "verbose_name": "полоса SimHash объявления",
+                "verbose_name_plural": "полосы SimHash объявлений",
+            },
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                max_length=40,
+                verbose_name="хэш описания",
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisement",
+            name="simhash",
+            field=models.BigIntegerField(
+                blank=True, editable=False, null=True, verbose_name="SimHash описания"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advertisement",
+            index=models.Index(
+                fields=["content_hash", "user"], name="ad_content_hash_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="advertisementsimhashband",
+            name="advertisement",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="simhash_bands",
+                to="siteapp.advertisement",
+                verbose_name="объявление",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="advertisementsimhashband",
+            index=models.Index(fields=["band", "value"], name="ad_simhash_band_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="advertisementsimhashband",
+            constraint=models.UniqueConstraint(
+                fields=("advertisement", "band"), name="ad_simhash_band_unique"
+            ),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
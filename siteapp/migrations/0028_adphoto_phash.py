@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0027_photo_upload_session"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adphoto",
+            name="phash",
+            field=models.BigIntegerField(
+                blank=True, editable=False, null=True, verbose_name="перцептивный хэш"
+            ),
+        ),
+        migrations.CreateModel(
+            name="AdPhotoHashBand",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("band", models.PositiveSmallIntegerField(verbose_name="номер полосы")),
+                ("value", models.PositiveIntegerField(verbose_name="значение полосы")),
+                (
+                    "photo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hash_bands",
+                        to="siteapp.adphoto",
+                        verbose_name="фото",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "полоса хэша фото",
+                "verbose_name_plural": "полосы хэшей фото",
+                "indexes": [
+                    models.Index(fields=["band", "value"], name="adphoto_hash_band_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("photo", "band"), name="adphoto_hash_band_unique"
+                    )
+                ],
+            },
+        ),
+    ]
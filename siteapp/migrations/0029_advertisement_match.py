@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0028_adphoto_phash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AdvertisementMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="оценка")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="дата подбора"
+                    ),
+                ),
+                (
+                    "advertisement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches",
+                        to="siteapp.advertisement",
+                        verbose_name="объявление",
+                    ),
+                ),
+                (
+                    "matched",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="siteapp.advertisement",
+                        verbose_name="подходящее объявление",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "пара объявлений",
+                "verbose_name_plural": "пары объявлений",
+                "ordering": ["-score", "matched_id"],
+                "indexes": [
+                    models.Index(
+                        fields=["advertisement", "-score"], name="ad_match_score_idx"
+                    ),
+                    models.Index(fields=["matched"], name="ad_match_matched_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("advertisement", "matched"), name="ad_match_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.1 on 2026-10-17 23:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_region_activity(apps, schema_editor):
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    RegionActivity = apps.get_model("siteapp", "RegionActivity")
+    RegionActivity.objects.bulk_create(
+        RegionActivity(
+            region_id=row["user__region_id"],
+            status_id=row["status_id"],
+            ad_count=row["total"],
+        )
+        for row in Advertisement.objects.filter(user__region__isnull=False)
+        .order_by()
+        .values("user__region_id", "status_id")
+        .annotate(total=Count("pk"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0029_advertisement_match"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RegionActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "ad_count",
+                    models.IntegerField(
+                        default=0, verbose_name="количество объявлений"
+                    ),
+                ),
+                (
+                    "region",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity",
+                        to="siteapp.region",
+                        verbose_name="регион",
+                    ),
+                ),
+                (
+                    "status",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="siteapp.adstatus",
+                        verbose_name="статус объявлений",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "активность региона",
+                "verbose_name_plural": "активность регионов",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "-ad_count", "region"],
+                        name="region_activity_top_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("region", "status"), name="region_activity_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_region_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:08
+
+import hashlib
+import re
+from collections import Counter
+
+from django.db import migrations
+
+# Копия расчёта SimHash из siteapp.fingerprints на момент миграции:
+# признаки - символьные триграммы, 12 полос.
+SIMHASH_BITS = 64
+SIMHASH_BAND_WIDTHS = (6, 6, 6, 6, 5, 5, 5, 5, 5, 5, 5, 5)
+SIMHASH_SHINGLE = 3
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    words = _WORD_RE.findall((text or "").lower().replace("ё", "е"))
+    return " ".join(words)
+
+
+def simhash(text):
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    features = Counter(
+        normalized[start : start + SIMHASH_SHINGLE]
+        for start in range(max(1, len(normalized) - SIMHASH_SHINGLE + 1))
+    )
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in features.items():
+        value = int.from_bytes(
+            hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        )
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += weight if value >> bit & 1 else -weight
+    unsigned = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    if unsigned >= 1 << (SIMHASH_BITS - 1):
+        return unsigned - (1 << SIMHASH_BITS)
+    return unsigned
+
+
+def simhash_bands(fingerprint):
+    value = fingerprint & ((1 << SIMHASH_BITS) - 1)
+    result = []
+    for width in SIMHASH_BAND_WIDTHS:
+        result.append(value & ((1 << width) - 1))
+        value >>= width
+    return result
+
+
+def rebuild_fingerprints(apps, schema_editor):
+    Advertisement = apps.get_model("siteapp", "Advertisement")
+    AdvertisementSimhashBand = apps.get_model("siteapp", "AdvertisementSimhashBand")
+    AdvertisementSimhashBand.objects.all().delete()
+    bands = []
+    for advertisement in Advertisement.objects.only("pk", "description").iterator():
+        advertisement.simhash = simhash(advertisement.description)
+        advertisement.save(update_fields=["simhash"])
+        if advertisement.simhash is not None:
+            bands.extend(
+                AdvertisementSimhashBand(
+                    advertisement_id=advertisement.pk, band=band, value=value
+                )
+                for band, value in enumerate(simhash_bands(advertisement.simhash))
+            )
+    AdvertisementSimhashBand.objects.bulk_create(bands, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("siteapp", "0030_region_activity"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_fingerprints, migrations.RunPython.noop),
+    ]
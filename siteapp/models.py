@@ -1,15 +1,18 @@
 # siteapp/models.py
 import typing
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 from django.utils import timezone
 from django.conf import settings
 from django.template.defaultfilters import slugify
+from django.core.files.images import get_image_dimensions
 from django.core.validators import RegexValidator
 from django.core.validators import MaxValueValidator, MinValueValidator
 from typing import Optional
+from . import fingerprints, geo
 
 FRONTEND_BASE_URL = getattr(settings, "FRONTEND_BASE_URL", "http://localhost:5173")
 
@@ -110,6 +113,7 @@ class User(AbstractUser):
         role: роль пользователя, связь с моделью Role, необязательное поле.
         region: регион пользователя, связь с моделью Region, необязательное поле.
         avatar: аватар пользователя, изображение, загружаемое в "user_avatars/", необязательное поле.
+        avatar_renditions: уменьшенные версии аватара (см. siteapp.images).
     """
 
     display_name = models.CharField(_("отображаемое имя"), max_length=150, blank=True)
@@ -145,6 +149,9 @@ class User(AbstractUser):
         blank=True,
         help_text=_("Аватар пользователя"),
     )
+    avatar_renditions = models.JSONField(
+        _("версии аватара"), default=dict, blank=True, editable=False
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -326,6 +333,17 @@ class Animal(models.Model):
         verbose_name = _("животное")
         verbose_name_plural = _("животные")
         ordering = ["species", "name"]
+        indexes = [
+            models.Index(fields=["species", "breed"], name="animal_species_breed_idx"),
+            models.Index(
+                fields=["species", "gender"], name="animal_species_gender_idx"
+            ),
+            models.Index(
+                fields=["species", "birth_date"], name="animal_species_birth_idx"
+            ),
+            models.Index(fields=["birth_date"], name="animal_birth_date_idx"),
+            models.Index(fields=["gender"], name="animal_gender_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name or _('Неизвестное животное')} ({self.species.name})"
@@ -481,6 +499,33 @@ class Advertisement(models.Model):
         publication_date (models.DateTimeField): Дата размещения объявления.
         latitude (models.FloatField): Широта, если указана.
         longitude (models.FloatField): Долгота, если указана.
+        responses_count (models.PositiveIntegerField): Количество откликов.
+        rating_count (models.PositiveIntegerField): Количество оценок.
+        rating_sum (models.PositiveIntegerField): Сумма оценок.
+        average_rating (models.FloatField): Средняя оценка, если оценки есть.
+        geohash (models.CharField): Geohash координат для поиска по радиусу.
+        cover_photo (models.ForeignKey): Обложка - первая фотография объявления.
+        updated_at (models.DateTimeField): Время последнего изменения объявления,
+            его фотографий, откликов или оценок.
+        content_hash (models.CharField): Хэш нормализованного описания.
+        simhash (models.BigIntegerField): SimHash описания для поиска
+            почти-дубликатов.
+
+    Счётчики откликов и оценок денормализованы: они обновляются в той же
+    транзакции, что и AdResponse/AdvertisementRating (см. siteapp.signals),
+    и сверяются командой `sync_ad_counters`.
+
+    Обложка (cover_photo) - самая ранняя фотография объявления; она
+    поддерживается сигналами AdPhoto (см. siteapp.signals), чтобы списки
+    получали её одним JOIN без загрузки всех фотографий.
+
+    updated_at обновляется при сохранении объявления, а при изменении
+    связанных записей - сигналами; по нему детальный просмотр отвечает на
+    условные запросы (ETag/Last-Modified).
+
+    content_hash и simhash пересчитываются из описания при сохранении;
+    полосы SimHash хранятся в AdvertisementSimhashBand (см.
+    siteapp.fingerprints).
     """
 
     user = models.ForeignKey(
@@ -499,6 +544,37 @@ class Advertisement(models.Model):
     publication_date = models.DateTimeField(_("дата размещения"), auto_now_add=True)
     latitude = models.FloatField(_("широта"), blank=True, null=True)
     longitude = models.FloatField(_("долгота"), blank=True, null=True)
+    responses_count = models.PositiveIntegerField(
+        _("количество откликов"), default=0, editable=False
+    )
+    rating_count = models.PositiveIntegerField(
+        _("количество оценок"), default=0, editable=False
+    )
+    rating_sum = models.PositiveIntegerField(
+        _("сумма оценок"), default=0, editable=False
+    )
+    average_rating = models.FloatField(
+        _("средняя оценка"), blank=True, null=True, editable=False
+    )
+    geohash = models.CharField(
+        _("geohash"), max_length=12, blank=True, default="", editable=False
+    )
+    cover_photo = models.ForeignKey(
+        "AdPhoto",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        verbose_name=_("обложка"),
+    )
+    updated_at = models.DateTimeField(_("дата изменения"), auto_now=True)
+    content_hash = models.CharField(
+        _("хэш описания"), max_length=40, blank=True, default="", editable=False
+    )
+    simhash = models.BigIntegerField(
+        _("SimHash описания"), blank=True, null=True, editable=False
+    )
 
     objects = models.Manager()
     active_ads = ActiveAdvertisementManager()
@@ -507,6 +583,28 @@ class Advertisement(models.Model):
         verbose_name = _("объявление")
         verbose_name_plural = _("объявления")
         ordering = ["-publication_date"]
+        indexes = [
+            # Лента и курсорная пагинация: ORDER BY publication_date DESC, id DESC.
+            models.Index(
+                fields=["-publication_date", "-id"], name="ad_publication_idx"
+            ),
+            # Фильтр по типу объявления с сортировкой ленты.
+            models.Index(
+                fields=["status", "-publication_date"], name="ad_status_pub_idx"
+            ),
+            # Объявления пользователя и фильтр по региону (через пользователя).
+            models.Index(fields=["user", "-publication_date"], name="ad_user_pub_idx"),
+            # Маркеры карты: только объявления с координатами.
+            models.Index(
+                fields=["latitude", "longitude"],
+                name="ad_location_idx",
+                condition=models.Q(latitude__isnull=False, longitude__isnull=False),
+            ),
+            # Поиск по радиусу: диапазоны префиксов geohash.
+            models.Index(fields=["geohash"], name="ad_geohash_idx"),
+            # Проверка повтора объявления: точное совпадение описания.
+            models.Index(fields=["content_hash", "user"], name="ad_content_hash_idx"),
+        ]
 
     def __str__(self) -> str:
         """
@@ -520,6 +618,188 @@ class Advertisement(models.Model):
         """
         return f"{FRONTEND_BASE_URL}advertisement/{self.pk}"
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет объявление в одной транзакции с обновлением поискового индекса.
+
+        Geohash пересчитывается из координат, а отпечатки - из описания при
+        каждом сохранении; updated_at записывается и при сохранении отдельных
+        полей. Полосы SimHash перезаписываются, только если отпечаток
+        изменился.
+        """
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ""
+        previous_simhash = self.simhash
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "description" in update_fields:
+            self.content_hash = fingerprints.content_hash(self.description)
+            self.simhash = fingerprints.simhash(self.description)
+        if update_fields is not None:
+            extra_fields = {"updated_at"}
+            if {"latitude", "longitude"} & set(update_fields):
+                extra_fields.add("geohash")
+            if "description" in update_fields:
+                extra_fields.update({"content_hash", "simhash"})
+            kwargs["update_fields"] = {*update_fields, *extra_fields}
+        rewrite_bands = self._state.adding or self.simhash != previous_simhash
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if rewrite_bands:
+                self.simhash_bands.all().delete()
+                AdvertisementSimhashBand.objects.bulk_create(
+                    AdvertisementSimhashBand(advertisement=self, band=band, value=value)
+                    for band, value in enumerate(
+                        fingerprints.bands(self.simhash)
+                        if self.simhash is not None
+                        else []
+                    )
+                )
+
+
+class AdvertisementMatch(models.Model):
+    """
+    Пара объявлений "Потеряно" - "Найдено", подобранная сопоставлением.
+
+    Attributes:
+        advertisement (models.ForeignKey): Объявление, для которого подобрана пара.
+        matched (models.ForeignKey): Подходящее объявление противоположного статуса.
+        score (models.FloatField): Оценка от 0 до 1.
+        created_at (models.DateTimeField): Время подбора пары.
+
+    Пары обновляются инкрементально (см. siteapp.matching).
+    """
+
+    advertisement = models.ForeignKey(
+        Advertisement,
+        related_name="matches",
+        on_delete=models.CASCADE,
+        verbose_name=_("объявление"),
+    )
+    matched = models.ForeignKey(
+        Advertisement,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name=_("подходящее объявление"),
+    )
+    score = models.FloatField(_("оценка"))
+    created_at = models.DateTimeField(_("дата подбора"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("пара объявлений")
+        verbose_name_plural = _("пары объявлений")
+        ordering = ["-score", "matched_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["advertisement", "matched"], name="ad_match_unique"
+            )
+        ]
+        indexes = [
+            # Лучшие пары объявления для детального просмотра.
+            models.Index(fields=["advertisement", "-score"], name="ad_match_score_idx"),
+            # Удаление объявления из списков пар других объявлений.
+            models.Index(fields=["matched"], name="ad_match_matched_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление объекта.
+        """
+        return f"{self.advertisement_id} - {self.matched_id}: {self.score}"
+
+
+class AdvertisementSimhashBand(models.Model):
+    """
+    Полоса SimHash описания объявления.
+
+    Attributes:
+        advertisement (models.ForeignKey): Объявление.
+        band (models.PositiveSmallIntegerField): Номер полосы.
+        value (models.PositiveIntegerField): Биты отпечатка в этой полосе.
+
+    Почти-дубликаты ищутся по совпадению нескольких полос (см.
+    siteapp.fingerprints.near_duplicates).
+    """
+
+    advertisement = models.ForeignKey(
+        Advertisement,
+        related_name="simhash_bands",
+        on_delete=models.CASCADE,
+        verbose_name=_("объявление"),
+    )
+    band = models.PositiveSmallIntegerField(_("номер полосы"))
+    value = models.PositiveIntegerField(_("значение полосы"))
+
+    class Meta:
+        verbose_name = _("полоса SimHash объявления")
+        verbose_name_plural = _("полосы SimHash объявлений")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["advertisement", "band"], name="ad_simhash_band_unique"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["band", "value"], name="ad_simhash_band_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление объекта.
+        """
+        return f"{self.advertisement_id}: {self.band}={self.value}"
+
+
+class RegionActivity(models.Model):
+    """
+    Количество объявлений в статусе у пользователей региона.
+
+    Attributes:
+        region (models.ForeignKey): Регион автора объявлений.
+        status (models.ForeignKey): Статус объявлений.
+        ad_count (models.IntegerField): Количество объявлений.
+
+    Счётчики обновляются в той же транзакции, что и объявления и
+    пользователи (см. siteapp.region_activity), и сверяются командой
+    `reconcile_region_activity`.
+    """
+
+    region = models.ForeignKey(
+        Region,
+        related_name="activity",
+        on_delete=models.CASCADE,
+        verbose_name=_("регион"),
+    )
+    status = models.ForeignKey(
+        AdStatus,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name=_("статус объявлений"),
+    )
+    ad_count = models.IntegerField(_("количество объявлений"), default=0)
+
+    class Meta:
+        verbose_name = _("активность региона")
+        verbose_name_plural = _("активность регионов")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["region", "status"], name="region_activity_unique"
+            )
+        ]
+        indexes = [
+            # Регионы с наибольшим количеством объявлений в статусе.
+            models.Index(
+                fields=["status", "-ad_count", "region"],
+                name="region_activity_top_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление объекта.
+        """
+        return f"{self.region_id} / {self.status_id}: {self.ad_count}"
+
 
 class AdvertisementRating(models.Model):
     """
@@ -573,6 +853,13 @@ class AdvertisementRating(models.Model):
         """
         return f"{self.rating}* от {self.user.username} для {self.advertisement.title[:20]}..."
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет оценку в одной транзакции с пересчётом счётчиков объявления.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class AdPhoto(models.Model):
     """
@@ -581,6 +868,11 @@ class AdPhoto(models.Model):
     Attributes:
         advertisement (models.ForeignKey): Объявление, к которому привязана фотография.
         image (models.ImageField): Фотография.
+        width (models.PositiveIntegerField): Ширина фотографии в пикселях, если известна.
+        height (models.PositiveIntegerField): Высота фотографии в пикселях, если известна.
+        renditions (models.JSONField): Уменьшенные версии фотографии (см. siteapp.images).
+        phash (models.BigIntegerField): Перцептивный хэш для поиска похожих
+            фотографий (см. siteapp.similarity).
     """
 
     advertisement = models.ForeignKey(
@@ -590,6 +882,18 @@ class AdPhoto(models.Model):
         verbose_name=_("объявление"),
     )
     image = models.ImageField(_("фото"), upload_to="ad_photos/%Y/%m/%d/")
+    width = models.PositiveIntegerField(
+        _("ширина"), blank=True, null=True, editable=False
+    )
+    height = models.PositiveIntegerField(
+        _("высота"), blank=True, null=True, editable=False
+    )
+    renditions = models.JSONField(
+        _("версии фото"), default=dict, blank=True, editable=False
+    )
+    phash = models.BigIntegerField(
+        _("перцептивный хэш"), blank=True, null=True, editable=False
+    )
 
     class Meta:
         """Метаданные модели."""
@@ -602,6 +906,25 @@ class AdPhoto(models.Model):
         """Возвращает строковое представление объекта."""
         return f"{_('Фото для объявления ID')}: {self.advertisement.id}"
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет фотографию, определяя её размеры, если они ещё не известны.
+        """
+        if self.image and (self.width is None or self.height is None):
+            self.width, self.height = self.read_dimensions()
+        super().save(*args, **kwargs)
+
+    def read_dimensions(self) -> typing.Tuple[Optional[int], Optional[int]]:
+        """
+        Читает размеры изображения; (None, None), если файл недоступен или
+        не является изображением.
+        """
+        try:
+            # Уже сохранённый файл открывается только на время чтения.
+            return get_image_dimensions(self.image, close=self.image.closed)
+        except (OSError, ValueError):
+            return None, None
+
     @property
     def image_url(self) -> str | None:
         """
@@ -615,6 +938,107 @@ class AdPhoto(models.Model):
         return None
 
 
+class AdPhotoHashBand(models.Model):
+    """
+    Полоса перцептивного хэша фотографии объявления.
+
+    Attributes:
+        photo (models.ForeignKey): Фотография.
+        band (models.PositiveSmallIntegerField): Номер полосы.
+        value (models.PositiveIntegerField): Биты хэша в этой полосе.
+
+    Похожие фотографии ищутся по близким значениям полос (см.
+    siteapp.similarity.similar_photos).
+    """
+
+    photo = models.ForeignKey(
+        AdPhoto,
+        related_name="hash_bands",
+        on_delete=models.CASCADE,
+        verbose_name=_("фото"),
+    )
+    band = models.PositiveSmallIntegerField(_("номер полосы"))
+    value = models.PositiveIntegerField(_("значение полосы"))
+
+    class Meta:
+        verbose_name = _("полоса хэша фото")
+        verbose_name_plural = _("полосы хэшей фото")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["photo", "band"], name="adphoto_hash_band_unique"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["band", "value"], name="adphoto_hash_band_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление объекта.
+        """
+        return f"{self.photo_id}: {self.band}={self.value}"
+
+
+class PhotoUploadSession(models.Model):
+    """
+    Сессия возобновляемой загрузки фотографии объявления по частям.
+
+    Attributes:
+        id (models.UUIDField): Идентификатор сессии.
+        user (models.ForeignKey): Пользователь, загружающий фотографию.
+        filename (models.CharField): Исходное имя файла.
+        size (models.PositiveBigIntegerField): Объявленный размер файла в байтах.
+        offset (models.PositiveBigIntegerField): Количество принятых байтов.
+        width (models.PositiveIntegerField): Ширина изображения после завершения.
+        height (models.PositiveIntegerField): Высота изображения после завершения.
+        completed_at (models.DateTimeField): Время завершения загрузки.
+        created_at (models.DateTimeField): Время создания сессии.
+        updated_at (models.DateTimeField): Время приёма последней части.
+
+    Части записываются во временный файл сессии (см. siteapp.uploads);
+    завершённая загрузка передаётся в `photo_uploads` при создании или
+    изменении объявления и после сохранения объявления удаляется.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="photo_upload_sessions",
+        on_delete=models.CASCADE,
+        verbose_name=_("пользователь"),
+    )
+    filename = models.CharField(_("имя файла"), max_length=255)
+    size = models.PositiveBigIntegerField(_("размер файла"))
+    offset = models.PositiveBigIntegerField(_("принято байтов"), default=0)
+    width = models.PositiveIntegerField(_("ширина"), blank=True, null=True)
+    height = models.PositiveIntegerField(_("высота"), blank=True, null=True)
+    completed_at = models.DateTimeField(_("дата завершения"), blank=True, null=True)
+    created_at = models.DateTimeField(_("дата создания"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("дата изменения"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("сессия загрузки фото")
+        verbose_name_plural = _("сессии загрузки фото")
+        ordering = ["-created_at"]
+        indexes = [
+            # Удаление брошенных сессий по времени последней части.
+            models.Index(fields=["updated_at"], name="upload_session_updated_idx"),
+        ]
+
+    def __str__(self) -> str:
+        """
+        Возвращает строковое представление объекта.
+        """
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def is_complete(self) -> bool:
+        """
+        Проверяет, завершена ли загрузка.
+        """
+        return self.completed_at is not None
+
+
 class AdResponse(models.Model):
     """
     Модель отклика на объявление.
@@ -644,11 +1068,25 @@ class AdResponse(models.Model):
         verbose_name = _("отклик на объявление")
         verbose_name_plural = _("отклики на объявления")
         ordering = ["-date_created"]
+        indexes = [
+            # Отклики объявления от новых к старым (курсор по date_created, id).
+            models.Index(
+                fields=["advertisement", "-date_created", "-id"],
+                name="adresponse_ad_date_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         """Возвращает строковое представление объекта."""
         return f"{_('Отклик от')} {self.user.get_full_name()} {_('на объявление ID')}: {self.advertisement.id}"
 
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет отклик в одной транзакции с обновлением счётчика объявления.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class ArticleCategory(models.Model):
     """
@@ -705,6 +1143,10 @@ class Article(models.Model):
         author (ForeignKey): Автор статьи.
         main_image (ImageField): Главное изображение статьи.
         categories (ManyToManyField): Категории, к которым относится статья.
+        main_image_renditions (JSONField): Уменьшенные версии главного
+            изображения (см. siteapp.images).
+        updated_at (DateTimeField): Время последнего изменения статьи, её
+            категорий или комментариев.
     """
 
     title: models.CharField = models.CharField(_("заголовок статьи"), max_length=255)
@@ -735,6 +1177,12 @@ class Article(models.Model):
         blank=True,
         verbose_name=_("категории"),
     )
+    main_image_renditions: models.JSONField = models.JSONField(
+        _("версии главного изображения"), default=dict, blank=True, editable=False
+    )
+    updated_at: models.DateTimeField = models.DateTimeField(
+        _("дата изменения"), auto_now=True
+    )
 
     class Meta:
         """
@@ -1,10 +1,17 @@
 from django.urls import path
-from . import views
+from . import views, warmup
 from django.http import JsonResponse
 
 
 def health_check(request):
-    """Простой эндпоинт для проверки здоровья."""
+    """
+    Простой эндпоинт для проверки здоровья.
+
+    Пока процесс прогревается (siteapp.warmup), отвечает 503, чтобы
+    балансировщик не направлял на него запросы.
+    """
+    if not warmup.is_ready():
+        return JsonResponse({"status": "warming"}, status=503)
     return JsonResponse({"status": "ok"})
 
 
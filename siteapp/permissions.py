@@ -151,6 +151,21 @@ class CanManageAdvertisements(permissions.BasePermission):
         return False
 
 
+class IsAdvertisementModerator(permissions.BasePermission):
+    """
+    Разрешает доступ модераторам объявлений: пользователям с правом
+    can_manage_any_advertisement или is_staff.
+    """
+
+    def has_permission(self, request: Type, view: Type) -> bool:
+        if not request.user or not request.user.is_authenticated:
+            return False
+        if request.user.is_staff:
+            return True
+        user_role = request.user.role
+        return bool(user_role and user_role.can_manage_any_advertisement)
+
+
 class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
     """
     Разрешает чтение всем (GET, HEAD, OPTIONS).
@@ -0,0 +1,177 @@
+# siteapp/region_activity.py
+"""
+Счётчики объявлений по регионам и статусам (RegionActivity).
+
+Блок "топ регионов" главной страницы читает готовые счётчики по индексу
+(status, -ad_count, region) вместо группировки всех объявлений по региону
+автора. Счётчики изменяются атомарными UPDATE с F-выражениями в той же
+транзакции, что и изменение данных:
+
+- создание и удаление объявления, смена его статуса или автора
+  (обработчики сигналов в siteapp.signals);
+- смена региона пользователя - все его объявления переносятся в новый
+  регион;
+- массовая смена статуса через QuerySet.update(), которая не вызывает
+  сигналы, - через apply_bulk_status_change до update().
+
+Расхождения, например после прямых изменений в базе, исправляет команда
+`reconcile_region_activity`.
+"""
+
+import typing
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Advertisement, RegionActivity, User
+
+Key = typing.Tuple[typing.Optional[int], typing.Optional[int]]
+
+
+def region_of(user_id: typing.Optional[int]) -> typing.Optional[int]:
+    """
+    Возвращает регион пользователя из базы.
+    """
+    if user_id is None:
+        return None
+    return User.objects.filter(pk=user_id).values_list("region_id", flat=True).first()
+
+
+def apply(deltas: typing.Mapping[Key, int]) -> None:
+    """
+    Изменяет счётчики на указанные величины.
+
+    :param deltas: (id региона, id статуса) -> изменение количества;
+        ключи без региона или статуса пропускаются
+    """
+    # Строки изменяются в одном порядке, чтобы параллельные транзакции не
+    # блокировали друг друга.
+    for (region_id, status_id), delta in sorted(
+        (key, delta) for key, delta in deltas.items() if delta and None not in key
+    ):
+        counters = RegionActivity.objects.filter(
+            region_id=region_id, status_id=status_id
+        )
+        if counters.update(ad_count=F("ad_count") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                RegionActivity.objects.create(
+                    region_id=region_id, status_id=status_id, ad_count=delta
+                )
+        except IntegrityError:
+            # Строку счётчика успела создать параллельная транзакция.
+            counters.update(ad_count=F("ad_count") + delta)
+
+
+def move(previous: Key, current: Key, count: int = 1) -> typing.Dict[Key, int]:
+    """
+    Возвращает изменения счётчиков при переносе count объявлений.
+    """
+    deltas: typing.Dict[Key, int] = Counter()
+    if previous != current:
+        deltas[previous] -= count
+        deltas[current] += count
+    return deltas
+
+
+def counts(queryset=None) -> typing.Dict[Key, int]:
+    """
+    Считает объявления по региону автора и статусу.
+
+    :param queryset: объявления; по умолчанию все
+    """
+    queryset = Advertisement.objects.all() if queryset is None else queryset
+    return {
+        (row["user__region_id"], row["status_id"]): row["total"]
+        for row in queryset.filter(user__region__isnull=False)
+        .order_by()
+        .values("user__region_id", "status_id")
+        .annotate(total=Count("pk"))
+    }
+
+
+def apply_bulk_status_change(queryset, status_id: int) -> None:
+    """
+    Переносит счётчики объявлений QuerySet в статус status_id. Вызывается
+    перед queryset.update(status=...) в той же транзакции.
+    """
+    deltas: typing.Dict[Key, int] = Counter()
+    for (region_id, previous_status_id), total in counts(queryset).items():
+        deltas.update(
+            move((region_id, previous_status_id), (region_id, status_id), total)
+        )
+    apply(deltas)
+
+
+def apply_user_region_change(
+    user_id: int,
+    previous_region_id: typing.Optional[int],
+    region_id: typing.Optional[int],
+) -> None:
+    """
+    Переносит объявления пользователя в счётчики нового региона.
+    """
+    if previous_region_id == region_id:
+        return
+    deltas: typing.Dict[Key, int] = Counter()
+    for status_id, total in (
+        Advertisement.objects.filter(user_id=user_id)
+        .order_by()
+        .values_list("status_id")
+        .annotate(total=Count("pk"))
+    ):
+        deltas.update(
+            move((previous_region_id, status_id), (region_id, status_id), total)
+        )
+    apply(deltas)
+
+
+def top_regions(
+    status_id: int, limit: int = 5
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Возвращает регионы с наибольшим количеством объявлений в статусе.
+
+    :return: словари с ключами region__id, region__name и ad_count (как
+        ожидает RegionActivitySerializer)
+    """
+    return list(
+        RegionActivity.objects.filter(status_id=status_id, ad_count__gt=0)
+        .order_by("-ad_count", "region_id")
+        .values("region__id", "region__name", "ad_count")[:limit]
+    )
+
+
+def reconcile(dry_run: bool = False) -> typing.List[typing.Tuple[int, int, int, int]]:
+    """
+    Сверяет счётчики с объявлениями и исправляет расхождения.
+
+    :param dry_run: только найти расхождения
+    :return: четвёрки (id региона, id статуса, значение счётчика, верное
+        значение) для неверных и недостающих счётчиков
+    """
+    with transaction.atomic():
+        stored = {
+            (row.region_id, row.status_id): row
+            for row in RegionActivity.objects.select_for_update()
+        }
+        expected = counts()
+        drifted = []
+        to_create, to_update = [], []
+        for key in sorted(stored.keys() | expected.keys()):
+            row, actual = stored.get(key), expected.get(key, 0)
+            if row is None:
+                drifted.append((*key, 0, actual))
+                to_create.append(
+                    RegionActivity(region_id=key[0], status_id=key[1], ad_count=actual)
+                )
+            elif row.ad_count != actual:
+                drifted.append((*key, row.ad_count, actual))
+                row.ad_count = actual
+                to_update.append(row)
+        if not dry_run:
+            RegionActivity.objects.bulk_create(to_create)
+            RegionActivity.objects.bulk_update(to_update, ["ad_count"])
+    return drifted
@@ -0,0 +1,361 @@
+# siteapp/search.py
+"""
+Полнотекстовый поиск по объявлениям.
+
+Индекс хранится в отдельной таблице, структура которой зависит от СУБД:
+
+- SQLite: виртуальная таблица FTS5 `siteapp_advertisement_fts` (rowid = id
+  объявления). В неё записывается текст, уже прошедший русский стемминг
+  (алгоритм Snowball), а запрос строится из префиксов основ слов.
+- PostgreSQL: таблица `siteapp_advertisement_search` с колонкой tsvector
+  (конфигурация 'russian') и GIN-индексом.
+
+Индекс обновляется инкрементально сигналами при сохранении объявления и
+животного (см. siteapp.signals) и полностью перестраивается командой
+`rebuild_search_index`. Для прочих СУБД, а также если индекс не создан,
+используется прежний поиск через icontains.
+"""
+
+import re
+import typing
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+
+SQLITE_TABLE = "siteapp_advertisement_fts"
+POSTGRES_TABLE = "siteapp_advertisement_search"
+
+# Веса колонок для bm25 в SQLite: заголовок, описание, кличка животного.
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_VOWELS = "аеиоуыэюя"
+
+_PERFECTIVE_GERUND = (
+    ("в вши вшись".split(), "ая"),
+    ("ив ивши ившись ыв ывши ывшись".split(), None),
+)
+_REFLEXIVE = (("ся сь".split(), None),)
+_ADJECTIVE = (
+    (
+        "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю "
+        "ая яя ою ею".split(),
+        None,
+    ),
+)
+_PARTICIPLE = (
+    ("ем нн вш ющ щ".split(), "ая"),
+    ("ивш ывш ующ".split(), None),
+)
+_VERB = (
+    ("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно".split(), "ая"),
+    (
+        "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят "
+        "ует уют ит ыт ены ить ыть ишь ую ю".split(),
+        None,
+    ),
+)
+_NOUN = (
+    (
+        "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом "
+        "о у ах иях ях ы ь ию ью ю ия ья я".split(),
+        None,
+    ),
+)
+_SUPERLATIVE = (("ейше ейш".split(), None),)
+_DERIVATIONAL = (("ость ост".split(), None),)
+
+
+def _regions(word: str) -> typing.Tuple[int, int]:
+    """
+    Возвращает начала областей RV и R2 слова по правилам Snowball.
+    """
+    length = len(word)
+    rv = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), length)
+
+    def after_vowel_consonant(start: int) -> int:
+        for i in range(max(start, 1), length):
+            if word[i] not in _VOWELS and word[i - 1] in _VOWELS and i - 1 >= start:
+                return i + 1
+        return length
+
+    r1 = after_vowel_consonant(0)
+    r2 = after_vowel_consonant(r1)
+    return rv, r2
+
+
+def _strip(word: str, start: int, groups: tuple) -> typing.Optional[str]:
+    """
+    Удаляет самое длинное окончание из groups, лежащее в области word[start:].
+
+    Окончания первой группы Snowball требуют перед собой "а" или "я".
+    """
+    region = word[start:]
+    best = 0
+    for endings, preceded_by in groups:
+        for ending in endings:
+            if len(ending) <= best or not region.endswith(ending):
+                continue
+            if preceded_by:
+                rest = region[: -len(ending)]
+                if not rest or rest[-1] not in preceded_by:
+                    continue
+            best = len(ending)
+    return word[:-best] if best else None
+
+
+def stem_russian(word: str) -> str:
+    """
+    Возвращает основу русского слова (алгоритм Snowball для русского языка).
+
+    Слова без кириллицы возвращаются в нижнем регистре без изменений.
+    """
+    word = word.lower().replace("ё", "е")
+    if not any(ch in _VOWELS for ch in word):
+        return word
+
+    rv, r2 = _regions(word)
+
+    stem = _strip(word, rv, _PERFECTIVE_GERUND)
+    if stem is None:
+        word = _strip(word, rv, _REFLEXIVE) or word
+        stem = _strip(word, rv, _ADJECTIVE)
+        if stem is not None:
+            stem = _strip(stem, rv, _PARTICIPLE) or stem
+        else:
+            stem = _strip(word, rv, _VERB)
+            if stem is None:
+                stem = _strip(word, rv, _NOUN)
+    if stem is not None:
+        word = stem
+
+    if word[rv:].endswith("и"):
+        word = word[:-1]
+
+    stem = _strip(word, r2, _DERIVATIONAL)
+    if stem is not None:
+        word = stem
+
+    if word[rv:].endswith("нн"):
+        word = word[:-1]
+    else:
+        stem = _strip(word, rv, _SUPERLATIVE)
+        if stem is not None:
+            word = stem[:-1] if stem.endswith("нн") else stem
+        elif word[rv:].endswith("ь"):
+            word = word[:-1]
+    return word
+
+
+def stemmed_tokens(text: typing.Optional[str]) -> typing.List[str]:
+    """
+    Разбивает текст на слова и возвращает их основы.
+    """
+    if not text:
+        return []
+    return [stem for stem in map(stem_russian, _WORD_RE.findall(text)) if stem]
+
+
+def stemmed_text(text: typing.Optional[str]) -> str:
+    return " ".join(stemmed_tokens(text))
+
+
+def _fts5_query(value: str) -> str:
+    """
+    Строит запрос FTS5: все основы слов запроса как префиксы (логическое И).
+    """
+    terms = []
+    for stem in dict.fromkeys(stemmed_tokens(value)):
+        if len(stem) < 2:
+            # Однобуквенные предлоги и союзы как префикс совпадают почти со всем.
+            continue
+        escaped = stem.replace('"', '""')
+        terms.append(f'"{escaped}"*')
+    return " ".join(terms)
+
+
+_index_available: typing.Dict[str, bool] = {}
+
+
+def index_available() -> bool:
+    """
+    Проверяет, создана ли таблица поискового индекса в текущей БД.
+    """
+    key = f"{connection.alias}:{connection.settings_dict.get('NAME')}"
+    if key not in _index_available:
+        if connection.vendor == "sqlite":
+            table = SQLITE_TABLE
+        elif connection.vendor == "postgresql":
+            table = POSTGRES_TABLE
+        else:
+            table = None
+        _index_available[key] = bool(
+            table and table in connection.introspection.table_names()
+        )
+    return _index_available[key]
+
+
+def search_advertisements(queryset: QuerySet, value: str) -> QuerySet:
+    """
+    Фильтрует объявления по поисковому запросу и сортирует по релевантности.
+
+    Добавляет аннотацию `search_rank` (больше - релевантнее).
+
+    :param queryset: исходный QuerySet объявлений
+    :param value: поисковый запрос пользователя
+    :return: отфильтрованный и отсортированный QuerySet
+    """
+    if not index_available():
+        return queryset.filter(
+            Q(title__icontains=value)
+            | Q(description__icontains=value)
+            | Q(animal__name__icontains=value)
+        ).distinct()
+
+    # Таблица индекса присоединяется к запросу один раз: условие поиска и
+    # функция ранжирования вычисляются при одном её просмотре, а не
+    # подзапросом для каждой строки результата.
+    table = queryset.model._meta.db_table
+    if connection.vendor == "sqlite":
+        match = _fts5_query(value)
+        if not match:
+            return queryset.none()
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        rank_sql = f"-bm25({SQLITE_TABLE}, {weights})"
+        rank_params: typing.List[str] = []
+        where = [
+            f'{SQLITE_TABLE}.rowid = "{table}"."id"',
+            f"{SQLITE_TABLE} MATCH %s",
+        ]
+        params = [match]
+        index_table = SQLITE_TABLE
+    else:
+        if not stemmed_tokens(value):
+            return queryset.none()
+        query = "plainto_tsquery('russian', %s)"
+        rank_sql = f"ts_rank_cd({POSTGRES_TABLE}.document, {query})"
+        rank_params = [value]
+        where = [
+            f'{POSTGRES_TABLE}.advertisement_id = "{table}"."id"',
+            f"{POSTGRES_TABLE}.document @@ {query}",
+        ]
+        params = [value]
+        index_table = POSTGRES_TABLE
+
+    return queryset.extra(
+        select={"search_rank": rank_sql},
+        select_params=rank_params,
+        tables=[index_table],
+        where=where,
+        params=params,
+    ).order_by("-search_rank", "-publication_date")
+
+
+def _rows_for(advertisement_ids: typing.Iterable[int]) -> typing.List[tuple]:
+    from .models import Advertisement
+
+    return list(
+        Advertisement.objects.filter(id__in=list(advertisement_ids)).values_list(
+            "id", "title", "description", "animal__name"
+        )
+    )
+
+
+def _write_sqlite_rows(cursor, rows: typing.List[tuple]) -> None:
+    cursor.executemany(
+        f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [(row[0],) for row in rows]
+    )
+    cursor.executemany(
+        f"INSERT INTO {SQLITE_TABLE} (rowid, title, description, animal_name) "
+        f"VALUES (%s, %s, %s, %s)",
+        [
+            (ad_id, stemmed_text(title), stemmed_text(description), stemmed_text(name))
+            for ad_id, title, description, name in rows
+        ],
+    )
+
+
+_POSTGRES_UPSERT = f"""
+    INSERT INTO {POSTGRES_TABLE} (advertisement_id, document)
+    SELECT ad.id,
+           setweight(to_tsvector('russian', coalesce(ad.title, '')), 'A')
+           || setweight(to_tsvector('russian', coalesce(animal.name, '')), 'A')
+           || setweight(to_tsvector('russian', coalesce(ad.description, '')), 'B')
+    FROM siteapp_advertisement ad
+    JOIN siteapp_animal animal ON animal.id = ad.animal_id
+    {{where}}
+    ON CONFLICT (advertisement_id) DO UPDATE SET document = EXCLUDED.document
+"""
+
+
+def index_advertisements(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Добавляет или обновляет записи индекса для указанных объявлений.
+    """
+    advertisement_ids = list(advertisement_ids)
+    if not advertisement_ids or not index_available():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            _write_sqlite_rows(cursor, _rows_for(advertisement_ids))
+        else:
+            cursor.execute(
+                _POSTGRES_UPSERT.format(where="WHERE ad.id = ANY(%s)"),
+                [advertisement_ids],
+            )
+
+
+def remove_advertisements(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Удаляет записи индекса для указанных объявлений.
+    """
+    advertisement_ids = [(ad_id,) for ad_id in advertisement_ids]
+    if not advertisement_ids or not index_available():
+        return
+    if connection.vendor == "sqlite":
+        sql = f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s"
+    else:
+        sql = f"DELETE FROM {POSTGRES_TABLE} WHERE advertisement_id = %s"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, advertisement_ids)
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """
+    Полностью перестраивает поисковый индекс.
+
+    :param batch_size: размер пачки объявлений для SQLite
+    :return: количество проиндексированных объявлений
+    """
+    from .models import Advertisement
+
+    if not index_available():
+        return 0
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+            cursor.execute(_POSTGRES_UPSERT.format(where=""))
+            return cursor.rowcount
+
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+        indexed = 0
+        batch = []
+        rows = (
+            Advertisement.objects.order_by("pk")
+            .values_list("id", "title", "description", "animal__name")
+            .iterator(chunk_size=batch_size)
+        )
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _write_sqlite_rows(cursor, batch)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            _write_sqlite_rows(cursor, batch)
+            indexed += len(batch)
+        cursor.execute(
+            f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')"
+        )
+        return indexed
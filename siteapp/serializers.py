@@ -17,12 +17,182 @@ from .models import (
     Comment,
     Breed,
     AdvertisementRating,
+    AdvertisementMatch,
+    PhotoUploadSession,
 )
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from djoser.serializers import UserSerializer as BaseUserSerializer
 from django.utils.translation import gettext_lazy as _
+from django.db.models import Count, Prefetch, QuerySet
+
+from django.core.validators import get_available_image_extensions
+from django.db import transaction
+
+from . import autocomplete, fingerprints, images, lookups, similarity
+from . import uploads
+from .uploads import PhotoUpload
+
+SPARSE_FIELDS_PARAM = "fields"
+SPARSE_OMIT_PARAM = "omit"
+# Сколько последних откликов встраивается в детали объявления; остальные
+# доступны постранично по /advertisements/<id>/responses/.
+DETAIL_RESPONSES_LIMIT = 10
+
+
+def _lookup_name(lookup: typing.Union[str, Prefetch]) -> str:
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+def _split_param(request, name: str) -> typing.Set[str]:
+    value = request.query_params.get(name, "") if request is not None else ""
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Разреженные наборы полей: параметры запроса `?fields=a,b` и `?omit=c`.
+
+    `fields` оставляет в ответе только перечисленные поля верхнего уровня,
+    `omit` исключает перечисленные. Неизвестные имена игнорируются.
+    Исключённые поля не создаются, поэтому их значения не вычисляются.
+
+    Чтобы представление не загружало данные для исключённых полей, для
+    каждого поля описывается, что ему нужно:
+
+    - field_select_related: связи для select_related;
+    - field_prefetch_related: связи (строки или Prefetch) для prefetch_related;
+    - field_annotations: аннотации QuerySet;
+    - field_columns: столбцы модели, которые нужны только этим полям и
+      откладываются (defer), если ни одно из них не выбрано.
+
+    QuerySet собирается методом optimize_queryset.
+    """
+
+    field_select_related: typing.Dict[str, typing.List[str]] = {}
+    field_prefetch_related: typing.Dict[str, typing.List[str]] = {}
+    field_annotations: typing.Dict[str, typing.Any] = {}
+    field_columns: typing.Dict[str, typing.List[str]] = {}
+
+    @classmethod
+    def selected_field_names(cls, request) -> typing.List[str]:
+        """
+        Возвращает имена полей, выбранных параметрами запроса.
+
+        :param request: запрос DRF или None
+        :return: имена полей из Meta.fields в исходном порядке
+        """
+        names = list(cls.Meta.fields)
+        requested = _split_param(request, SPARSE_FIELDS_PARAM)
+        omitted = _split_param(request, SPARSE_OMIT_PARAM)
+        return [
+            name
+            for name in names
+            if (not requested or name in requested) and name not in omitted
+        ]
+
+    @classmethod
+    def optimize_queryset(cls, queryset: QuerySet, request) -> QuerySet:
+        """
+        Добавляет к QuerySet только те связи, аннотации и столбцы, которые
+        нужны выбранным полям.
+
+        :param queryset: исходный QuerySet без select_related/prefetch_related
+        :param request: запрос DRF
+        :return: QuerySet для сериализации выбранных полей
+        """
+        names = cls.selected_field_names(request)
+
+        select_related = {
+            relation
+            for name in names
+            for relation in cls.field_select_related.get(name, [])
+        }
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+
+        prefetch_related = {
+            relation
+            for name in names
+            for relation in cls.field_prefetch_related.get(name, [])
+        }
+        if prefetch_related:
+            queryset = queryset.prefetch_related(
+                *sorted(prefetch_related, key=_lookup_name)
+            )
+
+        annotations = {
+            name: cls.field_annotations[name]
+            for name in names
+            if name in cls.field_annotations
+        }
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        needed_columns = {
+            column for name in names for column in cls.field_columns.get(name, [])
+        }
+        deferred_columns = {
+            column
+            for columns in cls.field_columns.values()
+            for column in columns
+            if column not in needed_columns
+        }
+        if deferred_columns:
+            queryset = queryset.defer(*sorted(deferred_columns))
+        return queryset
+
+    def get_fields(self) -> typing.Dict[str, serializers.Field]:
+        """
+        Оставляет только выбранные поля для сериализатора верхнего уровня.
+        """
+        fields = super().get_fields()
+        root = self.root
+        is_top_level = root is self or (
+            isinstance(root, serializers.ListSerializer) and root.child is self
+        )
+        if not is_top_level:
+            return fields
+        selected = set(self.selected_field_names(self.context.get("request")))
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+def renditions_data(
+    renditions: typing.Optional[typing.Dict[str, typing.Any]], storage, request
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """
+    Возвращает заполнитель и абсолютные URL уменьшенных версий изображения
+    (см. siteapp.images) или None, если версии ещё не построены.
+    """
+
+    def url(name: str) -> str:
+        relative = storage.url(name)
+        return request.build_absolute_uri(relative) if request else relative
+
+    return images.rendition_data(renditions, url)
+
+
+def cover_photo_data(
+    advertisement: Advertisement, request
+) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """
+    Возвращает обложку объявления: абсолютный URL и размеры в пикселях.
+
+    Размеры позволяют фронтенду зарезервировать место под изображение до
+    его загрузки; для фотографий с неизвестными размерами они равны None.
+    renditions - уменьшенные версии для карточек (см. renditions_data).
+    """
+    cover = advertisement.cover_photo
+    if not cover or not cover.image:
+        return None
+    url = cover.image.url
+    return {
+        "url": request.build_absolute_uri(url) if request else url,
+        "width": cover.width,
+        "height": cover.height,
+        "renditions": renditions_data(cover.renditions, cover.image.storage, request),
+    }
 
 
 class CommentAuthorSerializer(serializers.ModelSerializer):
@@ -120,7 +290,8 @@ class HomePageAdSerializer(serializers.ModelSerializer):
     Сериализатор для главной страницы объявлений.
 
     Поля:
-    - first_photo_url: URL первой фотографии объявления,
+    - first_photo_url: URL обложки объявления,
+    - cover_photo: обложка объявления с размерами,
     - location: местоположение пользователя,
     - short_description: краткое описание объявления,
     - species_name: название вида животного,
@@ -129,6 +300,7 @@ class HomePageAdSerializer(serializers.ModelSerializer):
     """
 
     first_photo_url: str | None = serializers.SerializerMethodField()
+    cover_photo: dict | None = serializers.SerializerMethodField()
     location: str = serializers.SerializerMethodField()
     short_description: str = serializers.SerializerMethodField()
     species_name: str = serializers.CharField(
@@ -147,6 +319,7 @@ class HomePageAdSerializer(serializers.ModelSerializer):
             "short_description",
             "publication_date",
             "first_photo_url",
+            "cover_photo",
             "location",
             "species_name",
             "status_name",
@@ -154,16 +327,19 @@ class HomePageAdSerializer(serializers.ModelSerializer):
 
     def get_first_photo_url(self, obj: Advertisement) -> str | None:
         """
-        Возвращает URL первой фотографии объявления или None, если фотографий нет.
+        Возвращает URL обложки объявления или None, если фотографий нет.
         """
-        first_photo = obj.photos.first()
-        if first_photo and first_photo.image:
+        cover = obj.cover_photo
+        if cover and cover.image:
             request = self.context.get("request")
             if request:
-                return request.build_absolute_uri(first_photo.image.url)
-            return first_photo.image.url
+                return request.build_absolute_uri(cover.image.url)
+            return cover.image.url
         return None
 
+    def get_cover_photo(self, obj: Advertisement) -> dict | None:
+        return cover_photo_data(obj, self.context.get("request"))
+
     def get_location(self, obj: Advertisement) -> str:
         """
         Возвращает название региона пользователя или 'Не указано', если регион не задан.
@@ -195,7 +371,8 @@ class HomePageArticleSerializer(serializers.ModelSerializer):
     - excerpt: краткое описание статьи (150 символов),
     - publication_date: дата публикации статьи,
     - author_name: отображаемое имя автора,
-    - main_image_url: URL главного изображения.
+    - main_image_url: URL главного изображения,
+    - main_image_renditions: уменьшенные версии главного изображения.
     """
 
     author_name: str = serializers.CharField(
@@ -203,6 +380,7 @@ class HomePageArticleSerializer(serializers.ModelSerializer):
     )
     excerpt: str = serializers.SerializerMethodField()
     main_image_url: str = serializers.SerializerMethodField()
+    main_image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Article
@@ -213,6 +391,7 @@ class HomePageArticleSerializer(serializers.ModelSerializer):
             "publication_date",
             "author_name",
             "main_image_url",
+            "main_image_renditions",
         ]
 
     def get_excerpt(self, obj: Article) -> str:
@@ -230,6 +409,13 @@ class HomePageArticleSerializer(serializers.ModelSerializer):
             return obj.main_image.url
         return None
 
+    def get_main_image_renditions(self, obj: Article) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.main_image_renditions,
+            obj.main_image.storage,
+            self.context.get("request"),
+        )
+
 
 class ArticleCategorySerializer(serializers.ModelSerializer):
     """
@@ -246,7 +432,7 @@ class ArticleCategorySerializer(serializers.ModelSerializer):
         fields: typing.List[str] = ["id", "name", "slug"]
 
 
-class ArticleListSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Сериализатор для списка статей.
 
@@ -257,6 +443,7 @@ class ArticleListSerializer(serializers.ModelSerializer):
     - publication_date: дата публикации статьи,
     - author_name: отображаемое имя автора,
     - main_image_url: URL главного изображения,
+    - main_image_renditions: уменьшенные версии главного изображения,
     - categories: список категорий, к которым относится статья,
     - comments_count: количество комментариев к статье.
     """
@@ -265,6 +452,7 @@ class ArticleListSerializer(serializers.ModelSerializer):
         source="author.display_name", allow_null=True, read_only=True
     )
     main_image_url: typing.Optional[str] = serializers.SerializerMethodField()
+    main_image_renditions = serializers.SerializerMethodField()
     excerpt = serializers.CharField(read_only=True)
     categories = ArticleCategorySerializer(many=True, read_only=True)
 
@@ -282,10 +470,19 @@ class ArticleListSerializer(serializers.ModelSerializer):
             "publication_date",
             "author_name",
             "main_image_url",
+            "main_image_renditions",
             "categories",
             "comments_count",
         ]
 
+    field_select_related = {"author_name": ["author"]}
+    field_prefetch_related = {"categories": ["categories"]}
+    field_annotations = {"comments_count": Count("comments")}
+    field_columns = {
+        "excerpt": ["content"],
+        "main_image_renditions": ["main_image_renditions"],
+    }
+
     def get_main_image_url(self, obj: Article) -> typing.Optional[str]:
         """
         Возвращает URL-адрес главного изображения, если оно есть.
@@ -298,6 +495,13 @@ class ArticleListSerializer(serializers.ModelSerializer):
 
         return None
 
+    def get_main_image_renditions(self, obj: Article) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.main_image_renditions,
+            obj.main_image.storage,
+            self.context.get("request"),
+        )
+
 
 class ArticleAuthorSerializer(serializers.ModelSerializer):
     """
@@ -306,15 +510,17 @@ class ArticleAuthorSerializer(serializers.ModelSerializer):
     Поля:
     - id: идентификатор автора,
     - display_name: отображаемое имя автора,
-    - avatar_url: URL аватарки автора.
+    - avatar_url: URL аватарки автора,
+    - avatar_renditions: уменьшенные версии аватарки.
 
     """
 
     avatar_url: typing.Optional[str] = serializers.SerializerMethodField()
+    avatar_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "display_name", "avatar_url"]
+        fields = ["id", "display_name", "avatar_url", "avatar_renditions"]
 
     def get_avatar_url(self, obj: User) -> typing.Optional[str]:
         """
@@ -328,8 +534,13 @@ class ArticleAuthorSerializer(serializers.ModelSerializer):
 
         return None
 
+    def get_avatar_renditions(self, obj: User) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.avatar_renditions, obj.avatar.storage, self.context.get("request")
+        )
+
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class ArticleDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Сериализатор для детальной информации о статье.
 
@@ -340,12 +551,14 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
     - publication_date: дата публикации статьи,
     - author: автор статьи (детали: User),
     - main_image_url: URL главного изображения статьи,
+    - main_image_renditions: уменьшенные версии главного изображения,
     - categories: список категорий статьи (детали: ArticleCategory),
     - comments: список комментариев к статье (детали: Comment).
     """
 
     author: ArticleAuthorSerializer = ArticleAuthorSerializer(read_only=True)
     main_image_url: str = serializers.SerializerMethodField()
+    main_image_renditions = serializers.SerializerMethodField()
     categories: typing.List[ArticleCategory] = ArticleCategorySerializer(
         many=True, read_only=True
     )
@@ -360,10 +573,21 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
             "publication_date",
             "author",
             "main_image_url",
+            "main_image_renditions",
             "categories",
             "comments",
         ]
 
+    field_select_related = {"author": ["author"]}
+    field_prefetch_related = {
+        "categories": ["categories"],
+        "comments": ["comments__user"],
+    }
+    field_columns = {
+        "content": ["content"],
+        "main_image_renditions": ["main_image_renditions"],
+    }
+
     def get_main_image_url(self, obj: Article) -> str:
         if obj.main_image and hasattr(obj.main_image, "url"):
             request = self.context.get("request")
@@ -372,6 +596,13 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
             return obj.main_image.url
         return ""
 
+    def get_main_image_renditions(self, obj: Article) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.main_image_renditions,
+            obj.main_image.storage,
+            self.context.get("request"),
+        )
+
 
 class AdListAdPhotoSerializer(serializers.ModelSerializer):
     """
@@ -436,7 +667,7 @@ class AdListUserSerializer(serializers.ModelSerializer):
         fields: list[str] = ["id", "display_name", "region"]
 
 
-class AdvertisementListSerializer(serializers.ModelSerializer):
+class AdvertisementListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Сериализатор для отображения списка объявлений.
 
@@ -444,13 +675,15 @@ class AdvertisementListSerializer(serializers.ModelSerializer):
     - animal: информация о животном,
     - user: информация о пользователе,
     - status: статус объявления,
-    - first_photo_url: URL первой фотографии,
+    - first_photo_url: URL обложки,
+    - cover_photo: обложка с размерами,
     - location: местоположение,
     - publication_date: дата публикации,
     - short_description: краткое описание,
     - comments_count: количество комментариев,
     - average_rating: средний рейтинг,
-    - rating_count: количество оценок.
+    - rating_count: количество оценок,
+    - distance_km: расстояние до точки поиска `near` (иначе null).
     """
 
     animal: AdListAnimalSerializer = AdListAnimalSerializer(read_only=True)
@@ -459,6 +692,7 @@ class AdvertisementListSerializer(serializers.ModelSerializer):
     first_photo_url: serializers.SerializerMethodField = (
         serializers.SerializerMethodField()
     )
+    cover_photo: serializers.SerializerMethodField = serializers.SerializerMethodField()
     location: serializers.SerializerMethodField = serializers.SerializerMethodField()
 
     publication_date: serializers.DateTimeField = serializers.DateTimeField(
@@ -468,14 +702,11 @@ class AdvertisementListSerializer(serializers.ModelSerializer):
         serializers.SerializerMethodField()
     )
     comments_count: serializers.IntegerField = serializers.IntegerField(
-        read_only=True, required=False
-    )
-    average_rating: serializers.FloatField = serializers.FloatField(
-        read_only=True, required=False
-    )
-    rating_count: serializers.IntegerField = serializers.IntegerField(
-        read_only=True, required=False
+        source="responses_count", read_only=True
     )
+    average_rating: serializers.FloatField = serializers.FloatField(read_only=True)
+    rating_count: serializers.IntegerField = serializers.IntegerField(read_only=True)
+    distance_km: serializers.SerializerMethodField = serializers.SerializerMethodField()
 
     class Meta:
         model: type = Advertisement
@@ -490,21 +721,36 @@ class AdvertisementListSerializer(serializers.ModelSerializer):
             "latitude",
             "longitude",
             "first_photo_url",
+            "cover_photo",
             "location",
             "comments_count",
             "average_rating",
             "rating_count",
+            "distance_km",
         ]
 
+    field_select_related = {
+        "animal": ["animal__species", "animal__breed", "animal__color"],
+        "user": ["user__region"],
+        "status": ["status"],
+        "location": ["user__region"],
+        "first_photo_url": ["cover_photo"],
+        "cover_photo": ["cover_photo"],
+    }
+    field_columns = {"short_description": ["description"]}
+
     def get_first_photo_url(self, obj: Advertisement) -> str | None:
-        first_photo = obj.photos.first()
-        if first_photo and first_photo.image:
+        cover = obj.cover_photo
+        if cover and cover.image:
             request = self.context.get("request")
             if request:
-                return request.build_absolute_uri(first_photo.image.url)
-            return first_photo.image.url
+                return request.build_absolute_uri(cover.image.url)
+            return cover.image.url
         return None
 
+    def get_cover_photo(self, obj: Advertisement) -> dict | None:
+        return cover_photo_data(obj, self.context.get("request"))
+
     def get_location(self, obj: Advertisement) -> str:
         if obj.user and obj.user.region:
             return obj.user.region.name
@@ -519,6 +765,10 @@ class AdvertisementListSerializer(serializers.ModelSerializer):
             )
         return ""
 
+    def get_distance_km(self, obj: Advertisement) -> float | None:
+        distance = getattr(obj, "distance_km", None)
+        return round(distance, 3) if distance is not None else None
+
 
 class RegionSerializer(serializers.ModelSerializer):
     """
@@ -587,10 +837,12 @@ class AdDetailAuthorSerializer(serializers.ModelSerializer):
     - phone_number - телефон,
     - email - email,
     - avatar_url - URL-адрес аватара,
+    - avatar_renditions - уменьшенные версии аватара,
     - region - регион.
     """
 
     avatar_url: typing.Optional[str] = serializers.SerializerMethodField()
+    avatar_renditions = serializers.SerializerMethodField()
     role: str = serializers.StringRelatedField()
 
     class Meta:
@@ -602,6 +854,7 @@ class AdDetailAuthorSerializer(serializers.ModelSerializer):
             "phone_number",
             "email",
             "avatar_url",
+            "avatar_renditions",
             "region",
         ]
 
@@ -621,6 +874,11 @@ class AdDetailAuthorSerializer(serializers.ModelSerializer):
             )
         return None
 
+    def get_avatar_renditions(self, obj: User) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.avatar_renditions, obj.avatar.storage, self.context.get("request")
+        )
+
 
 class AdDetailAnimalSerializer(serializers.ModelSerializer):
     """
@@ -702,13 +960,16 @@ class AdDetailAnimalSerializer(serializers.ModelSerializer):
 class AdDetailPhotoSerializer(serializers.ModelSerializer):
     """
     Сериализатор для фото объявления.
+
+    renditions - уменьшенные версии фото (см. renditions_data).
     """
 
     image_url = serializers.SerializerMethodField(method_name="get_absolute_image_url")
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = AdPhoto
-        fields = ["id", "image", "image_url"]
+        fields = ["id", "image", "image_url", "width", "height", "renditions"]
 
     def get_absolute_image_url(self, obj: AdPhoto) -> typing.Optional[str]:
         """
@@ -726,6 +987,11 @@ class AdDetailPhotoSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
+    def get_renditions(self, obj: AdPhoto) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.renditions, obj.image.storage, self.context.get("request")
+        )
+
 
 # Для комментариев/откликов
 class AdResponseSerializer(serializers.ModelSerializer):
@@ -750,25 +1016,97 @@ class AdResponseSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "message", "date_created"]
 
 
-class AdvertisementDetailSerializer(serializers.ModelSerializer):
+def latest_responses_prefetch() -> Prefetch:
+    """
+    Возвращает Prefetch последних DETAIL_RESPONSES_LIMIT откликов объявления
+    в атрибут latest_responses.
+
+    Срез в Prefetch выполняется одним запросом с оконной функцией, поэтому
+    объём загрузки не зависит от общего числа откликов.
+    """
+    return Prefetch(
+        "responses",
+        queryset=AdResponse.objects.select_related("user__role").order_by(
+            "-date_created", "-id"
+        )[:DETAIL_RESPONSES_LIMIT],
+        to_attr="latest_responses",
+    )
+
+
+def matches_prefetch() -> Prefetch:
+    """
+    Загружает пары объявления (см. siteapp.matching) с данными подходящих
+    объявлений для карточек.
+    """
+    return Prefetch(
+        "matches",
+        queryset=AdvertisementMatch.objects.select_related(
+            "matched__status", "matched__cover_photo"
+        ).order_by("-score", "matched_id"),
+    )
+
+
+class AdvertisementMatchSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор подходящего объявления противоположного статуса.
+
+    id - идентификатор подходящего объявления,
+    title - его заголовок,
+    status - его статус,
+    publication_date - дата его размещения,
+    cover_photo - его обложка (см. cover_photo_data),
+    score - оценка пары от 0 до 1.
+    """
+
+    id = serializers.IntegerField(source="matched_id", read_only=True)
+    title = serializers.CharField(source="matched.title", read_only=True)
+    status = serializers.CharField(source="matched.status.name", read_only=True)
+    publication_date = serializers.DateTimeField(
+        source="matched.publication_date",
+        format="%Y-%m-%dT%H:%M:%S.%fZ",
+        read_only=True,
+    )
+    cover_photo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AdvertisementMatch
+        fields = ["id", "title", "status", "publication_date", "cover_photo", "score"]
+
+    def get_cover_photo(
+        self, obj: AdvertisementMatch
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        return cover_photo_data(obj.matched, self.context.get("request"))
+
+
+class AdvertisementDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Сериализатор для детального просмотра объявления.
+
+    responses содержит только последние DETAIL_RESPONSES_LIMIT откликов,
+    comments_count - их общее количество. QuerySet должен загружать отклики
+    через latest_responses_prefetch (см. optimize_queryset).
+
+    matches - подходящие объявления противоположного статуса от лучших
+    (см. siteapp.matching).
     """
 
     animal = AdDetailAnimalSerializer(read_only=True)
     user = AdDetailAuthorSerializer(read_only=True)
     status = serializers.StringRelatedField()
     photos = AdDetailPhotoSerializer(many=True, read_only=True)
-    responses = AdResponseSerializer(many=True, read_only=True)
+    responses = AdResponseSerializer(
+        source="latest_responses", many=True, read_only=True
+    )
+    matches = AdvertisementMatchSerializer(many=True, read_only=True)
 
     publication_date = serializers.DateTimeField(
         format="%Y-%m-%dT%H:%M:%S.%fZ", read_only=True
     )
     location = serializers.SerializerMethodField()
 
-    comments_count = serializers.IntegerField(read_only=True, required=False)
-    average_rating = serializers.FloatField(read_only=True, required=False)
-    rating_count = serializers.IntegerField(read_only=True, required=False)
+    comments_count = serializers.IntegerField(source="responses_count", read_only=True)
+    average_rating = serializers.FloatField(read_only=True)
+    rating_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Advertisement
@@ -788,8 +1126,22 @@ class AdvertisementDetailSerializer(serializers.ModelSerializer):
             "comments_count",
             "average_rating",
             "rating_count",
+            "matches",
         ]
 
+    field_select_related = {
+        "animal": ["animal__species", "animal__breed", "animal__color"],
+        "user": ["user__role"],
+        "status": ["status"],
+        "location": ["user__region"],
+    }
+    field_prefetch_related = {
+        "photos": ["photos"],
+        "responses": [latest_responses_prefetch()],
+        "matches": [matches_prefetch()],
+    }
+    field_columns = {"description": ["description"]}
+
     def get_location(self, obj: Advertisement) -> str:
         """
         Возвращает регион, указанный в профилях авторизованных пользователей.
@@ -929,6 +1281,7 @@ class CurrentUserSerializer(BaseUserSerializer):
     avatar_url = serializers.SerializerMethodField(
         method_name="get_absolute_avatar_url"
     )
+    avatar_renditions = serializers.SerializerMethodField()
     role_name = serializers.CharField(
         source="role.name", read_only=True, allow_null=True
     )
@@ -949,6 +1302,7 @@ class CurrentUserSerializer(BaseUserSerializer):
             "first_name",
             "last_name",
             "avatar_url",
+            "avatar_renditions",
             "role_name",
             "region_name",
             "phone_number",
@@ -1091,6 +1445,104 @@ class AdPhotoManageSerializer(serializers.ModelSerializer):
         fields: tuple[str, ...] = ["id", "image"]
 
 
+class PhotoUploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор сессии загрузки фотографии по частям.
+
+    id - идентификатор сессии,
+    filename - имя файла,
+    size - размер файла в байтах,
+    offset - количество принятых байтов (смещение следующей части),
+    completed - завершена ли загрузка,
+    width, height - размеры изображения после завершения.
+    """
+
+    completed = serializers.BooleanField(source="is_complete", read_only=True)
+
+    class Meta:
+        model = PhotoUploadSession
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "offset",
+            "completed",
+            "width",
+            "height",
+            "created_at",
+        ]
+        read_only_fields = ["id", "offset", "width", "height", "created_at"]
+
+    def validate_filename(self, value: str) -> str:
+        """
+        Оставляет только имя файла и проверяет расширение изображения.
+        """
+        name = value.replace("\\", "/").rsplit("/", 1)[-1]
+        extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+        if extension not in get_available_image_extensions():
+            raise serializers.ValidationError(_("Файл должен быть изображением."))
+        return name
+
+    def validate_size(self, value: int) -> int:
+        """
+        Проверяет, что размер файла не превышает допустимый.
+        """
+        if not 0 < value <= uploads.max_photo_size():
+            raise serializers.ValidationError(
+                _("Размер файла должен быть от 1 до {limit} байт.").format(
+                    limit=uploads.max_photo_size()
+                )
+            )
+        return value
+
+
+class SimilarPhotoSearchSerializer(serializers.Serializer):
+    """
+    Параметры поиска объявлений с похожими фотографиями.
+
+    image - фотография, по которой ищутся похожие (для поиска без объявления),
+    species - вид животного; по умолчанию - вид животного объявления,
+    ad_status - статус искомых объявлений; по умолчанию - противоположный
+    статусу объявления ("Найдено" - "Потеряно"),
+    days - период публикации искомых объявлений в днях,
+    k - наибольшее количество фотографий в ответе.
+    """
+
+    image = serializers.ImageField(required=False)
+    species = serializers.PrimaryKeyRelatedField(
+        queryset=Species.objects.all(), required=False
+    )
+    ad_status = serializers.SlugRelatedField(
+        slug_field="name", queryset=AdStatus.objects.all(), required=False
+    )
+    days = serializers.IntegerField(
+        min_value=1, max_value=365, default=similarity.DEFAULT_WINDOW_DAYS
+    )
+    k = serializers.IntegerField(
+        min_value=1, max_value=similarity.MAX_LIMIT, default=similarity.DEFAULT_LIMIT
+    )
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """
+    Параметры подсказок при вводе.
+
+    q - введённый текст,
+    type - справочник: breed, region или color,
+    species - вид животного (только для пород),
+    limit - наибольшее количество подсказок.
+    """
+
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    type = serializers.ChoiceField(choices=autocomplete.KINDS)
+    species = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=autocomplete.MAX_LIMIT,
+        default=autocomplete.DEFAULT_LIMIT,
+    )
+
+
 class AdvertisementManageSerializer(serializers.ModelSerializer):
     """
     Сериализатор для управления объявлениями.
@@ -1101,11 +1553,19 @@ class AdvertisementManageSerializer(serializers.ModelSerializer):
     status - статус объявления,
     latitude - широта,
     longitude - долгота,
-    animal_data - данные об животном (имя, дата рождения, вид, порода, цвет, пол).
+    animal_data - данные об животном (имя, дата рождения, вид, порода, цвет, пол),
+    photo_uploads - идентификаторы завершённых сессий загрузки фотографий
+    (см. PhotoUploadSessionSerializer); дополняют файлы `photos_upload`.
     """
 
     animal_data = AnimalNestedManageSerializer(write_only=True)
     status = serializers.PrimaryKeyRelatedField(queryset=AdStatus.objects.all())
+    photo_uploads = serializers.PrimaryKeyRelatedField(
+        many=True,
+        write_only=True,
+        required=False,
+        queryset=PhotoUploadSession.objects.filter(completed_at__isnull=False),
+    )
 
     class Meta:
         model = Advertisement
@@ -1117,9 +1577,21 @@ class AdvertisementManageSerializer(serializers.ModelSerializer):
             "latitude",
             "longitude",
             "animal_data",
+            "photo_uploads",
         ]
         read_only_fields = ["id"]
 
+    def validate_photo_uploads(
+        self, value: typing.List[PhotoUploadSession]
+    ) -> typing.List[PhotoUploadSession]:
+        """
+        Проверяет, что сессии загрузки принадлежат текущему пользователю.
+        """
+        user = self.context["request"].user
+        if any(session.user_id != user.pk for session in value):
+            raise serializers.ValidationError(_("Загрузка не найдена."))
+        return list(dict.fromkeys(value))
+
     def validate_status(self, value: AdStatus) -> AdStatus:
         """
         Валидация статуса объявления.
@@ -1166,14 +1638,12 @@ class AdvertisementManageSerializer(serializers.ModelSerializer):
         longitude = data.get("longitude")
 
         if not self.instance and description:
-            active_like_statuses = AdStatus.objects.filter(
-                name__in=["Найдено", "Потеряно", "Требует модерации"]
-            )
-
+            # Описания сравниваются по хэшу нормализованного текста: это
+            # поиск по индексу ad_content_hash_idx, а не сравнение строк.
             queryset = Advertisement.objects.filter(
+                content_hash=fingerprints.content_hash(description),
                 user=user,
-                description__iexact=description,
-                status__in=active_like_statuses,
+                status__name__in=fingerprints.DUPLICATE_CHECK_STATUSES,
             )
 
             if latitude is not None and longitude is not None:
@@ -1190,36 +1660,63 @@ class AdvertisementManageSerializer(serializers.ModelSerializer):
     def create(self, validated_data: dict) -> Advertisement:
         """
         Создает новое объявление.
+
+        Животное, объявление и фотографии сохраняются в одной транзакции;
+        файлы фотографий записываются параллельно (см. siteapp.uploads) и
+        удаляются, если транзакция не завершилась.
         """
-        animal_data = validated_data.pop("animal_data")
-        animal = Animal.objects.create(**animal_data)
+        uploaded_photos = self.context["request"].FILES.getlist("photos_upload")
+        sessions = validated_data.pop("photo_uploads", [])
+        with PhotoUpload(
+            uploaded_photos, sessions=sessions
+        ) as upload, transaction.atomic():
+            animal_data = validated_data.pop("animal_data")
+            animal = Animal.objects.create(**animal_data)
 
-        validated_data["animal"] = animal
-        validated_data["user"] = self.context["request"].user
+            validated_data["animal"] = animal
+            validated_data["user"] = self.context["request"].user
 
-        if "status" not in validated_data or not validated_data.get("status"):
-            try:
+            if "status" not in validated_data or not validated_data.get("status"):
                 default_status_name = "Требует модерации"
-                default_status = AdStatus.objects.get(name=default_status_name)
+                default_status = lookups.get_by_name(AdStatus, default_status_name)
+                if default_status is None:
+                    raise serializers.ValidationError(
+                        {
+                            "status": f"Ошибка конфигурации: статус по умолчанию '{default_status_name}' не найден."
+                        }
+                    )
                 validated_data["status"] = default_status
-            except AdStatus.DoesNotExist:
-                raise serializers.ValidationError(
-                    {
-                        "status": f"Ошибка конфигурации: статус по умолчанию '{default_status_name}' не найден."
-                    }
-                )
-
-        advertisement = Advertisement.objects.create(**validated_data)
 
-        uploaded_photos = self.context["request"].FILES.getlist("photos_upload")
-        for photo_file in uploaded_photos:
-            AdPhoto.objects.create(advertisement=advertisement, image=photo_file)
+            advertisement = Advertisement.objects.create(**validated_data)
+            upload.create_photos(advertisement)
 
         return advertisement
 
     def update(self, instance: Advertisement, validated_data: dict) -> Advertisement:
         """
         Обновляет существующее объявление.
+
+        Как и create, сохраняет всё в одной транзакции вместе с удалением и
+        добавлением фотографий.
+        """
+        uploaded_photos = self.context["request"].FILES.getlist("photos_upload")
+        sessions = validated_data.pop("photo_uploads", [])
+        with PhotoUpload(
+            uploaded_photos, sessions=sessions
+        ) as upload, transaction.atomic():
+            instance = self._update(instance, validated_data)
+            delete_photo_ids_str = self.context["request"].POST.getlist("delete_photos")
+            if delete_photo_ids_str:
+                AdPhoto.objects.filter(
+                    advertisement=instance, id__in=map(int, delete_photo_ids_str)
+                ).delete()
+            upload.create_photos(instance)
+
+        return instance
+
+    def _update(self, instance: Advertisement, validated_data: dict) -> Advertisement:
+        """
+        Обновляет животное и поля объявления.
         """
         animal_instance = instance.animal
 
@@ -1260,18 +1757,7 @@ class AdvertisementManageSerializer(serializers.ModelSerializer):
                 except serializers.ValidationError:
                     validated_data.pop("status")
 
-        instance = super().update(instance, validated_data)
-
-        uploaded_photos = self.context["request"].FILES.getlist("photos_upload")
-        delete_photo_ids_str = self.context["request"].POST.getlist("delete_photos")
-        if delete_photo_ids_str:
-            AdPhoto.objects.filter(
-                advertisement=instance, id__in=map(int, delete_photo_ids_str)
-            ).delete()
-        for photo_file in uploaded_photos:
-            AdPhoto.objects.create(advertisement=instance, image=photo_file)
-
-        return instance
+        return super().update(instance, validated_data)
 
 
 class BreedSerializer(serializers.ModelSerializer):
@@ -1366,6 +1852,7 @@ class ProfileSerializer(serializers.ModelSerializer):
     first_name - имя,
     last_name - фамилия,
     avatar_url - URL-адрес аватара,
+    avatar_renditions - уменьшенные версии аватара,
     role_name - название роли,
     region_name - название региона,
     phone_number - телефон,
@@ -1413,6 +1900,11 @@ class ProfileSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.avatar.url)
         return None
 
+    def get_avatar_renditions(self, obj: User) -> typing.Optional[dict]:
+        return renditions_data(
+            obj.avatar_renditions, obj.avatar.storage, self.context.get("request")
+        )
+
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
     """
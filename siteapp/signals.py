@@ -0,0 +1,663 @@
+# siteapp/signals.py
+"""
+Обработчики сигналов моделей siteapp.
+
+Поддерживают денормализованные счётчики объявления (responses_count,
+rating_count, rating_sum, average_rating). Изменения применяются атомарными
+UPDATE с F-выражениями в той же транзакции, что и сохранение/удаление
+отклика или оценки.
+
+Поддерживают счётчики объявлений по регионам и статусам (см.
+siteapp.region_activity) при создании, удалении, смене статуса или автора
+объявления и смене региона пользователя.
+
+Поддерживают обложку объявления (cover_photo): первая добавленная
+фотография становится обложкой, а при удалении обложки её место занимает
+самая ранняя из оставшихся.
+
+Отмечают время изменения (updated_at) объявления при изменении его
+фотографий, откликов, оценок и животного, а статьи - при изменении её
+комментариев и категорий; объявления и статьи пользователя - при изменении
+выводимых в них данных пользователя (USER_PAYLOAD_FIELDS); объявления, в
+парах которых выводится объявление, - при изменении выводимых там полей
+(MATCH_PAYLOAD_FIELDS), обложки или удалении этого объявления. По нему
+детальные ответы API отвечают на условные запросы.
+
+После сохранения фотографии объявления, аватара или главного изображения
+статьи ставят в очередь построение их уменьшенных версий (см.
+siteapp.images), если исходный файл сменился.
+
+Также инкрементально обновляют полнотекстовый индекс объявлений
+(см. siteapp.search), ставят в очередь пересчёт пар "Потеряно" - "Найдено"
+изменённого объявления (см. siteapp.matching) и пересборку снимка главной
+страницы (см. siteapp.homepage), инвалидируют кэш ответов API объявлений
+(см. siteapp.caching) и справочники в памяти процессов (см.
+siteapp.lookups).
+"""
+
+import typing
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, images, lookups, region_activity, search, tasks
+from .models import (
+    AdPhoto,
+    AdResponse,
+    AdStatus,
+    Advertisement,
+    AdvertisementMatch,
+    AdvertisementRating,
+    Animal,
+    AnimalColor,
+    Article,
+    ArticleCategory,
+    Breed,
+    Comment,
+    Region,
+    Role,
+    Species,
+    User,
+)
+
+SEARCH_ADVERTISEMENT_FIELDS = {"title", "description", "animal"}
+SEARCH_ANIMAL_FIELDS = {"name"}
+MATCH_ADVERTISEMENT_FIELDS = {"status", "animal", "latitude", "longitude"}
+MATCH_ANIMAL_FIELDS = {"species", "breed", "color", "gender"}
+# Поля объявления, которые выводятся в парах других объявлений.
+MATCH_PAYLOAD_FIELDS = {"title", "status", "publication_date", "cover_photo"}
+# Поля пользователя, которые выводятся в ответах объявлений и статей.
+USER_PAYLOAD_FIELDS = (
+    "display_name",
+    "email",
+    "phone_number",
+    "role",
+    "region",
+    "avatar",
+    "avatar_renditions",
+)
+# Поля, которые не выводятся на главной странице.
+HOME_PAGE_IGNORED_FIELDS = {"last_login", "updated_at", "content_hash", "simhash"}
+
+
+def apply_response_delta(advertisement_id: int, delta: int) -> None:
+    """
+    Изменяет счётчик откликов объявления на delta.
+
+    :param advertisement_id: идентификатор объявления
+    :param delta: изменение количества откликов
+    """
+    Advertisement.objects.filter(pk=advertisement_id).update(
+        responses_count=F("responses_count") + delta, updated_at=timezone.now()
+    )
+    caching.invalidate_advertisements([advertisement_id])
+
+
+def apply_rating_delta(advertisement_id: int, count_delta: int, sum_delta: int) -> None:
+    """
+    Изменяет количество и сумму оценок объявления и пересчитывает среднюю оценку.
+
+    Средняя оценка вычисляется из новых значений в том же UPDATE, поэтому не
+    зависит от порядка присваивания столбцов в конкретной СУБД.
+
+    :param advertisement_id: идентификатор объявления
+    :param count_delta: изменение количества оценок
+    :param sum_delta: изменение суммы оценок
+    """
+    new_count = F("rating_count") + count_delta
+    new_sum = F("rating_sum") + sum_delta
+    Advertisement.objects.filter(pk=advertisement_id).update(
+        rating_count=new_count,
+        rating_sum=new_sum,
+        average_rating=Case(
+            When(
+                GreaterThan(F("rating_count") + count_delta, 0),
+                then=Cast(F("rating_sum") + sum_delta, FloatField())
+                / (F("rating_count") + count_delta),
+            ),
+            default=None,
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    caching.invalidate_advertisements([advertisement_id])
+
+
+def touch_advertisements(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Отмечает указанные объявления изменёнными.
+    """
+    Advertisement.objects.filter(pk__in=list(advertisement_ids)).update(
+        updated_at=timezone.now()
+    )
+
+
+def touch_articles(article_ids: typing.Iterable[int]) -> None:
+    """
+    Отмечает указанные статьи изменёнными.
+    """
+    Article.objects.filter(pk__in=list(article_ids)).update(updated_at=timezone.now())
+
+
+def touch_user_content(user_id: int) -> None:
+    """
+    Отмечает изменёнными объявления и статьи, в ответах которых выводятся
+    данные пользователя (автор объявления или отклика, автор статьи или
+    комментария к ней), и инвалидирует кэш ответов только для статусов этих
+    объявлений.
+    """
+    advertisement_ids = set(
+        Advertisement.objects.filter(user_id=user_id).values_list("pk", flat=True)
+    ) | set(
+        AdResponse.objects.filter(user_id=user_id).values_list(
+            "advertisement_id", flat=True
+        )
+    )
+    touch_advertisements(advertisement_ids)
+    caching.invalidate_advertisements(advertisement_ids)
+    touch_articles(
+        Article.objects.filter(
+            Q(author_id=user_id) | Q(comments__user_id=user_id)
+        ).values_list("pk", flat=True)
+    )
+
+
+def _previous_values(
+    sender: typing.Type, instance: typing.Any, *fields: str
+) -> typing.Optional[tuple]:
+    """
+    Возвращает сохранённые в БД значения полей изменяемого объекта.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(pre_save, sender=AdResponse)
+def remember_response_state(
+    sender: typing.Type[AdResponse], instance: AdResponse, **kwargs
+) -> None:
+    previous = _previous_values(sender, instance, "advertisement_id")
+    instance._previous_advertisement_id = previous[0] if previous else None
+
+
+@receiver(post_save, sender=AdResponse)
+def update_counters_on_response_save(
+    sender: typing.Type[AdResponse], instance: AdResponse, created: bool, **kwargs
+) -> None:
+    previous_ad_id = getattr(instance, "_previous_advertisement_id", None)
+    if created or previous_ad_id is None:
+        apply_response_delta(instance.advertisement_id, 1)
+    elif previous_ad_id != instance.advertisement_id:
+        apply_response_delta(previous_ad_id, -1)
+        apply_response_delta(instance.advertisement_id, 1)
+
+
+@receiver(post_delete, sender=AdResponse)
+def update_counters_on_response_delete(
+    sender: typing.Type[AdResponse], instance: AdResponse, **kwargs
+) -> None:
+    apply_response_delta(instance.advertisement_id, -1)
+
+
+@receiver(pre_save, sender=AdvertisementRating)
+def remember_rating_state(
+    sender: typing.Type[AdvertisementRating],
+    instance: AdvertisementRating,
+    **kwargs,
+) -> None:
+    instance._previous_rating_state = _previous_values(
+        sender, instance, "advertisement_id", "rating"
+    )
+
+
+@receiver(post_save, sender=AdvertisementRating)
+def update_counters_on_rating_save(
+    sender: typing.Type[AdvertisementRating],
+    instance: AdvertisementRating,
+    created: bool,
+    **kwargs,
+) -> None:
+    previous = getattr(instance, "_previous_rating_state", None)
+    if created or previous is None:
+        apply_rating_delta(instance.advertisement_id, 1, instance.rating)
+        return
+
+    previous_ad_id, previous_rating = previous
+    if previous_ad_id != instance.advertisement_id:
+        apply_rating_delta(previous_ad_id, -1, -previous_rating)
+        apply_rating_delta(instance.advertisement_id, 1, instance.rating)
+    elif previous_rating != instance.rating:
+        apply_rating_delta(
+            instance.advertisement_id, 0, instance.rating - previous_rating
+        )
+
+
+@receiver(post_delete, sender=AdvertisementRating)
+def update_counters_on_rating_delete(
+    sender: typing.Type[AdvertisementRating],
+    instance: AdvertisementRating,
+    **kwargs,
+) -> None:
+    apply_rating_delta(instance.advertisement_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=Advertisement)
+def update_search_index_on_ad_save(
+    sender: typing.Type[Advertisement],
+    instance: Advertisement,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if update_fields is not None and not (
+        SEARCH_ADVERTISEMENT_FIELDS & set(update_fields)
+    ):
+        return
+    search.index_advertisements([instance.pk])
+
+
+@receiver(post_delete, sender=Advertisement)
+def update_search_index_on_ad_delete(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    search.remove_advertisements([instance.pk])
+
+
+@receiver(post_save, sender=Animal)
+def update_search_index_on_animal_save(
+    sender: typing.Type[Animal],
+    instance: Animal,
+    created: bool,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if created or (
+        update_fields is not None and not (SEARCH_ANIMAL_FIELDS & set(update_fields))
+    ):
+        return
+    search.index_advertisements(
+        Advertisement.objects.filter(animal=instance).values_list("pk", flat=True)
+    )
+
+
+def schedule_matches(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Ставит пересчёт пар объявлений в очередь после фиксации транзакции.
+    """
+    for advertisement_id in advertisement_ids:
+        transaction.on_commit(
+            partial(tasks.enqueue_advertisement_matches, advertisement_id)
+        )
+
+
+@receiver(post_save, sender=Advertisement)
+def schedule_matches_on_ad_save(
+    sender: typing.Type[Advertisement],
+    instance: Advertisement,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if update_fields is not None and not (
+        MATCH_ADVERTISEMENT_FIELDS & set(update_fields)
+    ):
+        return
+    schedule_matches([instance.pk])
+
+
+@receiver(post_save, sender=Animal)
+def schedule_matches_on_animal_save(
+    sender: typing.Type[Animal],
+    instance: Animal,
+    created: bool,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if created or (
+        update_fields is not None and not (MATCH_ANIMAL_FIELDS & set(update_fields))
+    ):
+        return
+    schedule_matches(
+        Advertisement.objects.filter(animal=instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(pre_save, sender=Advertisement)
+def remember_advertisement_status(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    previous = _previous_values(sender, instance, "status_id", "user_id")
+    instance._previous_status_id = previous[0] if previous else None
+    instance._previous_user_id = previous[1] if previous else None
+
+
+@receiver(post_save, sender=Advertisement)
+def invalidate_cache_on_ad_save(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    caching.invalidate_statuses(
+        {instance.status_id, getattr(instance, "_previous_status_id", None)} - {None}
+    )
+
+
+@receiver(post_delete, sender=Advertisement)
+def invalidate_cache_on_ad_delete(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    caching.invalidate_statuses([instance.status_id])
+
+
+def match_owner_ids(advertisement_ids: typing.Iterable[int]) -> typing.List[int]:
+    """
+    Возвращает объявления, в парах которых выводятся указанные объявления.
+    """
+    return list(
+        AdvertisementMatch.objects.filter(matched_id__in=list(advertisement_ids))
+        .values_list("advertisement_id", flat=True)
+        .distinct()
+    )
+
+
+def _touch_and_invalidate(advertisement_ids: typing.List[int]) -> None:
+    touch_advertisements(advertisement_ids)
+    caching.invalidate_advertisements(advertisement_ids)
+
+
+def touch_match_owners(advertisement_ids: typing.Iterable[int]) -> None:
+    """
+    Отмечает изменёнными объявления, в парах которых выводятся указанные
+    объявления, и инвалидирует их кэш.
+    """
+    owner_ids = match_owner_ids(advertisement_ids)
+    if owner_ids:
+        _touch_and_invalidate(owner_ids)
+
+
+@receiver(post_save, sender=Advertisement)
+def touch_match_owners_on_ad_save(
+    sender: typing.Type[Advertisement],
+    instance: Advertisement,
+    created: bool,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if created or (
+        update_fields is not None and not (MATCH_PAYLOAD_FIELDS & set(update_fields))
+    ):
+        return
+    transaction.on_commit(partial(touch_match_owners, [instance.pk]))
+
+
+@receiver(pre_delete, sender=Advertisement)
+def remember_match_owners(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    # Пары удаляются каскадно, поэтому владельцев запоминаем до удаления.
+    instance._match_owner_ids = match_owner_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Advertisement)
+def touch_match_owners_on_ad_delete(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    owner_ids = getattr(instance, "_match_owner_ids", [])
+    if owner_ids:
+        transaction.on_commit(partial(_touch_and_invalidate, owner_ids))
+
+
+@receiver(post_save, sender=Advertisement)
+def update_region_activity_on_ad_save(
+    sender: typing.Type[Advertisement],
+    instance: Advertisement,
+    created: bool,
+    **kwargs,
+) -> None:
+    region_id = region_activity.region_of(instance.user_id)
+    if created:
+        region_activity.apply({(region_id, instance.status_id): 1})
+        return
+    previous_user_id = getattr(instance, "_previous_user_id", instance.user_id)
+    previous_status_id = getattr(instance, "_previous_status_id", instance.status_id)
+    if (previous_user_id, previous_status_id) == (instance.user_id, instance.status_id):
+        return
+    previous_region_id = (
+        region_id
+        if previous_user_id == instance.user_id
+        else region_activity.region_of(previous_user_id)
+    )
+    region_activity.apply(
+        region_activity.move(
+            (previous_region_id, previous_status_id), (region_id, instance.status_id)
+        )
+    )
+
+
+@receiver(post_delete, sender=Advertisement)
+def update_region_activity_on_ad_delete(
+    sender: typing.Type[Advertisement], instance: Advertisement, **kwargs
+) -> None:
+    region_activity.apply(
+        {(region_activity.region_of(instance.user_id), instance.status_id): -1}
+    )
+
+
+def _user_payload_attnames() -> typing.List[str]:
+    return [User._meta.get_field(name).attname for name in USER_PAYLOAD_FIELDS]
+
+
+def _user_payload(values: typing.Sequence) -> tuple:
+    """
+    Приводит значения выводимых полей к сравнимому виду: пустой аватар
+    хранится и как NULL, и как "".
+    """
+    values = list(values)
+    index = USER_PAYLOAD_FIELDS.index("avatar")
+    values[index] = getattr(values[index], "name", values[index]) or ""
+    return tuple(values)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_state(
+    sender: typing.Type[User],
+    instance: User,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    if update_fields is not None:
+        names = {sender._meta.get_field(name).name for name in update_fields}
+        if not names & set(USER_PAYLOAD_FIELDS):
+            instance._previous_region_id = instance.region_id
+            instance._previous_payload = None
+            return
+    previous = _previous_values(sender, instance, *_user_payload_attnames())
+    instance._previous_payload = _user_payload(previous) if previous else None
+    instance._previous_region_id = (
+        previous[USER_PAYLOAD_FIELDS.index("region")]
+        if previous
+        else instance.region_id
+    )
+
+
+@receiver(post_save, sender=User)
+def update_region_activity_on_user_save(
+    sender: typing.Type[User], instance: User, **kwargs
+) -> None:
+    region_activity.apply_user_region_change(
+        instance.pk,
+        getattr(instance, "_previous_region_id", instance.region_id),
+        instance.region_id,
+    )
+
+
+@receiver(post_save, sender=AdPhoto)
+def set_cover_photo_on_photo_create(
+    sender: typing.Type[AdPhoto], instance: AdPhoto, created: bool, **kwargs
+) -> None:
+    if created:
+        Advertisement.objects.filter(
+            pk=instance.advertisement_id, cover_photo__isnull=True
+        ).update(cover_photo=instance)
+
+
+@receiver(post_delete, sender=AdPhoto)
+def replace_cover_photo_on_photo_delete(
+    sender: typing.Type[AdPhoto], instance: AdPhoto, **kwargs
+) -> None:
+    # Удалённая обложка уже обнулена (on_delete=SET_NULL).
+    earliest_photo = (
+        AdPhoto.objects.filter(advertisement=OuterRef("pk"))
+        .order_by("pk")
+        .values("pk")[:1]
+    )
+    Advertisement.objects.filter(
+        pk=instance.advertisement_id, cover_photo__isnull=True
+    ).update(cover_photo=Subquery(earliest_photo))
+
+
+@receiver(post_save, sender=AdPhoto)
+@receiver(post_delete, sender=AdPhoto)
+def touch_advertisement_on_photo_change(
+    sender: typing.Type[AdPhoto], instance: AdPhoto, **kwargs
+) -> None:
+    touch_advertisements([instance.advertisement_id])
+
+
+@receiver(post_save, sender=AdPhoto)
+@receiver(post_delete, sender=AdPhoto)
+def invalidate_cache_on_photo_change(
+    sender: typing.Type[AdPhoto], instance: AdPhoto, **kwargs
+) -> None:
+    caching.invalidate_advertisements([instance.advertisement_id])
+
+
+@receiver(post_save, sender=AdPhoto)
+@receiver(post_delete, sender=AdPhoto)
+def touch_match_owners_on_photo_change(
+    sender: typing.Type[AdPhoto], instance: AdPhoto, **kwargs
+) -> None:
+    # Обложка объявления выводится в парах других объявлений.
+    transaction.on_commit(partial(touch_match_owners, [instance.advertisement_id]))
+
+
+@receiver(post_save, sender=Animal)
+def invalidate_cache_on_animal_save(
+    sender: typing.Type[Animal], instance: Animal, created: bool, **kwargs
+) -> None:
+    if not created:
+        advertisement_ids = list(
+            Advertisement.objects.filter(animal=instance).values_list("pk", flat=True)
+        )
+        touch_advertisements(advertisement_ids)
+        caching.invalidate_advertisements(advertisement_ids)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_article_on_comment_change(
+    sender: typing.Type[Comment], instance: Comment, **kwargs
+) -> None:
+    touch_articles([instance.article_id])
+
+
+@receiver(m2m_changed, sender=Article.categories.through)
+def touch_article_on_categories_change(
+    sender: typing.Type,
+    instance: typing.Union[Article, ArticleCategory],
+    action: str,
+    reverse: bool,
+    pk_set: typing.Optional[set],
+    **kwargs,
+) -> None:
+    if reverse and action == "pre_clear":
+        # После очистки связей статьи категории уже не найти.
+        touch_articles(instance.articles.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        touch_articles([instance.pk] if not reverse else pk_set or [])
+
+
+@receiver(post_save, sender=ArticleCategory)
+@receiver(pre_delete, sender=ArticleCategory)
+def touch_articles_on_category_change(
+    sender: typing.Type[ArticleCategory], instance: ArticleCategory, **kwargs
+) -> None:
+    if not kwargs.get("created"):
+        touch_articles(instance.articles.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=AdPhoto)
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=User)
+def schedule_image_renditions(
+    sender: typing.Type,
+    instance: typing.Union[AdPhoto, Article, User],
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    image_field, _ = images.image_fields(instance)
+    if update_fields is not None and image_field not in update_fields:
+        return
+    if images.needs_renditions(instance):
+        transaction.on_commit(
+            partial(tasks.enqueue_image_renditions, sender._meta.label, instance.pk)
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidate_cache_on_user_save(
+    sender: typing.Type[User], instance: User, created: bool, **kwargs
+) -> None:
+    # Новый пользователь ещё не связан с объявлениями; смена пароля, входы и
+    # права доступа в ответах не выводятся.
+    previous = getattr(instance, "_previous_payload", None)
+    current = _user_payload(
+        [getattr(instance, attname) for attname in _user_payload_attnames()]
+    )
+    if created or previous is None or previous == current:
+        return
+    touch_user_content(instance.pk)
+
+
+def invalidate_cache_on_lookup_change(sender: typing.Type, **kwargs) -> None:
+    """
+    Справочные значения выводятся во всех объявлениях, поэтому их изменение
+    инвалидирует весь кэш ответов, а также справочники в памяти процессов.
+    """
+    caching.invalidate_all()
+    lookups.invalidate()
+    schedule_home_page_snapshot(sender)
+
+
+for lookup_model in (AdStatus, AnimalColor, Breed, Region, Role, Species):
+    post_save.connect(invalidate_cache_on_lookup_change, sender=lookup_model)
+    post_delete.connect(invalidate_cache_on_lookup_change, sender=lookup_model)
+
+
+def schedule_home_page_snapshot(
+    sender: typing.Type,
+    update_fields: typing.Optional[frozenset] = None,
+    **kwargs,
+) -> None:
+    """
+    Ставит пересборку снимка главной страницы в очередь после фиксации
+    транзакции (см. siteapp.homepage).
+    """
+    if update_fields is not None and set(update_fields) <= HOME_PAGE_IGNORED_FIELDS:
+        return
+    transaction.on_commit(tasks.enqueue_home_page_snapshot)
+
+
+for home_page_model in (AdPhoto, Advertisement, Animal, Article, User):
+    post_save.connect(schedule_home_page_snapshot, sender=home_page_model)
+    post_delete.connect(schedule_home_page_snapshot, sender=home_page_model)
+m2m_changed.connect(schedule_home_page_snapshot, sender=Article.categories.through)
@@ -0,0 +1,256 @@
+# siteapp/similarity.py
+"""
+Поиск визуально похожих фотографий животных.
+
+Для каждой фотографии объявления вычисляется 64-битный перцептивный хэш
+(pHash): изображение уменьшается до 32x32 в оттенках серого, из его
+дискретного косинусного преобразования берутся низкие частоты 8x8, и каждый
+бит показывает, больше ли коэффициент медианы. У одной и той же фотографии
+после пересжатия, масштабирования или небольшой обрезки хэши отличаются в
+немногих битах (расстояние Хэмминга).
+
+Индекс - таблица с несколькими хэшами (multi-index hashing): хэш делится на
+PHASH_BANDS полос по 16 бит, которые хранятся в индексированной таблице
+AdPhotoHashBand. Если расстояние между хэшами не больше
+SIMILAR_PHOTO_DISTANCE, то хотя бы в одной полосе оно не больше
+BAND_SEARCH_RADIUS, поэтому кандидаты выбираются поиском по индексу значений
+полос в этом радиусе (17 значений на полосу), а точное расстояние
+проверяется только для них.
+
+Каждое значение полосы выбирает в среднем 1/65536 всех фотографий, то есть
+искомый хэш - около 4 * 17 / 65536 (0,1 %) индекса. Чтобы число кандидатов
+не росло вместе с индексом, из каждой полосы берутся не более
+MAX_BAND_CANDIDATES самых новых фотографий на искомый хэш (ROW_NUMBER в том
+же запросе), поэтому проверка расстояния в Python ограничена
+MAX_QUERY_PHOTOS * PHASH_BANDS * MAX_BAND_CANDIDATES строками при любом
+размере индекса. Пока в индексе меньше примерно 65536 * MAX_BAND_CANDIDATES
+/ 17 (около 770 тысяч) фотографий, ограничение не срабатывает и поиск
+находит все фотографии в пределах SIMILAR_PHOTO_DISTANCE; в более крупном
+индексе в переполненных полосах остаются только самые новые фотографии.
+
+Хэш вычисляется задачей построения версий изображения (см.
+siteapp.images.process), индекс для уже загруженных фотографий строится
+командой `build_photo_hash_index`.
+"""
+
+import math
+import typing
+from datetime import timedelta
+from functools import lru_cache
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .fingerprints import hamming_distance, to_signed, to_unsigned
+
+PHASH_IMAGE_SIZE = 32
+PHASH_DCT_SIZE = 8
+PHASH_BAND_WIDTH = 16
+PHASH_BANDS = 64 // PHASH_BAND_WIDTH
+BAND_SEARCH_RADIUS = 1
+# Наибольшее расстояние, которое индекс находит гарантированно.
+SIMILAR_PHOTO_DISTANCE = PHASH_BANDS * (BAND_SEARCH_RADIUS + 1) - 1
+# Сколько фотографий берётся из одной полосы одного искомого хэша.
+MAX_BAND_CANDIDATES = 200
+DEFAULT_WINDOW_DAYS = 90
+# Объявления с каким статусом ищутся для объявления с данным статусом: к
+# найденному животному подбираются потерянные и наоборот.
+COUNTERPART_STATUSES: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "Найдено": ("Потеряно",),
+    "Потеряно": ("Найдено",),
+}
+SEARCH_STATUSES = ("Найдено", "Потеряно")
+# Сколько фотографий объявления участвуют в поиске.
+MAX_QUERY_PHOTOS = 10
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+@lru_cache(maxsize=1)
+def _dct_table() -> typing.List[typing.List[float]]:
+    n = PHASH_IMAGE_SIZE
+    return [
+        [math.cos(math.pi * (2 * x + 1) * u / (2 * n)) for x in range(n)]
+        for u in range(PHASH_DCT_SIZE)
+    ]
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    Вычисляет pHash изображения.
+
+    :param image: изображение Pillow
+    :return: 64-битный хэш со знаком, как хранится в BigIntegerField
+    """
+    gray = ImageOps.exif_transpose(image).convert("L")
+    gray = gray.resize((PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    rows = [
+        pixels[row * PHASH_IMAGE_SIZE : (row + 1) * PHASH_IMAGE_SIZE]
+        for row in range(PHASH_IMAGE_SIZE)
+    ]
+    table = _dct_table()
+    # Двумерное DCT раскладывается на преобразования строк и столбцов;
+    # вычисляются только нужные низкие частоты.
+    row_coefficients = [
+        [sum(c * p for c, p in zip(cosines, row)) for cosines in table] for row in rows
+    ]
+    coefficients = [
+        sum(cosines[y] * row_coefficients[y][u] for y in range(PHASH_IMAGE_SIZE))
+        for cosines in table
+        for u in range(PHASH_DCT_SIZE)
+    ]
+    # Постоянная составляющая (яркость) не участвует в медиане.
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    unsigned = sum(1 << bit for bit, value in enumerate(coefficients) if value > median)
+    return to_signed(unsigned)
+
+
+def file_hash(image_file) -> int:
+    """
+    Вычисляет pHash файла изображения.
+
+    :raises OSError, ValueError: если файл недоступен или не является
+        изображением
+    """
+    with image_file.open("rb") as source:
+        with Image.open(source) as image:
+            return perceptual_hash(image)
+
+
+def bands(value: int) -> typing.List[int]:
+    """
+    Делит хэш на полосы по PHASH_BAND_WIDTH бит.
+    """
+    unsigned = to_unsigned(value)
+    mask = (1 << PHASH_BAND_WIDTH) - 1
+    return [unsigned >> (band * PHASH_BAND_WIDTH) & mask for band in range(PHASH_BANDS)]
+
+
+def _neighbours(value: int) -> typing.List[int]:
+    """
+    Возвращает значения полосы на расстоянии не больше BAND_SEARCH_RADIUS.
+    """
+    result = [value]
+    for radius in range(1, BAND_SEARCH_RADIUS + 1):
+        for positions in combinations(range(PHASH_BAND_WIDTH), radius):
+            flipped = value
+            for position in positions:
+                flipped ^= 1 << position
+            result.append(flipped)
+    return result
+
+
+def bands_q(value: int) -> Q:
+    """
+    Условие для AdPhotoHashBand: хотя бы одна полоса в радиусе поиска.
+    """
+    condition = Q()
+    for band, band_value in enumerate(bands(value)):
+        condition |= Q(band=band, value__in=_neighbours(band_value))
+    return condition
+
+
+def candidate_photo_ids(hashes: typing.Sequence[int]) -> QuerySet:
+    """
+    Подзапрос id фотографий, у которых хотя бы одна полоса в радиусе поиска
+    от полосы одного из хэшей: в каждой полосе не более
+    MAX_BAND_CANDIDATES самых новых фотографий на хэш.
+    """
+    from .models import AdPhotoHashBand
+
+    condition = Q()
+    for value in hashes:
+        condition |= bands_q(value)
+    return (
+        AdPhotoHashBand.objects.filter(condition)
+        .annotate(
+            rank=Window(
+                RowNumber(), partition_by=[F("band")], order_by=F("photo_id").desc()
+            )
+        )
+        .filter(rank__lte=MAX_BAND_CANDIDATES * len(hashes))
+        .values("photo_id")
+    )
+
+
+def index_photo(photo_id: int, value: typing.Optional[int]) -> None:
+    """
+    Перезаписывает полосы хэша фотографии в индексе.
+    """
+    index_photos({photo_id: value})
+
+
+def index_photos(values: typing.Dict[int, typing.Optional[int]]) -> None:
+    """
+    Перезаписывает полосы хэшей нескольких фотографий одним DELETE и одним
+    INSERT.
+
+    :param values: id фотографии -> pHash или None, если хэша нет
+    """
+    from .models import AdPhotoHashBand
+
+    with transaction.atomic():
+        AdPhotoHashBand.objects.filter(photo_id__in=list(values)).delete()
+        AdPhotoHashBand.objects.bulk_create(
+            AdPhotoHashBand(photo_id=photo_id, band=band, value=band_value)
+            for photo_id, value in values.items()
+            if value is not None
+            for band, band_value in enumerate(bands(value))
+        )
+
+
+def similar_photos(
+    hashes: typing.Iterable[int],
+    species_id: typing.Optional[int] = None,
+    status_names: typing.Optional[typing.Iterable[str]] = None,
+    days: int = DEFAULT_WINDOW_DAYS,
+    limit: int = DEFAULT_LIMIT,
+    exclude_advertisement_id: typing.Optional[int] = None,
+    max_distance: int = SIMILAR_PHOTO_DISTANCE,
+) -> typing.List[typing.Tuple[int, int, int]]:
+    """
+    Находит фотографии, похожие хотя бы на один из хэшей.
+
+    :param hashes: pHash искомых фотографий
+    :param species_id: вид животного в объявлении
+    :param status_names: статусы объявлений
+    :param days: объявления, опубликованные за последние days дней
+    :param limit: наибольшее количество фотографий
+    :param exclude_advertisement_id: объявление, фотографии которого не ищутся
+    :param max_distance: наибольшее расстояние Хэмминга
+    :return: тройки (id фотографии, id объявления, расстояние) от самых
+        похожих
+    """
+    from .models import AdPhoto
+
+    hashes = list(dict.fromkeys(hashes))
+    if not hashes:
+        return []
+    candidates = AdPhoto.objects.filter(
+        pk__in=candidate_photo_ids(hashes),
+        advertisement__publication_date__gte=timezone.now() - timedelta(days=days),
+    )
+    if species_id is not None:
+        candidates = candidates.filter(advertisement__animal__species_id=species_id)
+    if status_names is not None:
+        candidates = candidates.filter(advertisement__status__name__in=status_names)
+    if exclude_advertisement_id is not None:
+        candidates = candidates.exclude(advertisement_id=exclude_advertisement_id)
+
+    matches = []
+    for pk, advertisement_id, value in candidates.values_list(
+        "pk", "advertisement_id", "phash"
+    ):
+        distance = min(hamming_distance(value, wanted) for wanted in hashes)
+        if distance <= max_distance:
+            matches.append((distance, pk, advertisement_id))
+    matches.sort()
+    return [
+        (pk, advertisement_id, distance)
+        for distance, pk, advertisement_id in matches[:limit]
+    ]
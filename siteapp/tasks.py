@@ -1,12 +1,21 @@
+import logging
+
 from celery import shared_task
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.mail import send_mail
+from django.db import transaction
 from django.conf import settings
 from django.template.loader import render_to_string
+from kombu.exceptions import OperationalError
 
-from .models import Advertisement, AdStatus, User
+from . import images, lookups, region_activity
+from .caching import invalidate_statuses
+from .models import AdPhoto, Advertisement, AdStatus, User
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task
 def archive_old_advertisements() -> str:
@@ -17,20 +26,29 @@ def archive_old_advertisements() -> str:
     Завершенные статусы: "Найдено владельцем", "Передано владельцу".
     """
     try:
-        archive_status, _ = AdStatus.objects.get_or_create(name="В архиве")
-        completed_statuses = AdStatus.objects.filter(
-            name__in=["Найдено", "Передано владельцу"]
+        archive_status = lookups.get_by_name(AdStatus, "В архиве")
+        if archive_status is None:
+            archive_status, _ = AdStatus.objects.get_or_create(name="В архиве")
+        completed_status_ids = lookups.ids_for(
+            AdStatus, ["Найдено", "Передано владельцу"]
         )
 
         thirty_days_ago = timezone.now() - timedelta(days=30)
 
         ads_to_archive = Advertisement.objects.filter(
-            status__in=completed_statuses, publication_date__lt=thirty_days_ago
+            status_id__in=completed_status_ids, publication_date__lt=thirty_days_ago
         )
 
         count = ads_to_archive.count()
         if count > 0:
-            ads_to_archive.update(status=archive_status)
+            with transaction.atomic():
+                region_activity.apply_bulk_status_change(
+                    ads_to_archive, archive_status.pk
+                )
+                # update() не вызывает сигналы, поэтому updated_at для
+                # условных запросов и кэш обновляются явно.
+                ads_to_archive.update(status=archive_status, updated_at=timezone.now())
+            invalidate_statuses([archive_status.pk, *completed_status_ids])
             result = f"Successfully archived {count} old advertisements."
         else:
             result = "No old advertisements to archive."
@@ -89,3 +107,117 @@ def send_weekly_digest() -> str:
         error_msg = f"Failed to send weekly digest: {e}"
         print(error_msg)
         return error_msg
+
+
+@shared_task(ignore_result=True)
+def generate_image_renditions(model_label: str, pk: int) -> str:
+    """
+    Строит уменьшенные версии изображения объекта (см. siteapp.images).
+
+    Для фотографий объявлений вместе с версиями обновляется перцептивный
+    хэш, поэтому после обработки пересчитываются пары объявления.
+
+    :param model_label: метка модели, например "siteapp.AdPhoto"
+    :param pk: первичный ключ объекта
+    :return: результат обработки
+    """
+    result = images.process(model_label, pk)
+    if model_label == "siteapp.AdPhoto" and result in (images.UPDATED, images.CLEARED):
+        from .matching import update_matches
+
+        advertisement_id = (
+            AdPhoto.objects.filter(pk=pk)
+            .values_list("advertisement_id", flat=True)
+            .first()
+        )
+        if advertisement_id is not None:
+            update_matches(advertisement_id)
+    return result
+
+
+def enqueue_image_renditions(model_label: str, pk: int) -> None:
+    """
+    Ставит построение версий изображения в очередь.
+
+    Недоступность брокера не должна ломать сохранение объекта: версии
+    тогда построит команда `generate_image_renditions`.
+    """
+    try:
+        generate_image_renditions.delay(model_label, pk)
+    except OperationalError as e:
+        logger.warning(
+            "Could not enqueue image renditions for %s %s: %s", model_label, pk, e
+        )
+
+
+@shared_task(ignore_result=True)
+def update_advertisement_matches(advertisement_id: int) -> str:
+    """
+    Пересчитывает пары "Потеряно" - "Найдено" объявления (см.
+    siteapp.matching) и записывает статистику прогона в журнал.
+    """
+    from .matching import update_matches
+
+    stats = update_matches(advertisement_id)
+    logger.info("Matches for advertisement %s: %s", advertisement_id, stats)
+    return str(stats)
+
+
+def enqueue_advertisement_matches(advertisement_id: int) -> None:
+    """
+    Ставит пересчёт пар объявления в очередь.
+
+    Недоступность брокера не должна ломать сохранение объявления: пары тогда
+    пересчитает команда `match_advertisements`.
+    """
+    try:
+        update_advertisement_matches.delay(advertisement_id)
+    except OperationalError as e:
+        logger.warning(
+            "Could not enqueue matching for advertisement %s: %s", advertisement_id, e
+        )
+
+
+@shared_task
+def cleanup_photo_upload_sessions() -> str:
+    """
+    Удаляет брошенные сессии загрузки фотографий по частям и их временные
+    файлы (см. siteapp.uploads).
+    """
+    from .uploads import delete_stale_sessions
+
+    result = f"Deleted {delete_stale_sessions()} stale photo upload sessions."
+    print(result)
+    return result
+
+
+@shared_task(ignore_result=True)
+def refresh_home_page_snapshot() -> str:
+    """
+    Пересобирает снимки главной страницы (см. siteapp.homepage).
+    """
+    from . import homepage
+
+    return f"Rebuilt {homepage.rebuild()} home page snapshots."
+
+
+def enqueue_home_page_snapshot() -> None:
+    """
+    Ставит пересборку снимка главной страницы в очередь с задержкой.
+
+    Пока пересборка ожидает выполнения, повторные вызовы ничего не делают,
+    поэтому изменения за время задержки собираются одной задачей. Если
+    брокер недоступен, снимок помечается устаревшим и его пересоберёт
+    следующий запрос главной страницы.
+    """
+    from . import homepage
+
+    delay = homepage.debounce_delay()
+    if not cache.add(homepage.SCHEDULED_KEY, 1, timeout=delay + homepage.LOCK_TIMEOUT):
+        return
+    try:
+        refresh_home_page_snapshot.apply_async(countdown=delay)
+    except OperationalError as e:
+        cache.delete(homepage.SCHEDULED_KEY)
+        homepage.expire()
+        logger.warning("Could not enqueue home page snapshot: %s", e)
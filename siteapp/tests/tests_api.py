@@ -1,15 +1,46 @@
-from django.test import TestCase
+import math
+import re
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from dateutil.relativedelta import relativedelta
+from PIL import Image, ImageFilter
 
+from ..admin import make_needs_moderation
+from .. import autocomplete, fingerprints, geo, homepage, images, lookups, matching, region_activity, similarity, tasks, uploads, warmup
+from ..serializers import DETAIL_RESPONSES_LIMIT
 from ..models import (
-    User, Role, Region, Species, Breed, AdStatus,
-    Animal, Advertisement, AdResponse
+    User, Role, Region, Species, Breed, AdStatus, AnimalColor,
+    Animal, Advertisement, AdResponse, AdvertisementRating, AdPhoto,
+    Article, ArticleCategory, Comment, PhotoUploadSession, RegionActivity
 )
 
+def app_queries(context):
+    """Возвращает SQL-запросы приложения без служебных запросов профилировщика Silk."""
+    return [
+        query['sql'] for query in context.captured_queries
+        if 'silk_' not in query['sql'] and not query['sql'].startswith(('EXPLAIN', 'SAVEPOINT', 'RELEASE SAVEPOINT'))
+    ]
+
+
 class ModelTests(TestCase):
 
     def setUp(self):
@@ -59,6 +90,7 @@ class ApiTests(APITestCase):
 
     def setUp(self):
         """Настройка данных для тестов API."""
+        cache.clear()
         self.client = APIClient()
 
         self.user_role = Role.objects.create(name="Пользователь", can_create_advertisement=True)
@@ -205,3 +237,2052 @@ class ApiTests(APITestCase):
         self.assertEqual(response.data['message'], "Это тестовый комментарий.")
         self.assertEqual(AdResponse.objects.count(), 1)
         self.assertEqual(AdResponse.objects.first().advertisement, self.ad1)
+
+    def test_list_advertisements_cursor_pagination(self):
+        """
+        11. Тест: Курсорная пагинация отдаёт все объявления без повторов и без подсчёта count.
+        """
+        url = reverse('advertisement-list') + '?pagination=cursor&page_size=2'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        first_page_ids = [ad['id'] for ad in response.data['results']]
+        self.assertEqual(first_page_ids, [self.ad3.id, self.ad2.id])
+
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([ad['id'] for ad in response.data['results']], [self.ad1.id])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'], format='json')
+        self.assertEqual([ad['id'] for ad in response.data['results']], first_page_ids)
+
+    def test_list_advertisements_cursor_pagination_with_filter(self):
+        """
+        12. Тест: Курсорная пагинация сочетается с фильтрами AdvertisementFilter.
+        """
+        url = reverse('advertisement-list') + f'?pagination=cursor&page_size=1&species={self.species_cat.id}'
+        response = self.client.get(url, format='json')
+        self.assertEqual([ad['id'] for ad in response.data['results']], [self.ad3.id])
+
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([ad['id'] for ad in response.data['results']], [self.ad1.id])
+        self.assertIsNone(response.data['next'])
+
+    def test_list_advertisements_invalid_cursor(self):
+        """
+        13. Тест: Повреждённый курсор возвращает 404.
+        """
+        url = reverse('advertisement-list') + '?cursor=cD1ub3QtYS1kYXRlJTdDMQ%3D%3D'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AdvertisementCounterTests(TestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов денормализованных счётчиков."""
+        species = Species.objects.create(name="Кошка")
+        status_lost = AdStatus.objects.create(name="Потеряно")
+        self.owner = User.objects.create_user(username='owner', email='owner@test.com', password='password123')
+        self.voter = User.objects.create_user(username='voter', email='voter@test.com', password='password123')
+        self.other_voter = User.objects.create_user(username='voter2', email='voter2@test.com', password='password123')
+        animal = Animal.objects.create(species=species, name="Мурка")
+        self.ad = Advertisement.objects.create(user=self.owner, animal=animal, status=status_lost, title="Пропала кошка")
+
+    def test_counters_follow_responses_and_ratings(self):
+        """
+        14. Тест: Счётчики откликов и оценок обновляются при создании, изменении и удалении.
+        """
+        response = AdResponse.objects.create(advertisement=self.ad, user=self.voter, message="Видел её")
+        AdResponse.objects.create(advertisement=self.ad, user=self.other_voter, message="И я")
+        rating = AdvertisementRating.objects.create(advertisement=self.ad, user=self.voter, rating=5)
+        AdvertisementRating.objects.create(advertisement=self.ad, user=self.other_voter, rating=2)
+
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.responses_count, 2)
+        self.assertEqual(self.ad.rating_count, 2)
+        self.assertEqual(self.ad.rating_sum, 7)
+        self.assertEqual(self.ad.average_rating, 3.5)
+
+        rating.rating = 3
+        rating.save()
+        response.delete()
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.responses_count, 1)
+        self.assertEqual(self.ad.average_rating, 2.5)
+
+        AdvertisementRating.objects.filter(advertisement=self.ad).delete()
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.rating_count, 0)
+        self.assertIsNone(self.ad.average_rating)
+
+    def test_sync_ad_counters_command_fixes_drift(self):
+        """
+        15. Тест: Команда sync_ad_counters находит и исправляет расхождения.
+        """
+        AdResponse.objects.create(advertisement=self.ad, user=self.voter, message="Видел её")
+        AdvertisementRating.objects.create(advertisement=self.ad, user=self.voter, rating=4)
+        Advertisement.objects.filter(pk=self.ad.pk).update(responses_count=10, rating_count=0, rating_sum=0, average_rating=None)
+
+        out = StringIO()
+        call_command('sync_ad_counters', '--dry-run', stdout=out)
+        self.assertIn('1 drifted', out.getvalue())
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.responses_count, 10)
+
+        call_command('sync_ad_counters', stdout=StringIO())
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.responses_count, 1)
+        self.assertEqual(self.ad.rating_count, 1)
+        self.assertEqual(self.ad.average_rating, 4.0)
+
+
+class AdvertisementSearchTests(APITestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов полнотекстового поиска."""
+        cache.clear()
+        species = Species.objects.create(name="Кошка")
+        status_lost = AdStatus.objects.create(name="Потеряно")
+        user = User.objects.create_user(username='searcher', email='searcher@test.com', password='password123')
+        self.animal = Animal.objects.create(species=species, name="Рыжик")
+        self.ad_title = Advertisement.objects.create(
+            user=user, animal=self.animal, status=status_lost,
+            title="Пропал рыжий кот в Химках", description="Убежал вечером",
+        )
+        self.ad_description = Advertisement.objects.create(
+            user=user, animal=Animal.objects.create(species=species, name="Барсик"), status=status_lost,
+            title="Найден кот", description="Рыжего кота нашли у станции, Химки",
+        )
+        Advertisement.objects.create(
+            user=user, animal=Animal.objects.create(species=species, name="Снежок"), status=status_lost,
+            title="Пропала белая кошка", description="Москва",
+        )
+        self.url = reverse('advertisement-list')
+
+    def search(self, query):
+        response = self.client.get(self.url, {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ad['id'] for ad in response.data['results']]
+
+    def test_search_uses_stemming_and_relevance(self):
+        """
+        16. Тест: Поиск находит словоформы и ставит совпадение в заголовке выше.
+        """
+        self.assertEqual(self.search("рыжий кот Химки"), [self.ad_title.id, self.ad_description.id])
+        self.assertEqual(self.search("пропавшая кошка"), [Advertisement.objects.get(title="Пропала белая кошка").id])
+        self.assertEqual(self.search("!!!"), [])
+
+        # Таблица индекса просматривается один раз на запрос, а не для каждой строки.
+        with CaptureQueriesContext(connection) as ctx:
+            self.search("кот")
+        for sql in app_queries(ctx):
+            self.assertLessEqual(sql.count(" MATCH "), 1, sql)
+            self.assertLessEqual(sql.count("ts_rank_cd("), 1, sql)
+
+    def test_search_index_follows_ad_and_animal_changes(self):
+        """
+        17. Тест: Индекс обновляется при изменении объявления, животного и удалении.
+        """
+        self.animal.name = "Персик"
+        self.animal.save()
+        self.assertEqual(self.search("персик"), [self.ad_title.id])
+
+        self.ad_title.title = "Пропал серый кот"
+        self.ad_title.save()
+        self.assertEqual(self.search("серый"), [self.ad_title.id])
+        self.assertEqual(self.search("Химки"), [self.ad_description.id])
+
+        self.ad_description.delete()
+        self.assertEqual(self.search("станция"), [])
+
+    def test_rebuild_search_index_command(self):
+        """
+        18. Тест: Команда rebuild_search_index восстанавливает индекс после обновления в обход сигналов.
+        """
+        Advertisement.objects.filter(pk=self.ad_title.pk).update(title="Потерялся попугай")
+        self.assertEqual(self.search("попугай"), [])
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 advertisements', out.getvalue())
+        self.assertEqual(self.search("попугай"), [self.ad_title.id])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Планы запросов проверяются на SQLite')
+class AdvertisementQueryPlanTests(APITestCase):
+
+    SCAN_RE = re.compile(r'^SCAN ')
+    FULL_SCAN_RE = re.compile(r'^SCAN (\S+)(?: AS \S+)?$')
+
+    def setUp(self):
+        """Наполнение БД данными для проверки планов запросов."""
+        cache.clear()
+        self.region = Region.objects.create(name="Москва")
+        self.status = AdStatus.objects.create(name="Потеряно")
+        self.species = Species.objects.create(name="Кошка")
+        self.breed = Breed.objects.create(name="Сиамская", species=self.species)
+        self.color = AnimalColor.objects.create(name="Рыжий")
+        user = User.objects.create_user(username='planner', email='planner@test.com', password='password123', region=self.region)
+        for i in range(30):
+            animal = Animal.objects.create(
+                species=self.species, breed=self.breed if i % 2 else None, color=self.color,
+                gender='M' if i % 3 else 'F', name=f"Кот {i}",
+                birth_date=timezone.now().date() - relativedelta(years=i % 10) if i % 4 else None,
+            )
+            Advertisement.objects.create(user=user, animal=animal, status=self.status, title=f"Объявление {i}", description="Описание")
+
+    def scans(self, params, pattern):
+        """Возвращает строки плана запросов ленты, подходящие под шаблон сканирования."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('advertisement-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        scans = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'siteapp_advertisement' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                scans += [row[-1] for row in cursor.fetchall() if pattern.match(row[-1])]
+        return scans
+
+    def test_filter_combinations_use_indexes(self):
+        """
+        19. Тест: Лента без фильтров идёт по индексу, а с фильтрами не сканирует таблицы целиком.
+        """
+        self.assertEqual(self.scans({}, self.FULL_SCAN_RE), [])
+
+        combinations = [
+            {'ad_status': self.status.id},
+            {'region': self.region.id},
+            {'species': self.species.id},
+            {'species': self.species.id, 'breed': self.breed.id},
+            {'species': self.species.id, 'gender': 'M'},
+            {'breed': self.breed.id},
+            {'color': self.color.id},
+            {'gender': 'F'},
+            {'age_category': '1_3'},
+            {'age_category': 'unknown'},
+            {'species': self.species.id, 'age_category': '3_7'},
+            {'publication_date_after': '2020-01-01'},
+            {'publication_date_before': '2030-01-01', 'ad_status': self.status.id},
+            {'ad_status': self.status.id, 'page': 2, 'page_size': 5},
+            {
+                'ad_status': self.status.id, 'region': self.region.id, 'species': self.species.id,
+                'gender': 'M', 'color': self.color.id, 'age_category': '1_3',
+            },
+        ]
+        for params in combinations:
+            with self.subTest(params=params):
+                self.assertEqual(self.scans(params, self.SCAN_RE), [])
+
+
+class AdvertisementFacetTests(APITestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов фасетных счётчиков."""
+        cache.clear()
+        self.moscow = Region.objects.create(name="Москва")
+        self.kazan = Region.objects.create(name="Казань")
+        self.lost = AdStatus.objects.create(name="Потеряно")
+        self.found = AdStatus.objects.create(name="Найдено")
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.user = User.objects.create_user(username='moscow', email='moscow@test.com', password='password123', region=self.moscow)
+        kazan_user = User.objects.create_user(username='kazan', email='kazan@test.com', password='password123', region=self.kazan)
+        today = timezone.now().date()
+        ads = [
+            (self.user, self.cat, 'M', self.lost, today - relativedelta(months=2), "Пропал рыжий кот"),
+            (self.user, self.cat, 'F', self.found, today - relativedelta(years=2), "Найдена кошка"),
+            (self.user, self.dog, 'M', self.lost, None, "Пропал пёс"),
+            (kazan_user, self.cat, 'M', self.lost, today - relativedelta(years=5), "Пропал серый кот"),
+        ]
+        for user, species, gender, ad_status, birth_date, title in ads:
+            animal = Animal.objects.create(species=species, gender=gender, birth_date=birth_date)
+            Advertisement.objects.create(user=user, animal=animal, status=ad_status, title=title, description="Описание")
+        self.url = reverse('advertisement-facets')
+
+    def test_facets_exclude_own_filter(self):
+        """
+        20. Тест: Фасеты считаются фиксированным числом запросов без собственного фильтра измерения.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'species': self.cat.id, 'region': self.moscow.id})
+        # 2 проверки выбранных значений + 6 сгруппированных запросов + возраст и общее количество.
+        self.assertEqual(len(app_queries(ctx)), 9)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 2)
+        facets = response.data['facets']
+        self.assertEqual(facets['species'], {str(self.cat.id): 2, str(self.dog.id): 1})
+        self.assertEqual(facets['region'], {str(self.moscow.id): 2, str(self.kazan.id): 1})
+        self.assertEqual(facets['ad_status'], {str(self.lost.id): 1, str(self.found.id): 1})
+        self.assertEqual(facets['gender'], {'M': 1, 'F': 1})
+        self.assertEqual(facets['breed'], {})
+        self.assertEqual(facets['age_category'], {'0_0.5': 1, '0.5_1': 0, '1_3': 1, '3_7': 0, '7_inf': 0, 'unknown': 0})
+
+        response = self.client.get(self.url, {'age_category': '1_3', 'search': 'кошка'})
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['facets']['age_category']['1_3'], 1)
+        self.assertEqual(response.data['facets']['species'], {str(self.cat.id): 1})
+
+    def test_facets_cached_for_anonymous_users(self):
+        """
+        21. Тест: Фасеты кэшируются для анонимов по нормализованному набору фильтров.
+        """
+        self.client.get(self.url, {'species': self.cat.id, 'gender': 'M'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'gender': 'M', 'search': '', 'species': self.cat.id})
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(response.data['total'], 2)
+
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, {'species': self.cat.id, 'gender': 'M'})
+        self.assertEqual(len(app_queries(ctx)), 8)
+
+        response = self.client.get(self.url, {'species': 999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdvertisementListCacheTests(APITestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов кэша списка объявлений."""
+        cache.clear()
+        self.lost = AdStatus.objects.create(name="Потеряно")
+        self.found = AdStatus.objects.create(name="Найдено")
+        self.cat = Species.objects.create(name="Кошка")
+        self.user = User.objects.create_user(username='cacher', email='cacher@test.com', password='password123')
+        self.admin = User.objects.create_superuser(username='cacheadmin', email='cacheadmin@test.com', password='password123')
+        self.ad_lost = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=self.cat, name="Мурка"),
+            status=self.lost, title="Пропала кошка",
+        )
+        self.ad_found = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=self.cat, name="Барсик"),
+            status=self.found, title="Найден кот",
+        )
+        self.url = reverse('advertisement-list')
+
+    def fetch(self, params=None):
+        """Запрашивает список и возвращает ответ и выполненные запросы приложения."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, app_queries(ctx)
+
+    def test_anonymous_list_is_cached(self):
+        """
+        22. Тест: Список для анонимов берётся из кэша по нормализованному запросу, счётчики доступны админу.
+        """
+        _, queries = self.fetch({'species': self.cat.id, 'page': 1})
+        self.assertTrue(queries)
+        response, queries = self.fetch({'page': 1, 'color': '', 'species': self.cat.id})
+        self.assertEqual(queries, [])
+        self.assertEqual(response.data['count'], 2)
+
+        self.client.force_authenticate(user=self.user)
+        _, queries = self.fetch({'species': self.cat.id, 'page': 1})
+        self.assertTrue(queries)
+        response = self.client.get(reverse('advertisement-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('advertisement-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['hits'], response.data['misses']), (1, 1))
+        self.assertEqual(response.data['hit_ratio'], 0.5)
+
+    def test_cache_invalidated_by_status_generation(self):
+        """
+        23. Тест: Изменение объявления инвалидирует только ответы его статуса и общий список.
+        """
+        self.fetch({'ad_status': self.lost.id})
+        self.fetch({'ad_status': self.found.id})
+        self.fetch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ad_lost.title = "Пропала рыжая кошка"
+            self.ad_lost.save()
+        response, queries = self.fetch({'ad_status': self.lost.id})
+        self.assertTrue(queries)
+        self.assertEqual(response.data['results'][0]['title'], "Пропала рыжая кошка")
+        _, queries = self.fetch({'ad_status': self.found.id})
+        self.assertEqual(queries, [])
+        _, queries = self.fetch()
+        self.assertTrue(queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AdPhoto.objects.create(advertisement=self.ad_found, image='ad_photos/cat.jpg')
+        _, queries = self.fetch({'ad_status': self.found.id})
+        self.assertTrue(queries)
+        _, queries = self.fetch({'ad_status': self.lost.id})
+        self.assertEqual(queries, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ad_lost.status = self.found
+            self.ad_lost.save()
+        response, _ = self.fetch({'ad_status': self.lost.id})
+        self.assertEqual(response.data['count'], 0)
+        response, _ = self.fetch({'ad_status': self.found.id})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_user_change_invalidates_only_own_statuses(self):
+        """
+        64. Тест: Изменение пользователя инвалидирует кэш только для статусов его объявлений и только если меняются выводимые поля.
+        """
+        finder = User.objects.create_user(username='finder', email='finder@test.com', password='password123')
+        Advertisement.objects.create(
+            user=finder, animal=Animal.objects.create(species=self.cat, name="Пушок"),
+            status=self.found, title="Найден пушистый кот",
+        )
+        self.fetch({'ad_status': self.lost.id})
+        self.fetch({'ad_status': self.found.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finder.set_password('new-password')
+            finder.first_name = "Пётр"
+            finder.is_staff = True
+            finder.save()
+        _, queries = self.fetch({'ad_status': self.found.id})
+        self.assertEqual(queries, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finder.display_name = "Пётр"
+            finder.save()
+        response, queries = self.fetch({'ad_status': self.found.id})
+        self.assertTrue(queries)
+        self.assertIn("Пётр", [ad['user']['display_name'] for ad in response.data['results']])
+        _, queries = self.fetch({'ad_status': self.lost.id})
+        self.assertEqual(queries, [])
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов параметров fields и omit."""
+        cache.clear()
+        species = Species.objects.create(name="Кошка")
+        ad_status = AdStatus.objects.create(name="Потеряно")
+        self.user = User.objects.create_user(username='sparse', email='sparse@test.com', password='password123')
+        self.ad = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=species, name="Мурка"),
+            status=ad_status, title="Пропала кошка", description="Очень длинное описание",
+        )
+        AdPhoto.objects.create(advertisement=self.ad, image='ad_photos/cat.jpg')
+        self.article = Article.objects.create(title="Как искать кошку", content="Текст статьи", author=self.user)
+        Comment.objects.create(article=self.article, user=self.user, text="Спасибо")
+
+    def get(self, url, params):
+        """Выполняет запрос и возвращает ответ и SQL-запросы приложения."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, app_queries(ctx)
+
+    def test_advertisement_sparse_fieldsets(self):
+        """
+        24. Тест: fields/omit ограничивают поля объявлений и убирают ненужные JOIN и prefetch.
+        """
+        response, queries = self.get(reverse('advertisement-list'), {'fields': 'id,title,unknown'})
+        self.assertEqual(list(response.data['results'][0].keys()), ['id', 'title'])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('JOIN', queries[-1])
+        self.assertNotIn('"siteapp_advertisement"."description"', queries[-1])
+
+        response, queries = self.get(reverse('advertisement-list'), {'omit': 'animal,first_photo_url,cover_photo'})
+        item = response.data['results'][0]
+        self.assertNotIn('animal', item)
+        self.assertNotIn('first_photo_url', item)
+        self.assertNotIn('cover_photo', item)
+        self.assertEqual(item['location'], "Не указано")
+        self.assertFalse(any('siteapp_adphoto' in sql or 'siteapp_animal' in sql for sql in queries))
+
+        url = reverse('advertisement-detail', kwargs={'pk': self.ad.pk})
+        response, queries = self.get(url, {'fields': 'id,photos'})
+        self.assertEqual(set(response.data.keys()), {'id', 'photos'})
+        self.assertEqual(len(response.data['photos']), 1)
+        self.assertFalse(any('siteapp_adresponse' in sql for sql in queries))
+
+    def test_article_sparse_fieldsets(self):
+        """
+        25. Тест: fields/omit для статей не считают комментарии и не загружают текст без необходимости.
+        """
+        response, queries = self.get(reverse('article_list_create'), {'fields': 'id,title'})
+        self.assertEqual(list(response.data['results'][0].keys()), ['id', 'title'])
+        self.assertFalse(any('siteapp_comment' in sql for sql in queries))
+        self.assertNotIn('"siteapp_article"."content"', queries[-1])
+
+        response, _ = self.get(reverse('article_list_create'), {})
+        self.assertEqual(response.data['results'][0]['comments_count'], 1)
+
+        url = reverse('article_retrieve_update_destroy', kwargs={'id': self.article.id})
+        response, queries = self.get(url, {'omit': 'comments,categories'})
+        self.assertEqual(response.data['content'], "Текст статьи")
+        self.assertNotIn('comments', response.data)
+        self.assertFalse(any('siteapp_comment' in sql for sql in queries))
+
+
+class AdvertisementMarkersTests(APITestCase):
+
+    def setUp(self):
+        """Настройка данных для тестов маркеров карты."""
+        cache.clear()
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.lost = AdStatus.objects.create(name="Потеряно")
+        user = User.objects.create_user(username='mapper', email='mapper@test.com', password='password123')
+        points = [
+            (self.cat, 55.7510, 37.6210), (self.cat, 55.7520, 37.6190), (self.dog, 55.7530, 37.6200),
+            (self.cat, 59.9400, 30.3100), (self.cat, 55.7900, 49.1200), (self.cat, None, None),
+        ]
+        self.ads = [
+            Advertisement.objects.create(
+                user=user, animal=Animal.objects.create(species=species), status=self.lost,
+                title="Объявление", latitude=lat, longitude=lon,
+            )
+            for species, lat, lon in points
+        ]
+        self.url = reverse('advertisement-markers')
+
+    def test_markers_clustered_by_zoom(self):
+        """
+        26. Тест: Маркеры в bbox кластеризуются по сетке на малом масштабе и учитывают фильтры.
+        """
+        response = self.client.get(self.url, {'bbox': '29,54,40,61', 'zoom': 6})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        spb = self.ads[3]
+        self.assertEqual(response.data['markers'], [[spb.id, 59.94, 30.31, self.cat.id, self.lost.id]])
+        self.assertEqual(len(response.data['clusters']), 1)
+        self.assertEqual(response.data['clusters'][0][2], 3)
+
+        response = self.client.get(self.url, {'bbox': '37.618,55.750,37.623,55.754', 'zoom': 17, 'species': self.cat.id})
+        self.assertFalse(response.data['clustered'])
+        self.assertEqual(sorted(marker[0] for marker in response.data['markers']), [self.ads[0].id, self.ads[1].id])
+
+        # Без кластеризации нельзя запросить область больше нескольких экранов.
+        response = self.client.get(self.url, {'bbox': '-180,-90,180,90', 'zoom': 20})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with mock.patch.object(geo, 'MAX_UNCLUSTERED_MARKERS', 2):
+            response = self.client.get(self.url, {'bbox': '37.618,55.750,37.623,55.754', 'zoom': 17})
+        self.assertTrue(response.data['clustered'])
+        self.assertEqual(sum(cluster[2] for cluster in response.data['clusters']) + len(response.data['markers']), 3)
+
+        response = self.client.get(self.url, {'bbox': '40,54,29,61', 'zoom': 6})
+        self.assertEqual([marker[0] for marker in response.data['markers']], [self.ads[4].id])
+
+        response = self.client.get(self.url, {'bbox': '29,54,40', 'zoom': 6})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cluster_rows_follow_mercator_tiles(self):
+        """
+        65. Тест: Строки сетки кластеризации совпадают со строками тайлов Web Mercator.
+        """
+        Advertisement.objects.filter(latitude__isnull=False).delete()
+        # Ячейки сетки на масштабе 10 - тайлы масштаба 12.
+        tile_row = math.floor(geo.tile_y(55.6, 12))
+        tile_edge = geo.tile_bbox(12, 0, tile_row)[1]
+        degree_edge = 634 * 360 / 4096
+        points = [(tile_edge + 0.0005, 37.5), (tile_edge - 0.0005, 37.5), (degree_edge + 0.0005, 37.7), (degree_edge - 0.0005, 37.7)]
+        for lat, lon in points:
+            Advertisement.objects.create(
+                user=self.ads[0].user, animal=Animal.objects.create(species=self.cat), status=self.lost,
+                title="Объявление", latitude=lat, longitude=lon,
+            )
+        response = self.client.get(self.url, {'bbox': '37,55,38,56', 'zoom': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Точки по разные стороны границы тайла не объединяются, а точки внутри одной строки тайла - объединяются.
+        self.assertEqual(sorted(round(marker[1], 4) for marker in response.data['markers']), sorted(round(lat, 4) for lat, _ in points[:2]))
+        self.assertEqual([cluster[2] for cluster in response.data['clusters']], [2])
+
+    def test_markers_tile_cached(self):
+        """
+        27. Тест: Маркеры тайла кэшируются на сервере и отдаются с Cache-Control.
+        """
+        zoom, lat, lon = 10, math.radians(55.752), 37.62
+        x = int((lon + 180) / 360 * 2 ** zoom)
+        y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * 2 ** zoom)
+        tile = f"{zoom}/{x}/{y}"
+
+        response = self.client.get(self.url, {'tile': tile})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertEqual(response.data['clusters'][0][2], 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url, {'tile': tile, 'color': ''})
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(cached.data, response.data)
+
+        response = self.client.get(self.url, {'tile': '3/9/1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdvertisementNearbyTests(APITestCase):
+
+    def setUp(self):
+        """Настройка объявлений на разном расстоянии от центра Москвы."""
+        cache.clear()
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.lost = AdStatus.objects.create(name="Потеряно")
+        user = User.objects.create_user(username='nearby', email='nearby@test.com', password='password123')
+        self.center = (55.7520, 37.6200)
+        points = [
+            (self.cat, 55.7530, 37.6200), (self.cat, 55.7700, 37.6200), (self.dog, 55.8000, 37.6200),
+            (self.cat, 55.9500, 37.6200), (self.cat, 59.9400, 30.3100), (self.cat, None, None),
+        ]
+        self.ads = [
+            Advertisement.objects.create(
+                user=user, animal=Animal.objects.create(species=species), status=self.lost,
+                title="Объявление", latitude=lat, longitude=lon,
+            )
+            for species, lat, lon in points
+        ]
+        self.url = reverse('advertisement-list')
+        self.near = f"{self.center[0]},{self.center[1]}"
+
+    def ids(self, response):
+        return [ad['id'] for ad in response.data['results']]
+
+    def test_geohash_maintained_on_save(self):
+        """
+        28. Тест: Geohash объявления пересчитывается при сохранении и очищается без координат.
+        """
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        ad = self.ads[0]
+        self.assertEqual(ad.geohash, geo.encode_geohash(ad.latitude, ad.longitude))
+        self.assertEqual(len(ad.geohash), geo.GEOHASH_PRECISION)
+        self.assertEqual(self.ads[5].geohash, '')
+
+        ad.latitude, ad.longitude = 59.94, 30.31
+        ad.save(update_fields=['latitude', 'longitude'])
+        ad.refresh_from_db()
+        self.assertEqual(ad.geohash, geo.encode_geohash(59.94, 30.31))
+
+        ad.latitude = None
+        ad.save()
+        ad.refresh_from_db()
+        self.assertEqual(ad.geohash, '')
+
+    def test_radius_search_sorted_by_distance(self):
+        """
+        29. Тест: Поиск в радиусе возвращает объявления по возрастанию расстояния и сочетается с фильтрами.
+        """
+        response = self.client.get(self.url, {'near': self.near, 'radius_km': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ids(response), [ad.id for ad in self.ads[:3]])
+        distances = [ad['distance_km'] for ad in response.data['results']]
+        self.assertAlmostEqual(distances[0], 0.111, places=2)
+        self.assertAlmostEqual(distances[2], 5.338, places=1)
+
+        response = self.client.get(self.url, {'near': self.near})
+        self.assertEqual(self.ids(response), [ad.id for ad in self.ads[:3]])
+
+        response = self.client.get(self.url, {'near': self.near, 'radius_km': 30, 'species': self.cat.id})
+        self.assertEqual(self.ids(response), [self.ads[0].id, self.ads[1].id, self.ads[3].id])
+
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data['results'][0]['distance_km'])
+
+        for params in ({'near': '55.7'}, {'near': '95,37'}, {'near': self.near, 'radius_km': 600}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        if connection.vendor == 'sqlite':
+            queryset = geo.within_radius(Advertisement.objects.all(), *self.center, 10).order_by('distance_km')
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('ad_geohash_idx', plan)
+
+    def test_nearest_and_cursor_pagination(self):
+        """
+        30. Тест: Ближайшие N объявлений и курсорная пагинация по расстоянию.
+        """
+        response = self.client.get(self.url, {'near': self.near, 'nearest': 2})
+        self.assertEqual(self.ids(response), [self.ads[0].id, self.ads[1].id])
+
+        response = self.client.get(self.url, {'near': self.near, 'nearest': 10})
+        self.assertEqual(self.ids(response), [ad.id for ad in self.ads[:5]])
+
+        response = self.client.get(self.url, {'near': self.near, 'nearest': 2, 'radius_km': 0.05})
+        self.assertEqual(self.ids(response), [])
+
+        params = {'near': self.near, 'radius_km': 50, 'pagination': 'cursor', 'page_size': 2}
+        response = self.client.get(self.url, params)
+        self.assertEqual(self.ids(response), [self.ads[0].id, self.ads[1].id])
+        self.assertNotIn('count', response.data)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self.ids(response), [self.ads[2].id, self.ads[3].id])
+        self.assertIsNone(response.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self.ids(response), [self.ads[0].id, self.ads[1].id])
+
+
+class FastSerializationParityTests(APITestCase):
+
+    def setUp(self):
+        """Данные со всеми вариантами полей для сравнения двух путей сериализации."""
+        cache.clear()
+        region = Region.objects.create(name="Москва")
+        cat = Species.objects.create(name="Кошка")
+        breed = Breed.objects.create(name="Сиамская", species=cat)
+        color = AnimalColor.objects.create(name="Рыжий")
+        active = AdStatus.objects.create(name="Активно")
+        lost = AdStatus.objects.create(name="Потеряно")
+        author = User.objects.create_user(username='writer', email='writer@test.com', password='password123', display_name="Автор", region=region, is_staff=True)
+        anonymous = User.objects.create_user(username='nobody', email='nobody@test.com', password='password123')
+        animals = [
+            Animal.objects.create(species=cat, breed=breed, color=color, gender='M', name="Кот Барсик", birth_date=timezone.now().date() - relativedelta(years=2)),
+            Animal.objects.create(species=cat, gender='F'),
+            Animal.objects.create(species=cat, color=color, name=""),
+        ]
+        self.ads = []
+        for i in range(5):
+            ad = Advertisement.objects.create(
+                user=author if i % 2 else anonymous, animal=animals[i % 3], status=active if i % 2 else lost,
+                title=f"Кот {i}", description="Пропал кот. " * (i * 5),
+                latitude=55.75 + i / 100 if i != 2 else None, longitude=37.62 if i != 2 else None,
+            )
+            self.ads.append(ad)
+        Advertisement.objects.filter(pk=self.ads[1].pk).update(rating_count=2, rating_sum=7, average_rating=3.5)
+        AdPhoto.objects.create(advertisement=self.ads[0], image="ad_photos/2026/01/01/кот 1.jpg")
+        AdPhoto.objects.create(advertisement=self.ads[0], image="ad_photos/2026/01/01/second.jpg")
+        AdPhoto.objects.create(advertisement=self.ads[3], image="ad_photos/2026/01/02/photo(1).png")
+
+        news = ArticleCategory.objects.create(name="Новости", slug="news")
+        tips = ArticleCategory.objects.create(name="Советы", slug="tips")
+        for i in range(4):
+            article = Article.objects.create(
+                title=f"Статья {i}", content="Текст статьи. " * (i * 10),
+                author=author if i % 2 else None,
+                main_image="article_images/2026/01/01/обложка.jpg" if i != 1 else None,
+            )
+            article.categories.set([tips, news] if i % 2 else [news])
+            for _ in range(i):
+                Comment.objects.create(article=article, user=author, text="Комментарий")
+
+    def assertSameContent(self, url, params=None):
+        """Сравнивает ответы эталонных сериализаторов и быстрого пути байт в байт."""
+        contents = []
+        for enabled in (False, True):
+            cache.clear()
+            with override_settings(FAST_LIST_SERIALIZATION=enabled):
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            contents.append(response.content)
+        self.assertEqual(contents[1], contents[0])
+        return contents[1]
+
+    def test_advertisement_list_parity(self):
+        """
+        31. Тест: Быстрый путь списка объявлений совпадает с сериализатором для фильтров, полей и пагинации.
+        """
+        url = reverse('advertisement-list')
+        content = self.assertSameContent(url)
+        self.assertIn('http://testserver/media/ad_photos/2026/01/01/%D0%BA%D0%BE%D1%82%201.jpg', content.decode())
+
+        for params in (
+            {'fields': 'id,animal,first_photo_url'},
+            {'omit': 'user,animal'},
+            {'page': 2, 'page_size': 2},
+            {'pagination': 'cursor', 'page_size': 2},
+            {'near': '55.75,37.62', 'radius_km': 50},
+            {'near': '55.75,37.62', 'nearest': 2, 'pagination': 'cursor'},
+            {'search': 'кот'},
+            {'ordering': 'title'},
+            {'ad_status': self.ads[1].status_id, 'fields': 'id,location,rating_count,average_rating'},
+        ):
+            with self.subTest(params=params):
+                self.assertSameContent(url, params)
+
+        self.client.force_authenticate(User.objects.get(username='writer'))
+        self.assertSameContent(url, {'fields': 'id,status,short_description'})
+
+    def test_article_list_and_home_page_parity(self):
+        """
+        32. Тест: Быстрый путь списка статей и главной страницы совпадает с сериализаторами.
+        """
+        url = reverse('article_list_create')
+        for params in ({}, {'fields': 'id,categories,comments_count'}, {'omit': 'excerpt'}, {'category': 'tips'}, {'search': 'Статья 3'}):
+            with self.subTest(params=params):
+                self.assertSameContent(url, params)
+
+        content = self.assertSameContent(reverse('homepage_data_api'))
+        self.assertIn('recent_ads', content.decode())
+
+    def test_benchmark_serializers_command(self):
+        """
+        33. Тест: Команда benchmark_serializers сообщает скорость обоих путей.
+        """
+        out = StringIO()
+        call_command('benchmark_serializers', '--repeat', '1', '--host', 'testserver', stdout=out)
+        output = out.getvalue()
+        self.assertIn('advertisement list: 5 objects', output)
+        self.assertIn('fast path', output)
+
+
+class AdvertisementCoverPhotoTests(APITestCase):
+
+    def setUp(self):
+        """Объявление владельца и временный каталог для загружаемых фото."""
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        role = Role.objects.create(name="Пользователь", can_create_advertisement=True)
+        self.owner = User.objects.create_user(username='owner', email='owner@test.com', password='password123', role=role)
+        self.ad = Advertisement.objects.create(
+            user=self.owner, animal=Animal.objects.create(species=Species.objects.create(name="Кошка")),
+            status=AdStatus.objects.create(name="Потеряно"), title="Пропала кошка", description="Описание",
+        )
+        self.url = reverse('advertisement-detail', kwargs={'pk': self.ad.pk})
+
+    def image(self, name, size):
+        """Возвращает загружаемый PNG заданного размера."""
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def list_item(self):
+        """Возвращает объявление из ленты и SQL-запросы приложения."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('advertisement-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'][0], app_queries(ctx)
+
+    def test_cover_photo_follows_uploads_and_deletes(self):
+        """
+        34. Тест: Обложка с размерами обновляется при загрузке и удалении фото и отдаётся в ленте одним JOIN.
+        """
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            self.url, {'photos_upload': [self.image('first.png', (64, 48)), self.image('second.png', (30, 20))]},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        first, second = self.ad.photos.order_by('pk')
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.cover_photo, first)
+        self.assertEqual((first.width, first.height), (64, 48))
+
+        self.client.force_authenticate(None)
+        item, queries = self.list_item()
+        self.assertEqual(item['cover_photo'], {'url': f'http://testserver{first.image.url}', 'width': 64, 'height': 48, 'renditions': None})
+        self.assertEqual(item['first_photo_url'], item['cover_photo']['url'])
+        self.assertFalse(any('FROM "siteapp_adphoto"' in sql for sql in queries))
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(self.url, {'delete_photos': [first.id]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.cover_photo, second)
+
+        second.delete()
+        self.ad.refresh_from_db()
+        self.assertIsNone(self.ad.cover_photo)
+        self.client.force_authenticate(None)
+        item, _ = self.list_item()
+        self.assertIsNone(item['cover_photo'])
+        self.assertIsNone(item['first_photo_url'])
+
+
+class ConditionalDetailTests(APITestCase):
+
+    def setUp(self):
+        """Объявление и статья для условных запросов деталей."""
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@test.com', password='password123')
+        self.ad = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=Species.objects.create(name="Кошка")),
+            status=AdStatus.objects.create(name="Потеряно"), title="Пропала кошка", description="Описание",
+        )
+        self.article = Article.objects.create(title="Статья", content="Текст", author=self.user)
+        self.ad_url = reverse('advertisement-detail', kwargs={'pk': self.ad.pk})
+        self.article_url = reverse('article_retrieve_update_destroy', kwargs={'id': self.article.pk})
+
+    def test_advertisement_detail_not_modified(self):
+        """
+        35. Тест: Детали объявления отвечают 304 одним запросом, пока не изменились объявление или его отклики.
+        """
+        response = self.client.get(self.ad_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(app_queries(ctx)), 1)
+
+        response = self.client.get(self.ad_url, {'fields': 'id,title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        AdResponse.objects.create(advertisement=self.ad, user=self.user, message="Видел кошку")
+        response = self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['responses']), 1)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Иван"
+            self.user.set_password('new-password')
+            self.user.save()
+        self.assertEqual(self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.display_name = "Иван"
+            self.user.save()
+        self.assertEqual(self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_article_detail_not_modified(self):
+        """
+        36. Тест: Детали статьи отвечают 304 по If-Modified-Since и If-None-Match до изменения комментариев.
+        """
+        response = self.client.get(self.article_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(self.article_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(self.article_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        comment = Comment.objects.create(article=self.article, user=self.user, text="Полезно")
+        response = self.client.get(self.article_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        comment.delete()
+        self.assertEqual(self.client.get(self.article_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('article_retrieve_update_destroy', kwargs={'id': 0})).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_commenter_change_updates_article_etag(self):
+        """
+        73. Тест: Изменение имени автора комментария меняет ETag деталей статьи.
+        """
+        commenter = User.objects.create_user(username='commenter', email='commenter@test.com', password='password123')
+        Comment.objects.create(article=self.article, user=commenter, text="Спасибо")
+        etag = self.client.get(self.article_url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            commenter.display_name = "Комментатор"
+            commenter.save()
+        response = self.client.get(self.article_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_lookup_returns_not_found(self):
+        """
+        71. Тест: Детали с нечисловым идентификатором отвечают 404, а не 500.
+        """
+        response = self.client.get(reverse('advertisement-detail', kwargs={'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_status_change_updates_etag(self):
+        """
+        72. Тест: Массовая смена статуса (архивация, действие админки) меняет ETag деталей объявления.
+        """
+        found = AdStatus.objects.create(name="Найдено")
+        AdStatus.objects.create(name="В архиве")
+        AdStatus.objects.create(name="Требует модерации")
+        Advertisement.objects.filter(pk=self.ad.pk).update(status=found, publication_date=timezone.now() - timedelta(days=40))
+        etag = self.client.get(self.ad_url)['ETag']
+
+        tasks.archive_old_advertisements()
+        response = self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], "В архиве")
+
+        etag = response['ETag']
+        make_needs_moderation(mock.Mock(), None, Advertisement.objects.filter(pk=self.ad.pk))
+        response = self.client.get(self.ad_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], "Требует модерации")
+
+
+class AdResponsesPaginationTests(APITestCase):
+
+    def setUp(self):
+        """Объявление с большим количеством откликов."""
+        cache.clear()
+        self.user = User.objects.create_user(username='helper', email='helper@test.com', password='password123')
+        self.ad = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=Species.objects.create(name="Собака")),
+            status=AdStatus.objects.create(name="Потеряно"), title="Пропала собака", description="Описание",
+        )
+        self.responses = [
+            AdResponse.objects.create(advertisement=self.ad, user=self.user, message=f"Отклик {number}")
+            for number in range(15)
+        ]
+        self.newest_ids = [ad_response.id for ad_response in reversed(self.responses)]
+        self.url = reverse('ad_response_create', kwargs={'ad_id': self.ad.id})
+
+    def test_detail_embeds_latest_responses(self):
+        """
+        37. Тест: Детали объявления содержат только последние отклики и их общее количество.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('advertisement-detail', kwargs={'pk': self.ad.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['responses']], self.newest_ids[:DETAIL_RESPONSES_LIMIT])
+        self.assertEqual(response.data['comments_count'], 15)
+        self.assertEqual(len([sql for sql in app_queries(ctx) if 'FROM "siteapp_adresponse"' in sql]), 1)
+
+    def test_responses_cursor_pagination(self):
+        """
+        38. Тест: Отклики объявления отдаются постранично от новых к старым, создание - только авторизованным.
+        """
+        ids, url = [], self.url + '?page_size=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.newest_ids)
+
+        self.assertEqual(self.client.post(self.url, {'message': 'Аноним'}).status_code, status.HTTP_401_UNAUTHORIZED)
+        missing = reverse('ad_response_create', kwargs={'ad_id': self.ad.id + 100})
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ImageRenditionsTests(APITestCase):
+
+    def setUp(self):
+        """Объявление, статья и пользователь с загруженными изображениями."""
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='painter', email='painter@test.com', password='password123')
+        self.ad = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=Species.objects.create(name="Кошка")),
+            status=AdStatus.objects.create(name="Потеряно"), title="Пропала кошка", description="Описание",
+        )
+        self.photo = AdPhoto.objects.create(advertisement=self.ad, image=self.image('cat.jpg', (800, 600)))
+
+    def image(self, name, size, image_format='JPEG'):
+        """Возвращает загружаемое изображение с EXIF-метаданными."""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', size, 'orange').save(buffer, image_format, exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_photo_renditions_built_by_task(self):
+        """
+        39. Тест: Задача строит версии фото без метаданных и заполнитель, лента отдаёт их URL.
+        """
+        with mock.patch.object(tasks.generate_image_renditions, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                photo = AdPhoto.objects.create(advertisement=self.ad, image=self.image('dog.jpg', (200, 100)))
+        delay.assert_called_once_with('siteapp.AdPhoto', photo.pk)
+
+        self.assertEqual(tasks.generate_image_renditions('siteapp.AdPhoto', self.photo.pk), images.UPDATED)
+        self.assertEqual(tasks.generate_image_renditions('siteapp.AdPhoto', self.photo.pk), images.SKIPPED)
+        self.photo.refresh_from_db()
+        renditions = self.photo.renditions
+        self.assertEqual(renditions['source'], self.photo.image.name)
+        self.assertEqual(
+            [(item['width'], item['height'], item['format']) for item in renditions['items']],
+            [(320, 240, 'webp'), (320, 240, 'jpeg'), (640, 480, 'webp'), (640, 480, 'jpeg'), (800, 600, 'webp'), (800, 600, 'jpeg')],
+        )
+        self.assertTrue(renditions['placeholder'].startswith('data:image/webp;base64,'))
+        for item in renditions['items']:
+            with self.photo.image.storage.open(item['name']) as stored, Image.open(stored) as rendition:
+                self.assertEqual(rendition.size, (item['width'], item['height']))
+                self.assertEqual(len(rendition.getexif()), 0)
+
+        response = self.client.get(reverse('advertisement-list'))
+        cover = response.data['results'][0]['cover_photo']
+        self.assertEqual(cover['renditions']['placeholder'], renditions['placeholder'])
+        self.assertEqual(
+            cover['renditions']['sources'][0]['url'],
+            f"http://testserver{self.photo.image.storage.url(renditions['items'][0]['name'])}",
+        )
+
+        self.photo.image = self.image('cat2.jpg', (100, 50))
+        self.photo.save()
+        self.assertEqual(images.process('siteapp.AdPhoto', self.photo.pk), images.UPDATED)
+        self.photo.refresh_from_db()
+        self.assertEqual([item['width'] for item in self.photo.renditions['items']], [100, 100])
+        self.assertFalse(self.photo.image.storage.exists(renditions['items'][0]['name']))
+
+    def test_generate_image_renditions_command(self):
+        """
+        40. Тест: Команда generate_image_renditions строит версии для фото, аватаров и статей.
+        """
+        self.user.avatar = self.image('avatar.jpg', (400, 400))
+        self.user.save()
+        article = Article.objects.create(title="Статья", content="Текст", main_image=self.image('main.png', (1600, 900), 'PNG'))
+        Article.objects.create(title="Без изображения", content="Текст")
+
+        out = StringIO()
+        call_command('generate_image_renditions', '--workers', '1', stdout=out)
+        output = out.getvalue()
+        self.assertIn('siteapp.AdPhoto: 1 images, 1 updated', output)
+        self.assertIn('siteapp.Article: 1 images, 1 updated', output)
+        self.assertIn('siteapp.User: 1 images, 1 updated', output)
+
+        article.refresh_from_db()
+        self.assertEqual([item['width'] for item in article.main_image_renditions['items']], [320, 320, 640, 640, 1280, 1280])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_renditions['width'], 400)
+
+        response = self.client.get(reverse('article_retrieve_update_destroy', kwargs={'id': article.pk}))
+        self.assertEqual(len(response.data['main_image_renditions']['sources']), 6)
+        contents = []
+        for enabled in (False, True):
+            with override_settings(FAST_LIST_SERIALIZATION=enabled):
+                contents.append(self.client.get(reverse('article_list_create')).content)
+        self.assertEqual(contents[0], contents[1])
+
+        out = StringIO()
+        call_command('generate_image_renditions', '--workers', '1', '--model', 'siteapp.User', stdout=out)
+        self.assertIn('siteapp.User: 1 images, 0 updated, 1 up to date', out.getvalue())
+
+
+class PhotoIngestionTests(APITestCase):
+
+    def setUp(self):
+        """Пользователь с правом создания объявлений и временный каталог для фото."""
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        role = Role.objects.create(name="Пользователь", can_create_advertisement=True)
+        self.owner = User.objects.create_user(username='uploader', email='uploader@test.com', password='password123', role=role)
+        self.species = Species.objects.create(name="Кошка")
+        self.status = AdStatus.objects.create(name="Потеряно")
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('advertisement-list')
+
+    def image(self, name, size):
+        """Возвращает загружаемый PNG заданного размера."""
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def payload(self, *photos):
+        return {
+            'title': "Пропала кошка", 'description': f"Описание {len(photos)}", 'status': self.status.id,
+            'animal_data.species': self.species.id, 'photos_upload': list(photos),
+        }
+
+    def stored_files(self):
+        return [path for path in Path(self.media_root).rglob('*') if path.is_file()]
+
+    def test_create_advertisement_with_photos(self):
+        """
+        41. Тест: Фото нового объявления вставляются одним INSERT, обложка и размеры заполняются.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.url, self.payload(self.image('a.png', (40, 30)), self.image('b.png', (20, 10)), self.image('c.png', (5, 5))),
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        ad = Advertisement.objects.get(pk=response.data['id'])
+        photos = list(ad.photos.order_by('pk'))
+        self.assertEqual([(photo.width, photo.height) for photo in photos], [(40, 30), (20, 10), (5, 5)])
+        self.assertEqual(ad.cover_photo, photos[0])
+        self.assertEqual(len([sql for sql in app_queries(ctx) if sql.startswith('INSERT INTO "siteapp_adphoto"')]), 1)
+        self.assertEqual(len(self.stored_files()), 3)
+
+    def test_failed_ingestion_rolls_back_and_removes_files(self):
+        """
+        42. Тест: Ошибка записи фото или транзакции откатывает объявление и удаляет записанные файлы.
+        """
+        with mock.patch.object(AdPhoto.objects, 'bulk_create', side_effect=DatabaseError("insert failed")):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.url, self.payload(self.image('a.png', (4, 4)), self.image('b.png', (4, 4))), format='multipart')
+        self.assertFalse(Advertisement.objects.exists())
+        self.assertFalse(Animal.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+        store_photo = uploads._store_photo
+
+        def failing_store(upload):
+            if upload.name == 'bad.png':
+                raise OSError("disk full")
+            return store_photo(upload)
+
+        with mock.patch.object(uploads, '_store_photo', failing_store):
+            with self.assertRaises(OSError):
+                self.client.post(
+                    self.url, self.payload(self.image('a.png', (4, 4)), self.image('bad.png', (4, 4)), self.image('c.png', (4, 4))),
+                    format='multipart',
+                )
+        self.assertFalse(Advertisement.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_benchmark_photo_uploads_command(self):
+        """
+        43. Тест: Команда benchmark_photo_uploads сравнивает последовательную и параллельную запись.
+        """
+        Advertisement.objects.create(
+            user=self.owner, animal=Animal.objects.create(species=self.species), status=self.status, description="Описание",
+        )
+        out = StringIO()
+        call_command('benchmark_photo_uploads', '--photos', '3', '--size', '64x48', '--repeat', '1', '--workers', '2', stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 photos of 64x48', output)
+        self.assertIn('2 thread(s)', output)
+        self.assertFalse(AdPhoto.objects.exists())
+
+
+class AdvertisementDuplicateTests(APITestCase):
+
+    DESCRIPTION = (
+        "Пропала рыжая кошка в районе центрального парка, на шее синий ошейник с колокольчиком, "
+        "очень пугливая, просим сообщить любую информацию, вознаграждение гарантировано"
+    )
+
+    def setUp(self):
+        """Автор объявлений, другой пользователь и модератор."""
+        cache.clear()
+        role = Role.objects.create(name="Пользователь", can_create_advertisement=True)
+        moderator_role = Role.objects.create(name="Модератор", can_manage_any_advertisement=True)
+        self.owner = User.objects.create_user(username='author', email='author@test.com', password='password123', role=role)
+        self.other = User.objects.create_user(username='other', email='other@test.com', password='password123', role=role)
+        self.moderator = User.objects.create_user(username='moderator', email='moderator@test.com', password='password123', role=moderator_role)
+        self.species = Species.objects.create(name="Кошка")
+        self.status = AdStatus.objects.create(name="Потеряно")
+
+    def create_ad(self, user, description):
+        return Advertisement.objects.create(
+            user=user, animal=Animal.objects.create(species=self.species), status=self.status, description=description,
+        )
+
+    def test_exact_duplicate_is_found_by_content_hash(self):
+        """
+        44. Тест: Повтор описания с другим регистром, пробелами и пунктуацией отклоняется поиском по хэшу.
+        """
+        self.create_ad(self.owner, self.DESCRIPTION)
+        self.client.force_authenticate(self.owner)
+        payload = {
+            'title': "Пропала кошка", 'status': self.status.id, 'animal_data': {'species': self.species.id},
+            'description': "  " + self.DESCRIPTION.upper().replace(", ", " - ") + "!!",
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('advertisement-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, response.data)
+        duplicate_check = [sql for sql in app_queries(ctx) if '"content_hash" =' in sql]
+        self.assertEqual(len(duplicate_check), 1)
+        self.assertNotIn('LIKE', duplicate_check[0])
+
+        self.client.force_authenticate(self.other)
+        response = self.client.post(reverse('advertisement-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+    def test_near_duplicates_across_users_for_moderators(self):
+        """
+        45. Тест: Почти-дубликаты других пользователей находятся по полосам SimHash и доступны только модераторам.
+        """
+        ad = self.create_ad(self.owner, self.DESCRIPTION)
+        edited = self.create_ad(self.other, self.DESCRIPTION.replace(", очень пугливая", ""))
+        appended = self.create_ad(self.other, self.DESCRIPTION + " срочно")
+        self.create_ad(self.other, "Найдена собака породы такса возле вокзала, серая, без ошейника, ждёт хозяев")
+        self.assertEqual(ad.simhash_bands.count(), fingerprints.SIMHASH_BANDS)
+
+        url = reverse('advertisement-duplicates', args=[ad.pk])
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.moderator)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({item['id'] for item in response.data}, {edited.pk, appended.pk})
+        distances = [item['hamming_distance'] for item in response.data]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(all(distance <= fingerprints.NEAR_DUPLICATE_DISTANCE for distance in distances))
+
+        # После изменения описания полосы перезаписываются.
+        appended.description = "Отдам котят в добрые руки, приучены к лотку"
+        appended.save()
+        response = self.client.get(url)
+        self.assertEqual([item['id'] for item in response.data], [edited.pk])
+
+    def test_reworded_repost_found(self):
+        """
+        66. Тест: Переписанное другими словами короткое объявление находится как почти-дубликат.
+        """
+        ad = self.create_ad(self.owner, "Найден серый кот без ошейника возле станции метро Сокол, ждёт хозяина в тепле и сытости")
+        repost = self.create_ad(self.other, "Найден серый кот без ошейника рядом со станцией метро Сокол, ждёт хозяина в тепле и сытости")
+        self.create_ad(self.other, "Найден рыжий пёс у магазина на Тверской, без ошейника, ждёт хозяина")
+
+        matches = fingerprints.near_duplicates(ad.simhash, exclude_pk=ad.pk)
+        self.assertEqual([pk for pk, _ in matches], [repost.pk])
+        self.assertGreater(matches[0][1], 5)
+
+
+class PhotoUploadSessionTests(APITestCase):
+
+    def setUp(self):
+        """Пользователь с правом создания объявлений и временный каталог для фото."""
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root, PHOTO_UPLOAD_CHUNK_SIZE=1024)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        role = Role.objects.create(name="Пользователь", can_create_advertisement=True)
+        self.owner = User.objects.create_user(username='chunked', email='chunked@test.com', password='password123', role=role)
+        self.other = User.objects.create_user(username='stranger', email='stranger@test.com', password='password123', role=role)
+        self.species = Species.objects.create(name="Кошка")
+        self.status = AdStatus.objects.create(name="Потеряно")
+        self.client.force_authenticate(self.owner)
+
+        buffer = BytesIO()
+        Image.effect_noise((60, 40), 64).convert('RGB').save(buffer, 'PNG')
+        self.content = buffer.getvalue()
+
+    def put_chunk(self, session_id, offset, data):
+        return self.client.put(
+            reverse('photo-upload-detail', args=[session_id]), data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self, content):
+        """Загружает файл частями по 1 КБ и завершает сессию."""
+        response = self.client.post(reverse('photo-upload-list'), {'filename': 'photo.png', 'size': len(content)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        session_id = response.data['id']
+        for offset in range(0, len(content), 1024):
+            self.assertEqual(self.put_chunk(session_id, offset, content[offset:offset + 1024]).status_code, status.HTTP_200_OK)
+        return session_id, self.client.post(reverse('photo-upload-complete', args=[session_id]))
+
+    def test_resumable_chunked_upload_attaches_to_advertisement(self):
+        """
+        46. Тест: Фото загружается частями с возобновлением и прикрепляется к объявлению по идентификатору сессии.
+        """
+        self.assertGreater(len(self.content), 2048)
+        response = self.client.post(reverse('photo-upload-list'), {'filename': 'C:\\photos\\cat.png', 'size': len(self.content)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['filename'], 'cat.png')
+        session_id = response.data['id']
+
+        self.assertEqual(self.put_chunk(session_id, 0, self.content[:1024]).status_code, status.HTTP_200_OK)
+        # Часть с неверным смещением отклоняется, клиент узнаёт, откуда продолжить.
+        conflict = self.put_chunk(session_id, 2048, self.content[2048:3072])
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(conflict.data['offset'], 1024)
+        self.assertEqual(self.client.get(reverse('photo-upload-detail', args=[session_id])).data['offset'], 1024)
+        self.assertEqual(self.put_chunk(session_id, 1024, b'x' * 2048).status_code, status.HTTP_400_BAD_REQUEST)
+        # Незавершённую загрузку нельзя ни завершить, ни прикрепить.
+        self.assertEqual(self.client.post(reverse('photo-upload-complete', args=[session_id])).status_code, status.HTTP_400_BAD_REQUEST)
+
+        for offset in range(1024, len(self.content), 1024):
+            response = self.put_chunk(session_id, offset, self.content[offset:offset + 1024])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['offset'], len(self.content))
+        response = self.client.post(reverse('photo-upload-complete', args=[session_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual((response.data['completed'], response.data['width'], response.data['height']), (True, 60, 40))
+
+        payload = {
+            'title': "Пропала кошка", 'description': "Загрузка по частям", 'status': self.status.id,
+            'animal_data': {'species': self.species.id}, 'photo_uploads': [session_id],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('advertisement-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        photo = AdPhoto.objects.get(advertisement_id=response.data['id'])
+        self.assertEqual((photo.width, photo.height), (60, 40))
+        with photo.image.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertFalse(PhotoUploadSession.objects.exists())
+        self.assertFalse(any(Path(self.media_root, 'upload-sessions').iterdir()))
+
+    def test_upload_sessions_are_private_and_validated(self):
+        """
+        47. Тест: Чужие и не-изображения не прикрепляются, брошенные сессии удаляются.
+        """
+        session_id, response = self.upload(self.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.put_chunk(session_id, 0, b'x').status_code, status.HTTP_404_NOT_FOUND)
+        payload = {
+            'title': "Чужое фото", 'description': "Чужое фото", 'status': self.status.id,
+            'animal_data': {'species': self.species.id}, 'photo_uploads': [session_id],
+        }
+        response = self.client.post(reverse('advertisement-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('photo_uploads', response.data)
+
+        _, response = self.upload(b'not an image' * 200)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('photo-upload-list'), {'filename': 'notes.txt', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        PhotoUploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(uploads.delete_stale_sessions(), 2)
+        self.assertFalse(PhotoUploadSession.objects.exists())
+        self.assertFalse(any(Path(self.media_root, 'upload-sessions').iterdir()))
+
+
+class SimilarPhotoTests(APITestCase):
+
+    def setUp(self):
+        """Найденная кошка и объявления с похожими и непохожими фотографиями."""
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='finder', email='finder@test.com', password='password123')
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.found = AdStatus.objects.create(name="Найдено")
+        self.lost = AdStatus.objects.create(name="Потеряно")
+        self.picture = Image.effect_noise((240, 180), 80).convert('RGB').filter(ImageFilter.GaussianBlur(6))
+
+        self.found_ad = self.create_ad(self.cat, self.found, self.picture)
+        self.lost_ad = self.create_ad(self.cat, self.lost, self.picture.resize((160, 120)), quality=40)
+        self.other_lost_ad = self.create_ad(self.cat, self.lost, Image.effect_noise((240, 180), 80).convert('RGB').filter(ImageFilter.GaussianBlur(6)))
+        self.lost_dog_ad = self.create_ad(self.dog, self.lost, self.picture)
+        self.found_again_ad = self.create_ad(self.cat, self.found, self.picture)
+        self.old_lost_ad = self.create_ad(self.cat, self.lost, self.picture)
+        Advertisement.objects.filter(pk=self.old_lost_ad.pk).update(publication_date=timezone.now() - timedelta(days=200))
+
+    def jpeg(self, name, picture, quality=90):
+        buffer = BytesIO()
+        picture.save(buffer, 'JPEG', quality=quality)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def create_ad(self, species, ad_status, picture, quality=90):
+        ad = Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=species), status=ad_status, description=f"Объявление {ad_status.name}",
+        )
+        photo = AdPhoto.objects.create(advertisement=ad, image=self.jpeg('photo.jpg', picture, quality))
+        self.assertEqual(images.process('siteapp.AdPhoto', photo.pk), images.UPDATED)
+        return ad
+
+    def test_similar_ads_for_advertisement(self):
+        """
+        48. Тест: Для найденного животного находятся потерянные того же вида с похожими фото через индекс полос.
+        """
+        photo = AdPhoto.objects.get(advertisement=self.lost_ad)
+        self.assertIsNotNone(photo.phash)
+        self.assertEqual(photo.hash_bands.count(), similarity.PHASH_BANDS)
+
+        url = reverse('advertisement-similar', args=[self.found_ad.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['advertisements']], [self.lost_ad.pk])
+        self.assertEqual(response.data['photos'][0]['id'], photo.pk)
+        self.assertLessEqual(response.data['photos'][0]['hamming_distance'], similarity.SIMILAR_PHOTO_DISTANCE)
+        self.assertTrue(any('siteapp_adphotohashband' in sql for sql in app_queries(ctx)))
+
+        response = self.client.get(url, {'species': self.dog.pk})
+        self.assertEqual([item['id'] for item in response.data['advertisements']], [self.lost_dog_ad.pk])
+        response = self.client.get(url, {'days': 365})
+        self.assertEqual({item['id'] for item in response.data['advertisements']}, {self.lost_ad.pk, self.old_lost_ad.pk})
+        self.assertEqual(self.client.get(url, {'k': 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_ads_for_uploaded_image_and_index_build(self):
+        """
+        49. Тест: Поиск по загруженному фото и построение индекса командой build_photo_hash_index.
+        """
+        url = reverse('advertisement-similar-to-image')
+        payload = {'image': self.jpeg('query.jpg', self.picture.resize((120, 90)), 50), 'species': self.cat.pk, 'ad_status': "Потеряно"}
+        self.assertEqual(self.client.post(url, payload, format='multipart').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.user)
+        payload['image'].seek(0)
+        response = self.client.post(url, payload, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([item['id'] for item in response.data['advertisements']], [self.lost_ad.pk])
+        response = self.client.post(url, {'image': self.jpeg('query.jpg', self.picture)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('species', response.data)
+
+        AdPhoto.objects.update(phash=None)
+        similarity.index_photos({pk: None for pk in AdPhoto.objects.values_list('pk', flat=True)})
+        out = StringIO()
+        call_command('build_photo_hash_index', '--workers', '1', stdout=out)
+        self.assertIn('6 photos hashed', out.getvalue())
+        response = self.client.get(reverse('advertisement-similar', args=[self.found_ad.pk]))
+        self.assertEqual([item['id'] for item in response.data['advertisements']], [self.lost_ad.pk])
+
+    def test_band_candidates_capped(self):
+        """
+        67. Тест: Число кандидатов из индекса полос ограничено и не растёт с количеством фотографий.
+        """
+        value = AdPhoto.objects.get(advertisement=self.found_ad).phash
+        all_ids = set(similarity.candidate_photo_ids([value]).values_list('photo_id', flat=True))
+        self.assertEqual(len(all_ids), 5)
+        with mock.patch.object(similarity, 'MAX_BAND_CANDIDATES', 1):
+            capped = list(similarity.candidate_photo_ids([value]).values_list('photo_id', flat=True))
+        self.assertLessEqual(len(capped), similarity.PHASH_BANDS)
+        self.assertEqual(max(capped), max(all_ids))
+
+
+class AdvertisementMatchingTests(APITestCase):
+
+    def setUp(self):
+        """Потерянная кошка и найденные животные, часть которых отсекается блокировкой."""
+        cache.clear()
+        self.user = User.objects.create_user(username='matcher', email='matcher@test.com', password='password123')
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.ginger = AnimalColor.objects.create(name="Рыжий")
+        self.black = AnimalColor.objects.create(name="Чёрный")
+        self.lost_status = AdStatus.objects.create(name="Потеряно")
+        self.found_status = AdStatus.objects.create(name="Найдено")
+
+        self.lost = self.create_ad(self.lost_status, self.cat, 55.7558, 37.6173, color=self.ginger, gender='M')
+        self.close = self.create_ad(self.found_status, self.cat, 55.7600, 37.6200, color=self.ginger, gender='M')
+        self.unknown = self.create_ad(self.found_status, self.cat, 55.8000, 37.7000, gender='U')
+        self.far = self.create_ad(self.found_status, self.cat, 59.9386, 30.3141, color=self.ginger)
+        self.other_color = self.create_ad(self.found_status, self.cat, 55.7560, 37.6180, color=self.black)
+        self.dog_ad = self.create_ad(self.found_status, self.dog, 55.7560, 37.6180)
+        self.also_lost = self.create_ad(self.lost_status, self.cat, 55.7560, 37.6180, color=self.ginger)
+        self.old = self.create_ad(self.found_status, self.cat, 55.7560, 37.6180, color=self.ginger)
+        Advertisement.objects.filter(pk=self.old.pk).update(publication_date=timezone.now() - timedelta(days=120))
+
+    def create_ad(self, ad_status, species, latitude, longitude, **animal):
+        return Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=species, **animal), status=ad_status,
+            description=f"{ad_status.name} {species.name}", latitude=latitude, longitude=longitude,
+        )
+
+    def match_ids(self, ad):
+        return list(ad.matches.values_list('matched_id', flat=True))
+
+    def test_blocking_scoring_and_incremental_update(self):
+        """
+        50. Тест: Блокировка отбирает только совместимых кандидатов, пары хранятся с обеих сторон и обновляются при изменении.
+        """
+        stats = matching.update_matches(self.lost.pk)
+        self.assertEqual(stats.candidates, 2)
+        self.assertEqual(stats.scored, 2)
+        self.assertEqual(self.match_ids(self.lost), [self.close.pk, self.unknown.pk])
+        self.assertEqual(self.match_ids(self.close), [self.lost.pk])
+        self.assertEqual(self.match_ids(self.unknown), [self.lost.pk])
+
+        response = self.client.get(reverse('advertisement-detail', args=[self.lost.pk]))
+        self.assertEqual([item['id'] for item in response.data['matches']], [self.close.pk, self.unknown.pk])
+        self.assertEqual(response.data['matches'][0]['status'], "Найдено")
+        self.assertGreater(response.data['matches'][0]['score'], response.data['matches'][1]['score'])
+
+        with mock.patch.object(tasks.update_advertisement_matches, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                animal = self.close.animal
+                animal.color = self.black
+                animal.save()
+        delay.assert_called_once_with(self.close.pk)
+
+        stats = matching.update_matches(self.close.pk)
+        self.assertEqual(stats.candidates, 0)
+        self.assertEqual(self.match_ids(self.close), [])
+        self.assertEqual(self.match_ids(self.lost), [self.unknown.pk])
+
+    def test_match_command_reports_statistics(self):
+        """
+        51. Тест: Команда match_advertisements пересчитывает все пары и выводит статистику прогона.
+        """
+        etag = self.client.get(reverse('advertisement-detail', args=[self.lost.pk]))['ETag']
+        out = StringIO()
+        call_command('match_advertisements', stdout=out)
+        output = out.getvalue()
+        self.assertIn('8 ads', output)
+        self.assertIn('candidates examined', output)
+        self.assertIn('pairs scored', output)
+        self.assertEqual(set(self.match_ids(self.lost)), {self.close.pk, self.unknown.pk})
+        self.assertEqual(self.match_ids(self.old), [])
+        self.assertNotEqual(self.client.get(reverse('advertisement-detail', args=[self.lost.pk]))['ETag'], etag)
+
+    def test_partner_change_invalidates_matches(self):
+        """
+        68. Тест: Изменение или удаление подходящего объявления меняет ETag деталей объявлений, в парах которых оно выводится.
+        """
+        matching.update_matches(self.lost.pk)
+        url = reverse('advertisement-detail', args=[self.lost.pk])
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.close.title = "Найден рыжий кот"
+            self.close.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['matches'][0]['title'], "Найден рыжий кот")
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.close.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['matches']], [self.unknown.pk])
+
+
+class LookupCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.active_status = AdStatus.objects.create(name="Активно")
+        self.moderation_status = AdStatus.objects.create(name="Требует модерации")
+        self.cat = Species.objects.create(name="Кошка")
+        self.region = Region.objects.create(name="Москва")
+        self.color = AnimalColor.objects.create(name="Рыжий")
+
+    def test_lookups_served_from_process_memory(self):
+        """
+        52. Тест: Повторные обращения к справочникам и списки фильтров не выполняют запросов к справочным таблицам.
+        """
+        self.assertEqual(lookups.get_by_name(AdStatus, "Активно"), self.active_status)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(lookups.id_for(AdStatus, "Требует модерации"), self.moderation_status.pk)
+            self.assertEqual(lookups.get(AdStatus, str(self.active_status.pk)).name, "Активно")
+            self.assertIsNone(lookups.get_by_name(AdStatus, "Нет такого"))
+        self.assertEqual(app_queries(ctx), [])
+
+        self.client.get(reverse('filter_options'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('filter_options'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data['regions']], ["Москва"])
+        self.assertEqual([item['name'] for item in response.data['colors']], ["Рыжий"])
+        lookup_tables = [model._meta.db_table for model in (AdStatus, AnimalColor, Region, Species)]
+        self.assertFalse([sql for sql in app_queries(ctx) if any(f'FROM "{table}"' in sql for table in lookup_tables)])
+
+        AdStatus.objects.filter(name="Активно").delete()
+        self.client.get(reverse('homepage_data_api'))
+        self.assertFalse(AdStatus.objects.filter(name="Активно").exists())
+
+    def test_edit_invalidates_all_processes(self):
+        """
+        53. Тест: Изменение строки справочника сбрасывает кэш текущего процесса и версию для остальных процессов.
+        """
+        self.assertEqual(lookups.get_by_name(Species, "Кошка"), self.cat)
+        version = lookups.current_version()
+        # Таблица, прочитанная другим процессом до изменения.
+        stale_tables = dict(lookups._tables)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cat.name = "Кот"
+            self.cat.save()
+        self.assertNotEqual(lookups.current_version(), version)
+        self.assertEqual(lookups.get_by_name(Species, "Кот"), self.cat)
+
+        lookups._tables.update(stale_tables)
+        self.assertIsNone(lookups.get_by_name(Species, "Кошка"))
+        self.assertEqual(lookups.get(Species, self.cat.pk).name, "Кот")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.region.delete()
+        self.assertEqual(lookups.all_rows(Region), [])
+
+    def test_version_read_once_per_request(self):
+        """
+        74. Тест: Внутри запроса версия справочников читается из общего кэша не больше одного раза.
+        """
+        self.client.get(reverse('homepage_data_api'))
+        with mock.patch.object(lookups.cache, 'get', wraps=lookups.cache.get) as get:
+            response = self.client.get(reverse('advertisement-list'), {'ad_status': self.active_status.pk})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.client.get(reverse('homepage_data_api'))
+            self.client.get(reverse('filter_options'))
+        version_reads = [call for call in get.call_args_list if call.args and call.args[0] == lookups.VERSION_KEY]
+        self.assertLessEqual(len(version_reads), 3)
+
+        with mock.patch.object(lookups.cache, 'get', wraps=lookups.cache.get) as get:
+            lookups.get_by_name(AdStatus, "Активно")
+            lookups.get_by_name(AdStatus, "Активно")
+        self.assertEqual([call.args[0] for call in get.call_args_list].count(lookups.VERSION_KEY), 2)
+
+
+class HomePageSnapshotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.active_status = AdStatus.objects.create(name="Активно")
+        self.cat = Species.objects.create(name="Кошка")
+        self.region = Region.objects.create(name="Москва")
+        self.user = User.objects.create_user(username='owner', email='owner@test.com', password='password123', region=self.region)
+        self.ad = self.create_ad("Рыжий кот")
+        self.url = reverse('homepage_data_api')
+
+    def create_ad(self, title):
+        return Advertisement.objects.create(
+            user=self.user, animal=Animal.objects.create(species=self.cat), status=self.active_status,
+            title=title, description=title,
+        )
+
+    def test_snapshot_served_without_queries(self):
+        """
+        54. Тест: Главная страница отдаётся из снимка без запросов, устаревший снимок пересобирает один запрос.
+        """
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['Content-Type'], 'application/json')
+        self.assertEqual([ad['title'] for ad in first.json()['recent_ads']], ["Рыжий кот"])
+        self.assertEqual(first.json()['top_regions'][0]['ad_count'], 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(self.url)
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(second.content, first.content)
+
+        browsable = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertContains(browsable, "Рыжий кот")
+
+        self.create_ad("Серый кот")
+        homepage.expire()
+        # Пока другой запрос пересобирает снимок, отдаётся прежний.
+        cache.add(homepage._lock_key('http://testserver/'), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            stale = self.client.get(self.url)
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(stale.content, first.content)
+        cache.delete(homepage._lock_key('http://testserver/'))
+        fresh = self.client.get(self.url)
+        self.assertEqual(fresh.json()['top_regions'][0]['ad_count'], 2)
+
+    def test_writes_schedule_one_debounced_rebuild(self):
+        """
+        55. Тест: Изменения данных ставят одну отложенную пересборку снимка, которую выполняет задача Celery.
+        """
+        self.client.get(self.url)
+        with mock.patch.object(tasks.refresh_home_page_snapshot, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_ad("Серый кот")
+                self.create_ad("Чёрный кот")
+        apply_async.assert_called_once_with(countdown=settings.HOME_PAGE_SNAPSHOT_DEBOUNCE)
+        self.assertEqual(len(self.client.get(self.url).json()['recent_ads']), 1)
+
+        self.assertEqual(tasks.refresh_home_page_snapshot(), "Rebuilt 1 home page snapshots.")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(
+            [ad['title'] for ad in response.json()['recent_ads']], ["Чёрный кот", "Серый кот", "Рыжий кот"]
+        )
+
+
+class RegionActivityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.active_status = AdStatus.objects.create(name="Активно")
+        self.found_status = AdStatus.objects.create(name="Найдено")
+        self.archive_status = AdStatus.objects.create(name="В архиве")
+        self.cat = Species.objects.create(name="Кошка")
+        self.moscow = Region.objects.create(name="Москва")
+        self.kazan = Region.objects.create(name="Казань")
+        self.muscovite = User.objects.create_user(username='moscow', email='moscow@test.com', password='password123', region=self.moscow)
+        self.kazan_user = User.objects.create_user(username='kazan', email='kazan@test.com', password='password123', region=self.kazan)
+        self.homeless = User.objects.create_user(username='nowhere', email='nowhere@test.com', password='password123')
+
+    def create_ad(self, user, ad_status):
+        return Advertisement.objects.create(
+            user=user, animal=Animal.objects.create(species=self.cat), status=ad_status, description="Кошка",
+        )
+
+    def top(self, ad_status=None):
+        return [(row['region__name'], row['ad_count']) for row in region_activity.top_regions((ad_status or self.active_status).pk)]
+
+    def test_counters_follow_ad_and_user_changes(self):
+        """
+        56. Тест: Счётчики регионов обновляются при создании, смене статуса, удалении объявлений и смене региона автора.
+        """
+        first = self.create_ad(self.muscovite, self.active_status)
+        self.create_ad(self.muscovite, self.active_status)
+        self.create_ad(self.kazan_user, self.active_status)
+        self.create_ad(self.homeless, self.active_status)
+        self.assertEqual(self.top(), [("Москва", 2), ("Казань", 1)])
+
+        first.status = self.found_status
+        first.save()
+        self.assertEqual(self.top(), [("Москва", 1), ("Казань", 1)])
+        self.assertEqual(self.top(self.found_status), [("Москва", 1)])
+
+        self.kazan_user.region = self.moscow
+        self.kazan_user.save()
+        self.assertEqual(self.top(), [("Москва", 2)])
+
+        first.delete()
+        self.assertEqual(self.top(self.found_status), [])
+
+        self.create_ad(self.kazan_user, self.found_status)
+        Advertisement.objects.filter(status=self.found_status).update(publication_date=timezone.now() - timedelta(days=40))
+        tasks.archive_old_advertisements()
+        self.assertEqual(self.top(self.archive_status), [("Москва", 1)])
+        self.assertEqual(region_activity.reconcile(dry_run=True), [])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.top()
+        self.assertEqual(len(app_queries(ctx)), 1)
+        self.assertNotIn('GROUP BY', app_queries(ctx)[0])
+
+    def test_counters_follow_user_without_region(self):
+        """
+        70. Тест: Счётчики обновляются, когда автор без региона получает регион, теряет его и когда объявление переходит к автору без региона.
+        """
+        ad = self.create_ad(self.homeless, self.active_status)
+        self.create_ad(self.homeless, self.found_status)
+        self.assertEqual(self.top(), [])
+
+        self.homeless.region = self.kazan
+        self.homeless.save()
+        self.assertEqual(self.top(), [("Казань", 1)])
+        self.assertEqual(self.top(self.found_status), [("Казань", 1)])
+
+        self.homeless.region = None
+        self.homeless.save()
+        self.assertEqual(self.top(), [])
+        self.assertEqual(self.top(self.found_status), [])
+
+        ad.user = self.muscovite
+        ad.save()
+        self.assertEqual(self.top(), [("Москва", 1)])
+        ad.user = self.homeless
+        ad.save()
+        self.assertEqual(self.top(), [])
+        self.assertEqual(region_activity.reconcile(dry_run=True), [])
+
+    def test_reconcile_command_fixes_drift(self):
+        """
+        57. Тест: Команда reconcile_region_activity находит и исправляет расхождения счётчиков.
+        """
+        self.create_ad(self.muscovite, self.active_status)
+        self.create_ad(self.kazan_user, self.active_status)
+        RegionActivity.objects.filter(region=self.moscow).update(ad_count=5)
+        RegionActivity.objects.filter(region=self.kazan).delete()
+
+        out = StringIO()
+        call_command('reconcile_region_activity', '--dry-run', stdout=out)
+        self.assertIn('2 region activity counters drifted.', out.getvalue())
+        self.assertEqual(self.top(), [("Москва", 5)])
+
+        out = StringIO()
+        call_command('reconcile_region_activity', stdout=out)
+        self.assertIn(f'Region ID {self.moscow.pk}, status ID {self.active_status.pk}: 5 -> 1', out.getvalue())
+        self.assertIn('Counters fixed.', out.getvalue())
+        self.assertEqual(self.top(), [("Москва", 1), ("Казань", 1)])
+
+
+class FilterOptionsBundleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.siamese = Breed.objects.create(name="Сиамская", species=self.cat)
+        self.husky = Breed.objects.create(name="Хаски", species=self.dog)
+        Region.objects.create(name="Москва")
+        AdStatus.objects.create(name="Активно")
+
+    def current_version(self):
+        return self.client.get(reverse('filter_options_version')).data['version']
+
+    def test_versioned_bundle_is_immutable(self):
+        """
+        58. Тест: Набор фильтров отдаётся по URL с версией со строгим ETag и Cache-Control: immutable.
+        """
+        response = self.client.get(reverse('filter_options_version'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('no-cache', response['Cache-Control'])
+        version = response.data['version']
+        self.assertEqual(response.data['url'], f'http://testserver{reverse("filter_options_bundle", args=[version])}')
+
+        bundle = self.client.get(response.data['url'])
+        self.assertEqual(bundle.status_code, status.HTTP_200_OK)
+        self.assertEqual(bundle['ETag'], f'"{version}"')
+        self.assertIn('immutable', bundle['Cache-Control'])
+        self.assertIn('max-age=31536000', bundle['Cache-Control'])
+        data = bundle.json()
+        self.assertEqual(data['version'], version)
+        self.assertEqual(data['breeds_by_species'], {
+            str(self.cat.pk): [{'id': self.siamese.pk, 'name': "Сиамская"}],
+            str(self.dog.pk): [{'id': self.husky.pk, 'name': "Хаски"}],
+        })
+        self.assertNotIn('breeds', data)
+        self.assertEqual([item['name'] for item in data['species']], ["Кошка", "Собака"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            not_modified = self.client.get(response.data['url'], HTTP_IF_NONE_MATCH=f'"{version}"')
+            again = self.client.get(response.data['url'])
+        self.assertEqual(app_queries(ctx), [])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again.content, bundle.content)
+
+        stale = self.client.get(reverse('filter_options_bundle', args=['0' * 16]))
+        self.assertEqual(stale.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(stale['Location'], reverse('filter_options_bundle', args=[version]))
+
+        legacy = self.client.get(reverse('filter_options'))
+        self.assertEqual([breed['species_id'] for breed in legacy.data['breeds']], [self.cat.pk, self.dog.pk])
+        self.assertEqual(
+            self.client.get(reverse('filter_options'), HTTP_IF_NONE_MATCH=legacy['ETag']).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+    def test_version_changes_only_with_reference_tables(self):
+        """
+        59. Тест: Версия набора фильтров меняется при изменении справочников и не меняется при других изменениях.
+        """
+        version = self.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='someone', email='someone@test.com', password='password123')
+        self.assertEqual(self.current_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.husky.name = "Сибирский хаски"
+            self.husky.save()
+        new_version = self.current_version()
+        self.assertNotEqual(new_version, version)
+        data = self.client.get(reverse('filter_options_bundle', args=[new_version])).json()
+        self.assertEqual(data['breeds_by_species'][str(self.dog.pk)][0]['name'], "Сибирский хаски")
+
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cat = Species.objects.create(name="Кошка")
+        self.dog = Species.objects.create(name="Собака")
+        self.fold = Breed.objects.create(name="Шотландская вислоухая", species=self.cat)
+        Breed.objects.create(name="Шотландская прямоухая", species=self.cat)
+        self.siamese = Breed.objects.create(name="Сиамская", species=self.cat)
+        self.siberian = Breed.objects.create(name="Сибирская", species=self.cat)
+        self.husky = Breed.objects.create(name="Сибирский хаски", species=self.dog)
+        Region.objects.create(name="Москва")
+        Region.objects.create(name="Московская область")
+        Region.objects.create(name="Мурманская область")
+        AnimalColor.objects.create(name="Рыжий")
+        self.url = reverse('autocomplete')
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in response.data]
+
+    def test_prefix_and_typo_suggestions_without_queries(self):
+        """
+        60. Тест: Подсказки ищутся по префиксу названия и его слов, с учётом опечаток и без запросов к базе.
+        """
+        self.assertEqual(self.names(type='breed', q='Сиб'), ["Сибирская", "Сибирский хаски"])
+        self.assertEqual(self.names(type='breed', q='сиб', species=self.cat.pk), ["Сибирская"])
+        self.assertEqual(self.names(type='breed', q='вислоу'), ["Шотландская вислоухая"])
+        self.assertEqual(self.names(type='breed', q='шотландская', limit=1), ["Шотландская вислоухая"])
+        self.assertEqual(self.names(type='region', q='моск'), ["Москва", "Московская область"])
+        self.assertEqual(self.names(type='region', q='обл'), ["Московская область", "Мурманская область"])
+        self.assertEqual(self.names(type='breed', q='сиамкая'), ["Сиамская"])
+        self.assertEqual(self.names(type='color', q='рыжй'), ["Рыжий"])
+        self.assertEqual(self.names(type='color', q='зелёный'), [])
+
+        response = self.client.get(self.url, {'type': 'breed', 'q': 'хаски'})
+        self.assertEqual(response.data, [{'id': self.husky.pk, 'name': "Сибирский хаски", 'species_id': self.dog.pk}])
+        self.assertEqual(self.client.get(self.url, {'type': 'animal', 'q': 'Барсик'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'type': 'breed'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.names(type='breed', q='шот')
+            started = time.perf_counter()
+            for _ in range(200):
+                autocomplete.suggest('breed', 'сибир')
+            elapsed = (time.perf_counter() - started) / 200
+        self.assertEqual(app_queries(ctx), [])
+        self.assertLess(elapsed, 0.001)
+
+    def test_index_refreshed_on_change(self):
+        """
+        61. Тест: Индекс подсказок перестраивается при изменении справочников.
+        """
+        self.assertEqual(self.names(type='breed', q='мейн'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Breed.objects.create(name="Мейн-кун", species=self.cat)
+            self.siamese.delete()
+        self.assertEqual(self.names(type='breed', q='мейн'), ["Мейн-кун"])
+        self.assertEqual(self.names(type='breed', q='сиам'), [])
+
+
+@override_settings(WARMUP_ORIGIN='http://testserver', WARMUP_LIST_PAGES=2)
+class WarmupTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        active_status = AdStatus.objects.create(name="Активно")
+        cat = Species.objects.create(name="Кошка")
+        user = User.objects.create_user(username='owner', email='owner@test.com', password='password123', region=Region.objects.create(name="Москва"))
+        for title in ("Рыжий кот", "Серый кот"):
+            Advertisement.objects.create(
+                user=user, animal=Animal.objects.create(species=cat), status=active_status,
+                title=title, description=title,
+            )
+        self.health_url = reverse('health_check')
+
+    def test_warm_caches_command(self):
+        """
+        62. Тест: Команда warm_caches прогревает главную страницу, фасеты и список объявлений и выводит время каждого шага.
+        """
+        out = StringIO()
+        call_command('warm_caches', stdout=out)
+        output = out.getvalue()
+        for name in ("imports", "lookups", "filter options", "home page", "facets", "ad list page 1", "ad list page 2"):
+            self.assertRegex(output, rf"  {name}: \d+\.\d ms\n")
+        self.assertNotIn("failed", output)
+        self.assertIn("Warmed 9 of 9 items", output)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('homepage_data_api')).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(reverse('advertisement-facets')).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(reverse('advertisement-list')).status_code, status.HTTP_200_OK)
+        self.assertEqual(app_queries(ctx), [])
+
+    def test_health_check_waits_for_warmup(self):
+        """
+        63. Тест: Проверка здоровья отвечает 503, пока процесс прогревается, и не зависит от содержимого общего кэша.
+        """
+        self.addCleanup(setattr, warmup, '_required', warmup._required)
+        self.addCleanup(setattr, warmup, '_ready', warmup._ready)
+        self.assertEqual(self.client.get(self.health_url).json(), {'status': 'ok'})
+
+        def check_warming():
+            response = self.client.get(self.health_url)
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response.json(), {'status': 'warming'})
+            return []
+
+        with mock.patch.object(warmup, 'run', side_effect=check_warming) as run:
+            warmup.start()
+        run.assert_called_once_with()
+        self.assertEqual(self.client.get(self.health_url).json(), {'status': 'ok'})
+
+        cache.clear()
+        self.assertEqual(self.client.get(self.health_url).json(), {'status': 'ok'})
+
+        with mock.patch.object(warmup, 'run', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                warmup.start()
+        self.assertEqual(self.client.get(self.health_url).json(), {'status': 'ok'})
+
+    def test_warmup_does_not_use_request_handler(self):
+        """
+        69. Тест: Прогрев вызывает представления напрямую, не отправляя сигналы запросов Django.
+        """
+        started = mock.Mock()
+        request_started.connect(started)
+        self.addCleanup(request_started.disconnect, started)
+        items = warmup.run(pages=1)
+        self.assertEqual([item.error for item in items], [None] * len(items))
+        started.assert_not_called()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('homepage_data_api')).status_code, status.HTTP_200_OK)
+        self.assertEqual(app_queries(ctx), [])
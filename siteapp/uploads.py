@@ -0,0 +1,332 @@
+# siteapp/uploads.py
+"""
+Загрузка фотографий объявлений.
+
+Файлы из `photos_upload` записываются в хранилище параллельно на
+ограниченном пуле потоков, до открытия транзакции, чтобы медленная запись
+не удерживала соединение с БД. Строки AdPhoto затем вставляются одним
+bulk_create в транзакции вместе с объявлением и животным (см.
+AdvertisementManageSerializer). Если запись файлов или транзакция
+завершились ошибкой, уже записанные файлы удаляются.
+
+bulk_create не вызывает сигналы AdPhoto, поэтому обложка, время изменения
+объявления, инвалидация кэша и построение версий изображений выполняются
+здесь явно (ср. siteapp.signals).
+
+Большие фотографии можно загрузить заранее по частям через сессии
+загрузки (PhotoUploadSession): каждая часть (PUT с заголовком
+Upload-Offset) потоком дописывается во временный файл сессии, поэтому
+медленная загрузка занимает воркер только на время одной части, а файл
+целиком в памяти не собирается. Завершённые сессии передаются в
+`photo_uploads` и копируются в хранилище так же, как файлы из
+`photos_upload`.
+"""
+
+import os
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.images import get_image_dimensions
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, signals, tasks
+from .models import AdPhoto, Advertisement, PhotoUploadSession
+
+StoredPhoto = typing.Tuple[str, typing.Optional[int], typing.Optional[int]]
+
+# Блок, которым тело части копируется во временный файл.
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class UploadOffsetConflict(ValueError):
+    """
+    Смещение части не совпадает с количеством уже принятых байтов.
+    """
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(f"Ожидалась часть со смещением {offset}.")
+        self.offset = offset
+
+
+def upload_workers() -> int:
+    """
+    Возвращает размер пула потоков для записи файлов.
+    """
+    return getattr(settings, "PHOTO_UPLOAD_WORKERS", 4)
+
+
+def max_photo_size() -> int:
+    """
+    Возвращает наибольший размер фотографии, загружаемой по частям, в байтах.
+    """
+    return getattr(settings, "PHOTO_UPLOAD_MAX_SIZE", 20 * 1024 * 1024)
+
+
+def max_chunk_size() -> int:
+    """
+    Возвращает наибольший размер одной части в байтах.
+    """
+    return getattr(settings, "PHOTO_UPLOAD_CHUNK_SIZE", 2 * 1024 * 1024)
+
+
+def session_path(session: PhotoUploadSession) -> str:
+    """
+    Возвращает путь к временному файлу сессии загрузки.
+    """
+    directory = getattr(settings, "PHOTO_UPLOAD_SESSION_DIR", None) or os.path.join(
+        settings.MEDIA_ROOT, "upload-sessions"
+    )
+    return os.path.join(directory, f"{session.pk.hex}.part")
+
+
+def write_chunk(
+    session: PhotoUploadSession, offset: int, stream: typing.BinaryIO, length: int
+) -> int:
+    """
+    Записывает часть файла во временный файл сессии.
+
+    Тело читается блоками по STREAM_BLOCK_SIZE и пишется по смещению, так
+    что повтор оборванной части перезаписывает её. Смещение сессии
+    сдвигается условным UPDATE, поэтому из одновременных запросов с одним
+    смещением принимается только один.
+
+    :param session: незавершённая сессия загрузки
+    :param offset: смещение части в файле
+    :param stream: поток тела запроса
+    :param length: длина части в байтах
+    :return: новое количество принятых байтов
+    :raises UploadOffsetConflict: если смещение не совпадает с принятым
+    :raises ValueError: если сессия завершена, часть слишком велика или
+        тело запроса короче заявленного
+    """
+    if session.is_complete:
+        raise ValueError("Загрузка уже завершена.")
+    if offset != session.offset:
+        raise UploadOffsetConflict(session.offset)
+    if length <= 0 or length > max_chunk_size():
+        raise ValueError(f"Размер части должен быть от 1 до {max_chunk_size()} байт.")
+    if offset + length > session.size:
+        raise ValueError("Часть выходит за объявленный размер файла.")
+
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    remaining = length
+    # O_CREAT без O_TRUNC: уже принятые части сохраняются.
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600), "wb") as target:
+        target.seek(offset)
+        while remaining:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            target.write(block)
+            remaining -= len(block)
+    if remaining:
+        raise ValueError("Тело запроса короче заголовка Content-Length.")
+
+    received = offset + length
+    if not PhotoUploadSession.objects.filter(
+        pk=session.pk, offset=offset, completed_at__isnull=True
+    ).update(offset=received, updated_at=timezone.now()):
+        session.refresh_from_db(fields=["offset"])
+        raise UploadOffsetConflict(session.offset)
+    session.offset = received
+    return received
+
+
+def complete_session(session: PhotoUploadSession) -> None:
+    """
+    Завершает загрузку: проверяет, что файл принят целиком и является
+    изображением, и сохраняет его размеры.
+
+    :raises ValueError: если файл принят не полностью или не читается как
+        изображение
+    """
+    if session.is_complete:
+        return
+    if session.offset != session.size:
+        raise ValueError(f"Принято {session.offset} из {session.size} байт.")
+    path = session_path(session)
+    with open(path, "r+b") as source:
+        # Хвост оборванной части за объявленным размером отбрасывается.
+        source.truncate(session.size)
+        width, height = get_image_dimensions(source)
+    if width is None or height is None:
+        raise ValueError("Файл не является изображением.")
+    session.width, session.height = width, height
+    session.completed_at = timezone.now()
+    session.save(update_fields=["width", "height", "completed_at", "updated_at"])
+
+
+def delete_session_files(sessions: typing.Iterable[PhotoUploadSession]) -> None:
+    """
+    Удаляет временные файлы сессий загрузки.
+    """
+    for session in sessions:
+        try:
+            os.remove(session_path(session))
+        except FileNotFoundError:
+            pass
+
+
+def delete_stale_sessions(max_age: typing.Optional[timedelta] = None) -> int:
+    """
+    Удаляет сессии, в которые давно не поступали части, вместе с их
+    временными файлами.
+
+    :param max_age: возраст последней части; по умолчанию
+        PHOTO_UPLOAD_SESSION_TTL часов
+    :return: количество удалённых сессий
+    """
+    if max_age is None:
+        max_age = timedelta(hours=getattr(settings, "PHOTO_UPLOAD_SESSION_TTL", 24))
+    stale = list(
+        PhotoUploadSession.objects.filter(updated_at__lt=timezone.now() - max_age)
+    )
+    PhotoUploadSession.objects.filter(pk__in=[session.pk for session in stale]).delete()
+    delete_session_files(stale)
+    return len(stale)
+
+
+def _store_photo(upload: UploadedFile) -> StoredPhoto:
+    """
+    Записывает файл в хранилище поля AdPhoto.image и читает его размеры.
+    """
+    field = AdPhoto._meta.get_field("image")
+    try:
+        width, height = get_image_dimensions(upload)
+    except (OSError, ValueError):
+        width, height = None, None
+    name = field.storage.save(
+        field.generate_filename(AdPhoto(), upload.name),
+        upload,
+        max_length=field.max_length,
+    )
+    return name, width, height
+
+
+def _store_session(session: PhotoUploadSession) -> StoredPhoto:
+    """
+    Копирует файл завершённой сессии загрузки в хранилище AdPhoto.image.
+    """
+    with open(session_path(session), "rb") as source:
+        name, _, _ = _store_photo(File(source, name=session.filename))
+    return name, session.width, session.height
+
+
+def delete_files(names: typing.Iterable[str]) -> None:
+    """
+    Удаляет записанные файлы фотографий.
+    """
+    storage = AdPhoto._meta.get_field("image").storage
+    for name in names:
+        storage.delete(name)
+
+
+class PhotoUpload:
+    """
+    Фотографии, загружаемые вместе с созданием или изменением объявления.
+
+    Использование:
+
+        with PhotoUpload(files) as upload, transaction.atomic():
+            ...
+            upload.create_photos(advertisement)
+
+    При входе в блок файлы записываются в хранилище; при исключении внутри
+    блока (в том числе при откате транзакции) они удаляются.
+
+    sessions - завершённые сессии загрузки по частям; их фотографии
+    добавляются после files, а сами сессии удаляются вместе с созданием
+    строк AdPhoto.
+    """
+
+    def __init__(
+        self,
+        files: typing.Sequence[UploadedFile],
+        workers: typing.Optional[int] = None,
+        sessions: typing.Sequence[PhotoUploadSession] = (),
+    ) -> None:
+        self.files = list(files)
+        self.sessions = list(sessions)
+        self.workers = workers or upload_workers()
+        self.stored: typing.List[StoredPhoto] = []
+
+    def __enter__(self) -> "PhotoUpload":
+        self.stored = self.store()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            delete_files(name for name, _, _ in self.stored)
+
+    def store(self) -> typing.List[StoredPhoto]:
+        """
+        Записывает файлы параллельно и возвращает их имена и размеры в
+        порядке загрузки.
+
+        Если запись хотя бы одного файла не удалась, остальные удаляются, а
+        исключение пробрасывается.
+        """
+        jobs = [partial(_store_photo, upload) for upload in self.files] + [
+            partial(_store_session, session) for session in self.sessions
+        ]
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(jobs)),
+            thread_name_prefix="photo-upload",
+        ) as executor:
+            futures = [executor.submit(job) for job in jobs]
+        stored = [future.result() for future in futures if not future.exception()]
+        errors = [future.exception() for future in futures if future.exception()]
+        if errors:
+            delete_files(name for name, _, _ in stored)
+            raise errors[0]
+        return stored
+
+    def create_photos(self, advertisement: Advertisement) -> typing.List[AdPhoto]:
+        """
+        Создаёт строки AdPhoto для записанных файлов одним bulk_create.
+
+        Вызывается в транзакции, в которой сохраняется объявление. Сессии
+        загрузки удаляются в ней же, а их временные файлы - после фиксации.
+        """
+        if not self.stored:
+            return []
+        if self.sessions:
+            PhotoUploadSession.objects.filter(
+                pk__in=[session.pk for session in self.sessions]
+            ).delete()
+            transaction.on_commit(partial(delete_session_files, self.sessions))
+        photos = AdPhoto.objects.bulk_create(
+            [
+                AdPhoto(
+                    advertisement=advertisement, image=name, width=width, height=height
+                )
+                for name, width, height in self.stored
+            ]
+        )
+        photos_added(advertisement, photos)
+        return photos
+
+
+def photos_added(advertisement: Advertisement, photos: typing.List[AdPhoto]) -> None:
+    """
+    Выполняет для созданных bulk_create фотографий то, что для одиночного
+    сохранения AdPhoto делают сигналы.
+    """
+    Advertisement.objects.filter(pk=advertisement.pk, cover_photo__isnull=True).update(
+        cover_photo=photos[0]
+    )
+    signals.touch_advertisements([advertisement.pk])
+    caching.invalidate_advertisements([advertisement.pk])
+    for photo in photos:
+        transaction.on_commit(
+            partial(tasks.enqueue_image_renditions, AdPhoto._meta.label, photo.pk)
+        )
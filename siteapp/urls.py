@@ -5,14 +5,18 @@ from .views_api import (
     HomePageDataAPIView,
     ArticleCategoryListAPIView,
     FilterOptionsAPIView,
-    AdResponseCreateAPIView,
+    FilterOptionsBundleAPIView,
+    FilterOptionsVersionAPIView,
+    AdResponseListCreateAPIView,
     AdResponseDetailAPIView,
     ArticleListCreateAPIView,
     ArticleRetrieveUpdateDestroyAPIView,
     ArticleCommentListCreateAPIView,
     ArticleCommentRetrieveUpdateDestroyAPIView,
     AdvertisementViewSet,
+    PhotoUploadSessionViewSet,
     BreedListAPIView,
+    AutocompleteAPIView,
     AdvertisementRatingViewSet,
     ProfileViewSet,
     RoleListAPIView,
@@ -26,6 +30,7 @@ router.register(
     AdvertisementRatingViewSet,
     basename="advertisement-rating",
 )
+router.register(r"photo-uploads", PhotoUploadSessionViewSet, basename="photo-upload")
 router.register(r"profiles", ProfileViewSet, basename="profile")
 router.register(r"admin/users", UserAdminViewSet, basename="admin-user")
 
@@ -54,9 +59,19 @@ urlpatterns = [
         name="article_comment_retrieve_update_destroy",
     ),
     path("filter-options/", FilterOptionsAPIView.as_view(), name="filter_options"),
+    path(
+        "filter-options/version/",
+        FilterOptionsVersionAPIView.as_view(),
+        name="filter_options_version",
+    ),
+    path(
+        "filter-options/<str:version>/",
+        FilterOptionsBundleAPIView.as_view(),
+        name="filter_options_bundle",
+    ),
     path(
         "advertisements/<int:ad_id>/responses/",
-        AdResponseCreateAPIView.as_view(),
+        AdResponseListCreateAPIView.as_view(),
         name="ad_response_create",
     ),
     path(
@@ -65,5 +80,6 @@ urlpatterns = [
         name="ad_response_detail",
     ),
     path("breeds/", BreedListAPIView.as_view(), name="breed_list"),
+    path("autocomplete/", AutocompleteAPIView.as_view(), name="autocomplete"),
     path("roles/", RoleListAPIView.as_view(), name="role_list"),
 ]
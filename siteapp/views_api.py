@@ -1,155 +1,201 @@
+import hashlib
 from typing import Dict, List, Type, Any, Optional
+from urllib.parse import urlencode
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, generics, filters, permissions, viewsets, parsers
-from rest_framework.pagination import PageNumberPagination
+from rest_framework import (
+    status,
+    generics,
+    filters,
+    mixins,
+    permissions,
+    viewsets,
+    parsers,
+)
+from rest_framework.pagination import (
+    BasePagination,
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.serializers import BaseSerializer, ModelSerializer, ValidationError
 from rest_framework.permissions import BasePermission
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Avg, QuerySet
+from PIL import Image
+from django_filters.utils import translate_validation
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q, QuerySet
 from django.db.models.base import ModelBase
 from rest_framework.parsers import BaseParser
 
 from .models import (
     Advertisement,
     Article,
-    AdStatus,
     ArticleCategory,
-    Region,
     Species,
-    AnimalColor,
     AdResponse,
     Comment,
     Breed,
-    Animal,
     AdvertisementRating,
     User,
     Role,
+    AdPhoto,
+    PhotoUploadSession,
 )
 from .serializers import (
-    HomePageAdSerializer,
-    HomePageArticleSerializer,
     ArticleListSerializer,
     ArticleCategorySerializer,
     ArticleDetailSerializer,
     AdvertisementListSerializer,
-    RegionSerializer,
-    SpeciesSerializer,
-    AdStatusSerializer,
-    AnimalColorSerializer,
     AdvertisementDetailSerializer,
     AdResponseSerializer,
     ArticleManageSerializer,
     CommentSerializer,
     AdvertisementManageSerializer,
     BreedSerializer,
-    RegionActivitySerializer,
     AdvertisementRatingSerializer,
     RoleSerializer,
     ProfileSerializer,
     ProfileUpdateSerializer,
     AdminProfileUpdateSerializer,
     UserAdminSerializer,
+    PhotoUploadSessionSerializer,
+    SimilarPhotoSearchSerializer,
+    AutocompleteQuerySerializer,
+    latest_responses_prefetch,
+    matches_prefetch,
 )
 
-from .filters import AdvertisementFilter, AGE_CHOICES
+from . import (
+    autocomplete,
+    caching,
+    filter_options,
+    fingerprints,
+    geo,
+    homepage,
+    similarity,
+    uploads,
+)
+from .fast_serializers import (
+    AdvertisementListFastSerializer,
+    ArticleListFastSerializer,
+    FastListSerializer,
+    fast_serialization_enabled,
+)
+from .filters import AdvertisementFilter
 from .permissions import (
     IsOwnerOrAdminOrModeratorForComment,
     CanManageArticles,
     CanManageAdvertisements,
+    IsAdvertisementModerator,
     IsOwnerOrAdminOrReadOnly,
     IsOwnerOrAdmin,
 )
 
 
-class HomePageDataAPIView(APIView):
+class FastListMixin:
     """
-    API View для получения данных, необходимых для главной страницы.
-    Возвращает:
-    - Последние активные объявления (например, 4)
-    - Последнюю "большую" статью
-    - Несколько последних "маленьких" статей (например, 3)
-    - 5 регионов с наибольшим количеством объявлений
+    Быстрый путь для list: строки `.values()` сериализуются без экземпляров
+    моделей (см. siteapp.fast_serializers).
+
+    Фильтры и пагинация применяются к ключевым столбцам без соединений,
+    затем одним запросом загружаются полные строки только для страницы.
+    Ответ совпадает с ответом сериализатора представления.
     """
 
-    def get(self, request, *args, **kwargs) -> Response:
-        recent_ads: QuerySet[Advertisement] = Advertisement.objects.none()
-        main_article: QuerySet[Article] = Article.objects.none()
-        side_articles: QuerySet[Article] = Article.objects.none()
-        top_regions: List[Dict[str, Any]] = []
+    fast_serializer_class: Type[FastListSerializer]
 
-        try:
-            active_status, _ = AdStatus.objects.get_or_create(name="Активно")
-            recent_ads_qs = Advertisement.objects.filter(status=active_status)
-            recent_ads = (
-                recent_ads_qs.select_related("animal__species", "user__region")
-                .prefetch_related("photos")
-                .order_by("-publication_date")[:4]
-            )
-        except Exception as e:
-            print(f"Error fetching recent ads: {e}")
+    def list(self, request, *args, **kwargs) -> Response:
+        if not fast_serialization_enabled():
+            return super().list(request, *args, **kwargs)
 
-        latest_articles = (
-            Article.objects.select_related("author")
-            .prefetch_related("categories")
-            .order_by("-publication_date")
-        )
+        serializer = self.fast_serializer_class(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        keys = serializer.key_queryset(queryset)
+        page = self.paginate_queryset(keys)
+        rows = serializer.rows_for_keys(queryset, keys if page is None else page)
+        data = serializer.serialize(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
-        main_article_qs = latest_articles[:1]
-        side_articles_qs = latest_articles[1:3]
 
-        serializer_context = {"request": request}
+class ConditionalRetrieveMixin:
+    """
+    Условный GET для retrieve: ответ 304 по ETag/Last-Modified.
+
+    Перед загрузкой объекта одним запросом по первичному ключу читается его
+    updated_at (см. siteapp.signals). ETag учитывает также эпоху изменений
+    справочников (см. siteapp.caching) и параметры запроса
+    (`fields`/`omit`). Если клиент уже получил эту версию, объект со связями
+    не загружается и не сериализуется.
+    """
 
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         try:
-            active_status = AdStatus.objects.get(name="Активно")
-            region_activity = (
-                Advertisement.objects.filter(
-                    status=active_status, user__region__isnull=False
+            updated_at = (
+                self.queryset.model._default_manager.filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
                 )
-                .values("user__region__id", "user__region__name")
-                .annotate(ad_count=Count("id", distinct=True))
-                .order_by("-ad_count")[:5]
+                .values_list("updated_at", flat=True)
+                .first()
             )
-            top_regions = [
-                {
-                    "region__id": r["user__region__id"],
-                    "region__name": r["user__region__name"],
-                    "ad_count": r["ad_count"],
-                }
-                for r in region_activity
-            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            # Некорректный ключ: 404 вернёт обычный retrieve().
+            updated_at = None
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self._detail_etag(request, self.kwargs[lookup_url_kwarg], updated_at)
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            # Клиент хранит ответ, но перепроверяет его при каждом запросе.
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def _detail_etag(self, request, lookup_value: Any, updated_at) -> str:
+        params = sorted(request.query_params.lists())
+        fingerprint = (
+            f"{self.queryset.model._meta.label}:{lookup_value}:"
+            f"{updated_at.isoformat()}:{caching.current_epoch()}:{params}"
+        )
+        return f'"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
 
-        except AdStatus.DoesNotExist:
-            print("WARNING: AdStatus 'Активно' not found for top regions widget.")
-        except Exception as e:
-            print(f"Error fetching top regions: {e}")
 
-        serializer_context = {"request": request}
+class HomePageDataAPIView(APIView):
+    """
+    API View для получения данных, необходимых для главной страницы.
+    Возвращает:
+    - Последние активные объявления (например, 4)
+    - Последнюю "большую" статью
+    - Несколько последних "маленьких" статей (например, 3)
+    - 5 регионов с наибольшим количеством объявлений
 
-        recent_ads_serializer = HomePageAdSerializer(
-            recent_ads, many=True, context=serializer_context
-        )
-        main_article_serializer = HomePageArticleSerializer(
-            main_article_qs, many=True, context=serializer_context
-        )
-        side_articles_serializer = HomePageArticleSerializer(
-            side_articles_qs, many=True, context=serializer_context
-        )
-        top_regions_serializer = RegionActivitySerializer(
-            top_regions, many=True, context=serializer_context
-        )
+    Ответ отдаётся из снимка в кэше (см. siteapp.homepage).
+    """
 
-        data = {
-            "recent_ads": recent_ads_serializer.data,
-            "main_article": (
-                main_article_serializer.data[0]
-                if main_article_serializer.data
-                else None
-            ),
-            "side_articles": side_articles_serializer.data,
-            "top_regions": top_regions_serializer.data,  # <-- Новые данные
-        }
-        return Response(data, status=status.HTTP_200_OK)
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        # Снимок хранится готовым JSON; для Browsable API ответ собирается
+        # заново.
+        if request.accepted_renderer.format != "json":
+            return Response(homepage.build_data(request), status=status.HTTP_200_OK)
+        return HttpResponse(homepage.snapshot(request), content_type="application/json")
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -213,37 +259,230 @@ class AdsPageNumberPagination(PageNumberPagination):
     max_page_size: int = 48
 
 
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по составному ключу (поле сортировки, id).
+
+    В отличие от стандартной CursorPagination позиция курсора хранит значения
+    всех полей сортировки последней записи страницы, поэтому следующая страница
+    выбирается условием `WHERE (поле, id) < (значение, id)` без OFFSET, а
+    COUNT(*) не выполняется вовсе. Стоимость страницы не зависит от её номера.
+
+    Параметры:
+        ordering (tuple): поля сортировки; последним должен идти уникальный id.
+    """
+
+    ordering: tuple = ("-id",)
+    page_size_query_param: str = "page_size"
+    position_separator: str = "|"
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        """
+        Возвращает фиксированную сортировку: курсор однозначен только для неё.
+        """
+        return tuple(self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None) -> Optional[list]:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = None
+        if self.cursor and self.cursor.position is not None:
+            position = self._decode_position(queryset, self.cursor.position)
+
+        order_by = (
+            [self._invert(field) for field in self.ordering]
+            if reverse
+            else list(self.ordering)
+        )
+        queryset = queryset.order_by(*order_by)
+        if position is not None:
+            queryset = queryset.filter(self._position_filter(order_by, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return self.page
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        position = self._encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        position = self._encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    @staticmethod
+    def _invert(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _position_filter(order_by: List[str], position: List[Any]) -> Q:
+        """
+        Строит условие "строго после позиции" для составного ключа сортировки.
+        """
+        condition = Q()
+        equal_prefix: Dict[str, Any] = {}
+        for field, value in zip(order_by, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal_prefix, **{f"{name}__{lookup}": value})
+            equal_prefix[name] = value
+        return condition
+
+    def _get_value(self, instance: Any, field_name: str) -> Any:
+        if isinstance(instance, dict):
+            return instance[field_name]
+        return getattr(instance, field_name)
+
+    def _encode_position(self, instance: Any) -> str:
+        values = []
+        for field in self.ordering:
+            value = self._get_value(instance, field.lstrip("-"))
+            values.append(
+                value.isoformat() if hasattr(value, "isoformat") else str(value)
+            )
+        return self.position_separator.join(values)
+
+    def _decode_position(self, queryset: QuerySet, raw_position: str) -> List[Any]:
+        """
+        Разбирает позицию курсора, приводя значения к типам полей модели.
+
+        :raises NotFound: если курсор повреждён.
+        """
+        raw_values = raw_position.split(self.position_separator)
+        if len(raw_values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        values = []
+        for field, raw in zip(self.ordering, raw_values):
+            name = field.lstrip("-")
+            try:
+                try:
+                    value = queryset.model._meta.get_field(name).to_python(raw)
+                except FieldDoesNotExist:
+                    value = float(raw)
+            except (DjangoValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+
+class AdsCursorPagination(KeysetCursorPagination):
+    """
+    Курсорная пагинация ленты объявлений (бесконечная прокрутка).
+
+    Сортировка по (-publication_date, -id), без подсчёта общего количества.
+    """
+
+    ordering: tuple = ("-publication_date", "-id")
+    page_size: int = 12
+    max_page_size: int = 48
+
+
+class AdsDistanceCursorPagination(AdsCursorPagination):
+    """
+    Курсорная пагинация результатов поиска рядом с точкой.
+
+    Сортировка по (distance_km, id); позиция курсора хранит расстояние
+    последней записи страницы.
+    """
+
+    ordering: tuple = ("distance_km", "id")
+
+
 class FilterOptionsAPIView(APIView):
     """
     Возвращает списки возможных значений для фильтров.
+
+    Прежний формат с плоским списком пород; новые клиенты используют набор
+    с версией (FilterOptionsBundleAPIView). Поддерживает If-None-Match.
+    """
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        bundle = filter_options.current()
+        etag = f'"{bundle.version}-flat"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(bundle.legacy_data, status=status.HTTP_200_OK)
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class FilterOptionsVersionAPIView(APIView):
+    """
+    Возвращает текущую версию набора значений фильтров и его URL.
     """
 
     def get(self, request, *args, **kwargs) -> Response:
-        gender_options: List[Dict[str, str]] = [
-            {"value": choice[0], "label": str(choice[1])}
-            for choice in Animal.GENDER_CHOICES
-        ]
+        version = filter_options.current().version
+        response = Response(
+            {
+                "version": version,
+                "url": request.build_absolute_uri(
+                    reverse("filter_options_bundle", args=[version])
+                ),
+            }
+        )
+        patch_cache_control(response, no_cache=True)
+        return response
 
-        data = {
-            "regions": RegionSerializer(Region.objects.all(), many=True).data,
-            "species": SpeciesSerializer(Species.objects.all(), many=True).data,
-            "ad_statuses": AdStatusSerializer(AdStatus.objects.all(), many=True).data,
-            "colors": AnimalColorSerializer(AnimalColor.objects.all(), many=True).data,
-            "genders": gender_options,
-            "age_categories": [
-                {"value": choice[0], "label": choice[1]} for choice in AGE_CHOICES
-            ],
-            "breeds": BreedSerializer(
-                Breed.objects.select_related("species").order_by("name"), many=True
-            ).data,
-        }
-        return Response(data, status=status.HTTP_200_OK)
+
+class FilterOptionsBundleAPIView(APIView):
+    """
+    Возвращает набор значений фильтров указанной версии.
+
+    Ответ для версии не меняется, поэтому кэшируется бессрочно со строгим
+    ETag. Запрос устаревшей версии перенаправляется на текущую.
+    """
+
+    def get(self, request, version: str, *args, **kwargs) -> HttpResponse:
+        bundle = filter_options.current()
+        if version != bundle.version:
+            response = HttpResponseRedirect(
+                reverse("filter_options_bundle", args=[bundle.version])
+            )
+            patch_cache_control(response, no_cache=True)
+            return response
+        etag = f'"{bundle.version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(bundle.content, content_type="application/json")
+        response["ETag"] = etag
+        patch_cache_control(
+            response, public=True, max_age=filter_options.MAX_AGE, immutable=True
+        )
+        return response
 
 
-class AdvertisementDetailAPIView(generics.RetrieveAPIView):
+class AdvertisementDetailAPIView(ConditionalRetrieveMixin, generics.RetrieveAPIView):
     """
     Возвращает подробную информацию об объявлении.
 
+    Поддерживает условные запросы (If-None-Match/If-Modified-Since).
+
     retrieve:
     Возвращает подробную информацию об объявлении.
     """
@@ -257,27 +496,56 @@ class AdvertisementDetailAPIView(generics.RetrieveAPIView):
             "user__role",
             "status",
         )
-        .prefetch_related("photos", "responses__user__role", "responses__user__region")
+        .prefetch_related("photos", latest_responses_prefetch(), matches_prefetch())
         .all()
     )
     serializer_class = AdvertisementDetailSerializer
     lookup_field: str = "id"
 
 
-class AdResponseCreateAPIView(generics.CreateAPIView):
+class AdResponsesCursorPagination(KeysetCursorPagination):
+    """
+    Курсорная пагинация откликов объявления: от новых к старым по
+    (-date_created, -id).
     """
-    Представление для создания откликов к объявлениям.
+
+    ordering: tuple = ("-date_created", "-id")
+    page_size: int = 20
+    max_page_size: int = 100
+
+
+class AdResponseListCreateAPIView(generics.ListCreateAPIView):
+    """
+    Представление для списка и создания откликов к объявлениям.
+
+    list:
+    Возвращает отклики к объявлению от новых к старым с курсорной
+    пагинацией. Детали объявления содержат только последние отклики,
+    более старые загружаются отсюда.
 
     create:
     Создает отклик к объявлению.
 
     permission_classes:
-    IsAuthenticated - разрешает создание только авторизованным.
+    IsAuthenticatedOrReadOnly - разрешает создание только авторизованным.
     """
 
-    queryset: QuerySet[AdResponse] = AdResponse.objects.all()
     serializer_class = AdResponseSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AdResponsesCursorPagination
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self) -> QuerySet[AdResponse]:
+        """
+        Возвращает отклики объявления из URL.
+
+        :raises NotFound: если объявление не существует.
+        """
+        advertisement_id = self.kwargs.get("ad_id")
+        if not Advertisement.objects.filter(pk=advertisement_id).exists():
+            raise NotFound()
+        return AdResponse.objects.filter(
+            advertisement_id=advertisement_id
+        ).select_related("user__role")
 
     def perform_create(self, serializer: AdResponseSerializer) -> None:
         """
@@ -323,12 +591,13 @@ class AdResponseDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
         return super().get_queryset().filter(advertisement_id=ad_id)
 
 
-class ArticleListCreateAPIView(generics.ListCreateAPIView):
+class ArticleListCreateAPIView(FastListMixin, generics.ListCreateAPIView):
     """
     Представление для получения списка статей и создания новой статьи.
 
     list:
-    Возвращает список статей.
+    Возвращает список статей. Параметры `fields` и `omit` ограничивают
+    набор полей ответа.
 
     create:
     Создает новую статью.
@@ -350,17 +619,18 @@ class ArticleListCreateAPIView(generics.ListCreateAPIView):
     ordering: list = ["-publication_date"]
     pagination_class = StandardResultsSetPagination
     permission_classes: list = [CanManageArticles]
+    fast_serializer_class = ArticleListFastSerializer
 
     def get_queryset(self) -> QuerySet:
         """
         Возвращает набор запросов статей, отфильтрованный по категории, если она указана.
+
+        Связи и количество комментариев загружаются только для полей,
+        выбранных параметрами `fields`/`omit`.
         """
-        queryset: QuerySet = (
-            Article.objects.annotate(comments_count=Count("comments"))
-            .select_related("author")
-            .prefetch_related("categories")
-            .order_by("-publication_date")
-        )
+        queryset: QuerySet = Article.objects.order_by("-publication_date")
+        if self.request.method == "GET":
+            queryset = ArticleListSerializer.optimize_queryset(queryset, self.request)
 
         category_slug: Optional[str] = self.request.query_params.get("category", None)
         if category_slug and category_slug != "all":
@@ -376,12 +646,16 @@ class ArticleListCreateAPIView(generics.ListCreateAPIView):
         return ArticleListSerializer
 
 
-class ArticleRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ArticleRetrieveUpdateDestroyAPIView(
+    ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """
     Представление для деталей, обновления и удаления статьи.
 
     retrieve:
-    Возвращает детали статьи.
+    Возвращает детали статьи. Параметры `fields` и `omit` ограничивают
+    набор полей ответа. Поддерживает условные запросы
+    (If-None-Match/If-Modified-Since).
 
     update:
     Обновляет статью. Доступно только авторизованным пользователям, которые имеют права на редактирование статей.
@@ -401,6 +675,16 @@ class ArticleRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView)
     permission_classes: List[Type[permissions.BasePermission]] = [CanManageArticles]
     lookup_field: str = "id"
 
+    def get_queryset(self) -> QuerySet:
+        """
+        Для просмотра загружает только связи, нужные выбранным полям.
+        """
+        if self.request.method == "GET":
+            return ArticleDetailSerializer.optimize_queryset(
+                Article.objects.all(), self.request
+            )
+        return super().get_queryset()
+
     def get_serializer_class(self) -> Type[ModelSerializer]:
         if self.request.method in ["PUT", "PATCH"]:
             return ArticleManageSerializer
@@ -467,15 +751,24 @@ class ArticleCommentRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyA
         return Comment.objects.filter(article_id=article_id).select_related("user")
 
 
-class AdvertisementViewSet(viewsets.ModelViewSet):
+class AdvertisementViewSet(
+    ConditionalRetrieveMixin, FastListMixin, viewsets.ModelViewSet
+):
     """
     Представление для управления объявлениями.
 
     list:
-    Возвращает список всех объявлений.
+    Возвращает список всех объявлений. По умолчанию постраничная пагинация;
+    с параметром `pagination=cursor` - курсорная (без COUNT и OFFSET).
+    С параметром `near` объявления отбираются по расстоянию до точки и
+    сортируются по нему.
 
     retrieve:
-    Возвращает детали указанного объявления.
+    Возвращает детали указанного объявления. Поддерживает условные запросы
+    (If-None-Match/If-Modified-Since).
+
+    Для list и retrieve параметры `fields` и `omit` (через запятую)
+    ограничивают набор полей ответа.
 
     create:
     Создает новое объявление.
@@ -488,8 +781,32 @@ class AdvertisementViewSet(viewsets.ModelViewSet):
 
     destroy:
     Удаляет указанное объявление.
+
+    facets:
+    Возвращает количество объявлений для каждого значения фильтров.
+
+    markers:
+    Возвращает компактные маркеры для карты по тайлу или bbox.
+
+    cache_stats:
+    Возвращает счётчики попаданий и промахов кэша списка (только для
+    администраторов).
+
+    duplicates:
+    Возвращает объявления всех пользователей с почти совпадающим описанием
+    (только для модераторов).
+
+    similar:
+    Возвращает объявления с похожими фотографиями животного (GET - для
+    объявления, POST - для загруженной фотографии).
+
+    Ответы списка и фасетов для анонимных пользователей кэшируются
+    (см. siteapp.caching).
     """
 
+    # Время кэширования маркеров карты в браузере и CDN, в секундах.
+    MARKERS_MAX_AGE: int = 60
+
     queryset: QuerySet[Advertisement] = (
         Advertisement.objects.select_related(
             "animal__species",
@@ -509,6 +826,7 @@ class AdvertisementViewSet(viewsets.ModelViewSet):
         filters.OrderingFilter,
     ]
     filterset_class: Type[AdvertisementFilter] = AdvertisementFilter
+    fast_serializer_class = AdvertisementListFastSerializer
 
     pagination_class: Type[PageNumberPagination] = AdsPageNumberPagination
     permission_classes: List[Type[BasePermission]] = [CanManageAdvertisements]
@@ -518,19 +836,90 @@ class AdvertisementViewSet(viewsets.ModelViewSet):
         parsers.JSONParser,
     ]
 
+    @property
+    def paginator(self) -> Optional[BasePagination]:
+        """
+        Возвращает пагинатор для текущего запроса.
+
+        Курсорная пагинация включается параметром `pagination=cursor` или
+        переданным курсором, иначе используется постраничная. При поиске
+        рядом с точкой курсор строится по расстоянию.
+        """
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params if self.request else {}
+            if (
+                params.get("pagination") == "cursor"
+                or AdsCursorPagination.cursor_query_param in params
+            ):
+                self._paginator = (
+                    AdsDistanceCursorPagination()
+                    if params.get("near")
+                    else AdsCursorPagination()
+                )
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def _list_cache_key(self, request) -> str:
+        """
+        Возвращает ключ кэша списка для запроса.
+
+        Учитываются адрес (ссылки пагинации абсолютные) и отсортированные
+        непустые параметры запроса. Ответы с фильтром по статусу зависят от
+        поколения этого статуса, остальные - от общего поколения.
+        """
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+            if value.strip()
+        )
+        fingerprint = f"{request.build_absolute_uri(request.path)}?{urlencode(params)}"
+        scope = caching.status_scope(request.query_params.get("ad_status"))
+        return caching.versioned_key("list", scope, fingerprint)
+
+    def list(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает список объявлений; для анонимных пользователей - из кэша.
+        """
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        cache_key = self._list_cache_key(request)
+        data = cache.get(cache_key)
+        caching.record_lookup(hit=data is not None)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, caching.list_cache_timeout())
+        return response
+
     def get_queryset(self) -> QuerySet[Advertisement]:
         """
-        Возвращает набор данных объявлений с аннотациями по количеству комментариев и среднему рейтингу.
+        Возвращает набор данных объявлений.
+
+        Количество откликов и рейтинг хранятся в самой таблице объявлений
+        (responses_count, rating_count, average_rating), поэтому список не
+        агрегирует связанные таблицы.
 
-        :return: Запрос с аннотациями.
+        Для списка и деталей загружаются только связи, нужные полям,
+        выбранным параметрами `fields`/`omit`.
+
+        :return: Запрос объявлений.
         """
-        queryset: QuerySet[Advertisement] = (
-            Advertisement.objects.annotate(
-                comments_count=Count("responses", distinct=True),
-                average_rating=Avg("ratings__rating"),
-                rating_count=Count("ratings", distinct=True),
+        if self.action in ["list", "retrieve"]:
+            # Связи и столбцы загружаются только для полей, выбранных
+            # параметрами fields/omit.
+            return self.get_serializer_class().optimize_queryset(
+                Advertisement.objects.order_by("-publication_date"), self.request
             )
-            .select_related(
+
+        return (
+            Advertisement.objects.select_related(
                 "animal__species",
                 "animal__breed",
                 "animal__color",
@@ -538,16 +927,19 @@ class AdvertisementViewSet(viewsets.ModelViewSet):
                 "user__role",
                 "status",
             )
-            .prefetch_related(
-                "photos",
-            )
+            .prefetch_related("photos")
             .order_by("-publication_date")
         )
 
-        if self.action == "retrieve":
-            queryset = queryset.prefetch_related("responses__user__role")
-
-        return queryset
+    def filter_queryset(self, queryset: QuerySet[Advertisement]) -> QuerySet:
+        """
+        Применяет фильтры списка; у действий duplicates и similar параметры
+        запроса (например, `species`) задают условия поиска, а не выбор
+        объявления.
+        """
+        if self.action in ["duplicates", "similar"]:
+            return queryset
+        return super().filter_queryset(queryset)
 
     def get_serializer_class(self) -> Type[BaseSerializer]:
         """
@@ -561,6 +953,339 @@ class AdvertisementViewSet(viewsets.ModelViewSet):
             return AdvertisementDetailSerializer
         return AdvertisementListSerializer
 
+    @action(detail=False, methods=["get"], url_path="facets")
+    def facets(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает количество объявлений для значений каждого фильтра.
+
+        Принимает те же параметры, что и список объявлений. Для анонимных
+        пользователей ответ кэшируется по нормализованному набору фильтров.
+        """
+        filterset: AdvertisementFilter = self.filterset_class(
+            request.query_params,
+            queryset=Advertisement.objects.all(),
+            request=request,
+        )
+        cache_key: Optional[str] = None
+        if not request.user.is_authenticated:
+            cache_key = caching.versioned_key(
+                "facets", caching.ALL_SCOPE, filterset.normalized_params()
+            )
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+
+        data = filterset.facet_counts()
+        if cache_key:
+            cache.set(cache_key, data, caching.list_cache_timeout())
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="markers")
+    def markers(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает маркеры объявлений для карты.
+
+        Область задаётся тайлом `tile=z/x/y` или парой `bbox=min_lon,min_lat,
+        max_lon,max_lat` и `zoom`; на масштабе без кластеризации bbox не
+        может быть больше geo.MAX_UNCLUSTERED_BBOX_TILES тайлов по каждой
+        оси. Принимает параметры фильтра объявлений. Ответ кэшируется по
+        тайлу и нормализованному набору фильтров.
+        """
+        params = request.query_params
+        try:
+            if params.get("tile"):
+                zoom, x, y = geo.parse_tile(params["tile"])
+                bbox = geo.tile_bbox(zoom, x, y)
+                area = f"tile={zoom}/{x}/{y}"
+            elif params.get("bbox"):
+                bbox = geo.parse_bbox(params["bbox"])
+                zoom = int(params.get("zoom", ""))
+                if not 0 <= zoom <= geo.MAX_ZOOM:
+                    raise ValueError("zoom вне допустимого диапазона")
+                geo.check_bbox_size(bbox, zoom)
+                area = f"bbox={','.join(map(str, bbox))}&zoom={zoom}"
+            else:
+                raise ValueError("нужен параметр tile или bbox")
+        except ValueError as exc:
+            raise ValidationError({"area": [str(exc)]})
+
+        filterset: AdvertisementFilter = self.filterset_class(
+            params,
+            queryset=Advertisement.objects.filter(
+                geo.bbox_q(bbox), latitude__isnull=False, longitude__isnull=False
+            ),
+            request=request,
+        )
+        cache_key = caching.versioned_key(
+            "markers",
+            caching.status_scope(params.get("ad_status")),
+            f"{area}&{filterset.normalized_params()}",
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            if not filterset.is_valid():
+                raise translate_validation(filterset.errors)
+            data = geo.markers(filterset.qs, zoom)
+            cache.set(cache_key, data, caching.list_cache_timeout())
+
+        response = Response(data, status=status.HTTP_200_OK)
+        patch_cache_control(response, public=True, max_age=self.MARKERS_MAX_AGE)
+        return response
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="cache-stats",
+        permission_classes=[permissions.IsAdminUser],
+    )
+    def cache_stats(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает счётчики попаданий и промахов кэша списка объявлений.
+        """
+        return Response(caching.cache_stats(), status=status.HTTP_200_OK)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="duplicates",
+        permission_classes=[IsAdvertisementModerator],
+    )
+    def duplicates(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает почти-дубликаты объявления.
+
+        Кандидаты выбираются по совпадающим полосам SimHash описания, затем
+        отбираются по расстоянию Хэмминга (см. siteapp.fingerprints). Каждое
+        объявление в ответе дополнено полем `hamming_distance`; ответ
+        отсортирован от самых похожих.
+        """
+        advertisement = self.get_object()
+        matches = dict(
+            fingerprints.near_duplicates(
+                advertisement.simhash, exclude_pk=advertisement.pk
+            )
+        )
+        return Response(self._ranked_advertisements(matches), status=status.HTTP_200_OK)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="similar",
+        permission_classes=[permissions.AllowAny],
+    )
+    def similar(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает объявления с фотографиями, похожими на фотографии этого
+        объявления.
+
+        По умолчанию ищутся объявления того же вида животного с
+        противоположным статусом ("Найдено" - "Потеряно") за последние
+        90 дней; параметры `species`, `ad_status`, `days` и `k` (количество
+        фотографий) меняют условия поиска.
+        """
+        advertisement = self.get_object()
+        params = SimilarPhotoSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        hashes = (
+            advertisement.photos.filter(phash__isnull=False)
+            .order_by("pk")
+            .values_list("phash", flat=True)[: similarity.MAX_QUERY_PHOTOS]
+        )
+        return self._similar_photos_response(
+            list(hashes),
+            params.validated_data,
+            species=advertisement.animal.species,
+            statuses=similarity.COUNTERPART_STATUSES.get(
+                advertisement.status.name, similarity.SEARCH_STATUSES
+            ),
+            exclude_advertisement_id=advertisement.pk,
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="similar",
+        permission_classes=[permissions.IsAuthenticated],
+        parser_classes=[parsers.MultiPartParser],
+    )
+    def similar_to_image(self, request, *args, **kwargs) -> Response:
+        """
+        Возвращает объявления с фотографиями, похожими на загруженную.
+
+        Принимает `image` и `species` (обязательны), а также `ad_status`,
+        `days` и `k`. Фотография не сохраняется.
+        """
+        params = SimilarPhotoSearchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        errors = {
+            name: ["Обязательное поле."]
+            for name in ("image", "species")
+            if name not in params.validated_data
+        }
+        if errors:
+            raise ValidationError(errors)
+        try:
+            with Image.open(params.validated_data["image"]) as image:
+                phash = similarity.perceptual_hash(image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise ValidationError({"image": ["Файл не является изображением."]})
+        return self._similar_photos_response(
+            [phash], params.validated_data, statuses=similarity.SEARCH_STATUSES
+        )
+
+    def _similar_photos_response(
+        self,
+        hashes: List[int],
+        params: Dict[str, Any],
+        statuses,
+        species: Optional[Species] = None,
+        exclude_advertisement_id: Optional[int] = None,
+    ) -> Response:
+        """
+        Ищет похожие фотографии и возвращает их вместе с объявлениями.
+
+        Ответ: `photos` - фотографии от самых похожих с расстоянием
+        Хэмминга, `advertisements` - их объявления в том же порядке с
+        расстоянием лучшей фотографии.
+        """
+        species = params.get("species", species)
+        if "ad_status" in params:
+            statuses = [params["ad_status"].name]
+        matches = similarity.similar_photos(
+            hashes,
+            species_id=species.pk if species else None,
+            status_names=statuses,
+            days=params["days"],
+            limit=params["k"],
+            exclude_advertisement_id=exclude_advertisement_id,
+        )
+        photos = AdPhoto.objects.only("id", "image").in_bulk(
+            [pk for pk, _, _ in matches]
+        )
+        ad_distances: Dict[int, int] = {}
+        for _, advertisement_id, distance in matches:
+            ad_distances.setdefault(advertisement_id, distance)
+        data = {
+            "photos": [
+                {
+                    "id": pk,
+                    "image_url": self.request.build_absolute_uri(photos[pk].image.url),
+                    "advertisement_id": advertisement_id,
+                    "hamming_distance": distance,
+                }
+                for pk, advertisement_id, distance in matches
+            ],
+            "advertisements": self._ranked_advertisements(ad_distances),
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    def _ranked_advertisements(self, distances: Dict[int, int]) -> List[Dict]:
+        """
+        Возвращает данные списка объявлений с полем `hamming_distance`,
+        отсортированные по нему.
+
+        :param distances: id объявления -> расстояние Хэмминга
+        """
+        queryset = AdvertisementListSerializer.optimize_queryset(
+            Advertisement.objects.filter(pk__in=distances), self.request
+        )
+        advertisements = sorted(queryset, key=lambda ad: (distances[ad.pk], ad.pk))
+        data = AdvertisementListSerializer(
+            advertisements, many=True, context=self.get_serializer_context()
+        ).data
+        for item, ad in zip(data, advertisements):
+            item["hamming_distance"] = distances[ad.pk]
+        return data
+
+
+class PhotoUploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Возобновляемая загрузка фотографий объявлений по частям.
+
+    create:
+    Создаёт сессию загрузки по имени и размеру файла.
+
+    retrieve:
+    Возвращает состояние сессии; `offset` - смещение следующей части, с
+    которого загрузку можно продолжить после обрыва.
+
+    update:
+    Принимает часть файла (PUT): тело запроса - байты части, заголовок
+    `Upload-Offset` - её смещение. Если смещение не совпадает с принятым,
+    возвращает 409 с текущим `offset`.
+
+    complete:
+    Завершает загрузку и проверяет, что файл является изображением.
+    Идентификатор завершённой сессии передаётся в `photo_uploads` при
+    создании или изменении объявления.
+
+    destroy:
+    Отменяет загрузку.
+    """
+
+    serializer_class = PhotoUploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet[PhotoUploadSession]:
+        """
+        Возвращает сессии загрузки текущего пользователя.
+        """
+        return PhotoUploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer: PhotoUploadSessionSerializer) -> None:
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance: PhotoUploadSession) -> None:
+        instance.delete()
+        uploads.delete_session_files([instance])
+
+    def update(self, request, *args, **kwargs) -> Response:
+        """
+        Записывает часть файла во временный файл сессии.
+
+        Тело читается из потока запроса блоками (см. uploads.write_chunk),
+        request.data не используется, поэтому часть не буферизуется в
+        памяти целиком.
+        """
+        session = self.get_object()
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ValidationError(
+                {"offset": ["Нужен числовой заголовок Upload-Offset."]}
+            )
+        try:
+            uploads.write_chunk(session, offset, request.stream, length)
+        except uploads.UploadOffsetConflict as exc:
+            return Response(
+                {"detail": str(exc), "offset": exc.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except ValueError as exc:
+            raise ValidationError({"detail": [str(exc)]})
+        return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"], url_path="complete")
+    def complete(self, request, *args, **kwargs) -> Response:
+        """
+        Завершает загрузку.
+        """
+        session = self.get_object()
+        try:
+            uploads.complete_session(session)
+        except ValueError as exc:
+            raise ValidationError({"detail": [str(exc)]})
+        return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)
+
 
 class BreedListAPIView(generics.ListAPIView):
     """
@@ -574,6 +1299,29 @@ class BreedListAPIView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
+class AutocompleteAPIView(APIView):
+    """
+    Подсказки при вводе названий пород, регионов и окрасов.
+
+    Ответ строится по индексу в памяти процесса (см. siteapp.autocomplete)
+    без запросов к базе данных.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs) -> Response:
+        params = AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(
+            autocomplete.suggest(
+                params.validated_data["type"],
+                params.validated_data["q"],
+                params.validated_data["limit"],
+                params.validated_data.get("species"),
+            )
+        )
+
+
 class AdvertisementRatingViewSet(viewsets.ModelViewSet):
     """
     Endpoint для работы с оценками объявлений.
@@ -744,12 +1492,10 @@ class ProfileViewSet(viewsets.ModelViewSet):
         """
         instance = self.get_object()
         user_serializer = self.get_serializer(instance)
-        user_ads = (
-            Advertisement.objects.filter(user=instance)
-            .select_related("animal__species", "status")
-            .prefetch_related("photos")
-            .order_by("-publication_date")[:12]
-        )
+        user_ads = AdvertisementListSerializer.optimize_queryset(
+            Advertisement.objects.filter(user=instance).order_by("-publication_date"),
+            request,
+        )[:12]
         ads_serializer = AdvertisementListSerializer(
             user_ads, many=True, context={"request": request}
         )
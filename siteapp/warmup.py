@@ -0,0 +1,208 @@
+# siteapp/warmup.py
+"""
+Прогрев кэшей и процесса после развёртывания.
+
+run() по шагам (WarmupItem) выполняет то, за что иначе платят первые
+запросы к каждому процессу:
+
+- импорт тяжёлых модулей (сериализаторы DRF, django-filter, reportlab);
+- построение URL resolver;
+- справочники, набор значений фильтров и индекс подсказок в памяти
+  процесса (см. siteapp.lookups, siteapp.filter_options,
+  siteapp.autocomplete);
+- снимок главной страницы, счётчики фасетов и первые WARMUP_LIST_PAGES
+  страниц списка объявлений в общем кэше. Эти ответы строятся прямым
+  вызовом представлений с запросом от анонимного клиента с источника
+  WARMUP_ORIGIN, поэтому ключи кэша совпадают с ключами запросов клиентов.
+
+Команда `warm_caches` прогревает общий кэш перед запуском gunicorn, а хук
+post_worker_init (gunicorn.conf.py) синхронно вызывает start() в каждом
+процессе до того, как он начнёт принимать соединения. Пока start() не
+вернулся, is_ready() в процессе возвращает False и проверка здоровья
+отвечает 503.
+"""
+
+import importlib
+import logging
+import time
+import typing
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.urls import get_resolver, resolve, reverse
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES = (
+    "rest_framework.serializers",
+    "django_filters.rest_framework",
+    "reportlab.pdfgen.canvas",
+    "reportlab.platypus",
+    "siteapp.serializers",
+    "siteapp.fast_serializers",
+)
+
+_required = False
+_ready = False
+
+
+@dataclass
+class WarmupItem:
+    """
+    Результат шага прогрева.
+
+    name - название шага,
+    seconds - время выполнения,
+    error - описание ошибки или None.
+    """
+
+    name: str
+    seconds: float
+    error: typing.Optional[str] = None
+
+    def __str__(self) -> str:
+        result = f"{self.name}: {self.seconds * 1000:.1f} ms"
+        return f"{result} (failed: {self.error})" if self.error else result
+
+
+def warmup_origin() -> str:
+    return getattr(settings, "WARMUP_ORIGIN", "http://localhost")
+
+
+def list_pages() -> int:
+    return getattr(settings, "WARMUP_LIST_PAGES", 3)
+
+
+def _import_modules() -> None:
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def _warm_lookups() -> None:
+    from django.apps import apps
+
+    from . import lookups
+
+    for name in lookups.LOOKUP_MODELS:
+        lookups.all_rows(apps.get_model("siteapp", name))
+
+
+def _warm_filter_options() -> None:
+    from . import filter_options
+
+    filter_options.current()
+
+
+def _warm_autocomplete() -> None:
+    from . import autocomplete
+
+    autocomplete.indexes()
+
+
+def _get(path: str, missing_ok: bool = False) -> typing.Callable[[], None]:
+    """
+    Шаг, который вызывает представление path с запросом от анонимного
+    клиента с источника WARMUP_ORIGIN. Запрос не проходит через обработчик
+    и middleware Django, поэтому не трогает соединения с базой и их
+    обработчики сигналов.
+
+    :param missing_ok: не считать ошибкой ответ 404 (страницы списка за
+        последней)
+    """
+
+    def request() -> None:
+        from django.contrib.auth.models import AnonymousUser
+        from django.test.client import RequestFactory
+
+        origin = urlsplit(warmup_origin())
+        request = RequestFactory().get(
+            path, HTTP_HOST=origin.netloc, secure=origin.scheme == "https"
+        )
+        request.user = AnonymousUser()
+        match = resolve(request.path_info)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        if response.status_code == 404 and missing_ok:
+            return
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+    return request
+
+
+def steps(
+    pages: typing.Optional[int] = None,
+) -> typing.List[typing.Tuple[str, typing.Callable[[], None]]]:
+    """
+    Возвращает шаги прогрева по порядку.
+
+    :param pages: сколько страниц списка объявлений прогревать; по
+        умолчанию WARMUP_LIST_PAGES
+    """
+    result = [
+        ("imports", _import_modules),
+        ("url resolver", lambda: get_resolver().url_patterns),
+        ("lookups", _warm_lookups),
+        ("filter options", _warm_filter_options),
+        ("autocomplete index", _warm_autocomplete),
+        ("home page", _get(reverse("homepage_data_api"))),
+        ("facets", _get(reverse("advertisement-facets"))),
+    ]
+    list_url = reverse("advertisement-list")
+    result.extend(
+        (
+            f"ad list page {page}",
+            (
+                _get(f"{list_url}?page={page}", missing_ok=True)
+                if page > 1
+                else _get(list_url)
+            ),
+        )
+        for page in range(1, (list_pages() if pages is None else pages) + 1)
+    )
+    return result
+
+
+def run(pages: typing.Optional[int] = None) -> typing.List[WarmupItem]:
+    """
+    Выполняет все шаги прогрева в текущем процессе. Ошибка шага
+    записывается в результат и не прерывает остальные шаги.
+
+    :param pages: сколько страниц списка объявлений прогревать
+    """
+    items = []
+    for name, step in steps(pages):
+        started = time.perf_counter()
+        error = None
+        try:
+            step()
+        except Exception as e:
+            error = str(e)
+            logger.warning("Warm-up step %r failed: %s", name, e)
+        items.append(WarmupItem(name, time.perf_counter() - started, error))
+    return items
+
+
+def start() -> None:
+    """
+    Синхронно прогревает текущий процесс; до возврата is_ready() возвращает
+    False. Ошибки шагов только записываются в журнал и не оставляют процесс
+    неготовым.
+    """
+    global _required, _ready
+    _required = True
+    _ready = False
+    try:
+        items = run()
+        logger.info("Warm-up finished: %s", "; ".join(map(str, items)))
+    finally:
+        _ready = True
+
+
+def is_ready() -> bool:
+    """
+    Готов ли процесс: прогрев не запускался или уже завершён.
+    """
+    return not _required or _ready